@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+'''
+Vergleicht die Kosten pro Event von KProbes und Syscall-Tracepoints (SysCall.BACKEND).
+
+* parse: Auswerten der Logzeilen in Python, für die Korpora "simple" (KProbes) und
+  "tracepoint" (dieselben SysCalls im Format von sys_enter_<name>), jeweils als
+  dictionaries und mit objects=True. Dafür genügt eine Nachbildung von tracefs.
+* live (nur mit --root, als root): Dauer eines kill(pid, 0) ohne Tracing, mit dem Tracepoint
+  sys_enter_kill und mit der KProbe sys_kill_kprobe. Die Differenz zur Messung ohne Tracing ist
+  der Aufwand des Kernels pro Event. Lässt sich die KProbe nicht registrieren (z.B. weil das
+  Symbol sys_kill auf neueren Kerneln __x64_sys_kill heißt), wird der Fehler ausgegeben.
+
+Aufruf:
+
+  python benchmarks/bench_backends.py [--events 200000] [--root /sys/kernel/tracing] [--calls 200000] [--output bench_backends.json]
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import generate  # noqa: E402
+from ftrace import FTrace  # noqa: E402
+from ftrace import syscalls  # noqa: E402
+from ftrace.tracefs import TraceFS  # noqa: E402
+from ftrace.tracers import NopTracer  # noqa: E402
+from ftrace.parsers import SysCallParser  # noqa: E402
+
+
+def bench_parse(tracefs, events, repeat=3):
+    '''
+    Parst die Korpora "simple" (BACKEND "kprobe") und "tracepoint" (BACKEND "auto") und gibt die
+    besten Werte aus repeat Läufen zurück.
+    '''
+    result = {}
+    old_backend = syscalls.SysCall.BACKEND
+    try:
+        for corpus, backend in (("simple", "kprobe"), ("tracepoint", "auto")):
+            syscalls.SysCall.BACKEND = backend  # wird beim Instanzieren der SysCalls des Katalogs ausgewertet
+            catalog = NopTracer(tracefs).parser.syscalls
+            lines = generate(corpus, events)
+            for objects in (False, True):
+                best = None
+                for _ in range(repeat):
+                    parser = SysCallParser(catalog, objects=objects)
+                    start = time.perf_counter()
+                    count = 0
+                    for data in parser.parse_lines(lines):
+                        if (data):
+                            if (objects):
+                                data.to_dict()
+                            count += 1
+                    seconds = time.perf_counter() - start
+                    best = seconds if best is None else min(best, seconds)
+                if (count != events):
+                    raise RuntimeError("{}: only {} of {} lines parsed".format(corpus, count, events))
+                result["{}{}".format(corpus, "_objects" if objects else "")] = {
+                    "events": count, "seconds": best, "events_per_sec": count / best, "us_per_event": best / count * 1e6
+                }
+    finally:
+        syscalls.SysCall.BACKEND = old_backend
+    return result
+
+
+def _time_kill(calls):
+    pid = os.getpid()
+    kill = os.kill
+    start = time.perf_counter()
+    for _ in range(calls):
+        kill(pid, 0)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def bench_live(tracefs, calls):
+    '''
+    Misst kill(pid, 0) ohne Tracing, mit Tracepoint und mit KProbe (siehe Modulbeschreibung).
+    '''
+    baseline = min(_time_kill(calls) for _ in range(3))
+    result = {"baseline_ns": baseline}
+    old_backend = syscalls.Sys_Kill.BACKEND
+    try:
+        for backend in ("auto", "kprobe"):
+            syscalls.Sys_Kill.BACKEND = backend
+            name = "tracepoint" if backend == "auto" else "kprobe"
+            if (backend == "auto" and syscalls.Sys_Kill(tracefs).tracepoint is None):
+                result[name] = {"error": "tracepoint sys_enter_kill not available"}
+                continue
+            ftrace = FTrace(tracefs)
+            ftrace.tracer = NopTracer(tracefs, register_all=False)
+            try:
+                ftrace.reset()
+                ftrace.setup()
+                ftrace.tracer.syscalls = [syscalls.Sys_Kill]
+                ns = min(_time_kill(calls) for _ in range(3))
+                result[name] = {"ns_per_call": ns, "overhead_ns": ns - baseline}
+            except Exception as e:
+                result[name] = {"error": "{}: {}".format(e.__class__.__name__, e)}
+            finally:
+                ftrace.reset()
+    finally:
+        syscalls.Sys_Kill.BACKEND = old_backend
+    return result
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("--events", type=int, default=200000)
+    argparser.add_argument("--root", help="tracefs root for the live measurement (requires root)")
+    argparser.add_argument("--calls", type=int, default=200000)
+    argparser.add_argument("--output", default="bench_backends.json")
+    args = argparser.parse_args()
+
+    stub_dir = tempfile.mkdtemp(prefix="tracefs-")
+    try:
+        result = {"parse": bench_parse(TraceFS.create_stub(stub_dir, tracepoints=True), args.events)}
+    finally:
+        shutil.rmtree(stub_dir)
+    for name, values in result["parse"].items():
+        print("parse {:<20} {:>12,.0f} events/s {:8.3f} us/event".format(name, values["events_per_sec"], values["us_per_event"]))
+
+    if (args.root):
+        result["live"] = bench_live(TraceFS(args.root), args.calls)
+        print("live  {:<20} {:8.1f} ns/call".format("baseline", result["live"]["baseline_ns"]))
+        for name in ("tracepoint", "kprobe"):
+            values = result["live"][name]
+            if ("error" in values):
+                print("live  {:<20} {}".format(name, values["error"]))
+            else:
+                print("live  {:<20} {:8.1f} ns/call {:+8.1f} ns/event".format(name, values["ns_per_call"], values["overhead_ns"]))
+
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print("results written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+'''
+Misst die Latenz der Steuerung (reset, setup, syscalls setzen, reset) und den Durchsatz
+von get_output() gegen ein beliebiges tracefs.
+
+Ohne --root wird eine Nachbildung (TraceFS.create_stub()) in einem temporären Verzeichnis
+verwendet, in der trace_pipe ein FIFO ist; dafür ist kein root notwendig.
+Mit --root /sys/kernel/tracing (als root) wird das echte Kernelfeature gemessen.
+
+Aufruf:
+
+  python benchmarks/bench_controlplane.py [--root PFAD] [--repeat 20] [--events 100000] [--output bench_controlplane.json]
+
+Ohne --output werden die Ergebnisse als JSON auf stdout ausgegeben.
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ftrace import FTrace  # noqa: E402
+from ftrace.tracefs import TraceFS  # noqa: E402
+from ftrace.tracers import NopTracer  # noqa: E402
+from ftrace import syscalls  # noqa: E402
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_control(tracefs, repeat):
+    phases = {"reset": [], "setup": [], "syscalls": [], "teardown": []}
+    tracer_phases = {}
+    for _ in range(repeat):
+        ftrace = FTrace(tracefs)
+        ftrace.tracer = NopTracer(tracefs)
+        phases["reset"].append(timed(ftrace.reset))
+        try:
+            phases["setup"].append(timed(ftrace.setup))
+            for phase, seconds in ftrace.tracer.setup_stats.items():
+                tracer_phases.setdefault("tracer_" + phase, []).append(seconds)
+            phases["syscalls"].append(timed(lambda: setattr(ftrace.tracer, "syscalls", [syscalls.Sys_Execve(tracefs), syscalls.Sched_Process_Fork(tracefs)])))
+        finally:
+            phases["teardown"].append(timed(ftrace.reset))  # KProbes nicht im Kernel zurücklassen
+    phases.update(tracer_phases)
+    return {phase: {"min_ms": min(v) * 1e3, "avg_ms": sum(v) / len(v) * 1e3} for phase, v in phases.items()}
+
+
+def bench_stream(tracefs, events):
+    '''
+    Schreibt synthetische Zeilen in den FIFO trace_pipe der Nachbildung und liest sie über get_output().
+    '''
+    from corpus import generate
+    lines = generate("mix", events)
+    ftrace = FTrace(tracefs)
+    ftrace.tracer = NopTracer(tracefs)
+
+    def writer():
+        fd = os.open(tracefs.path("trace_pipe"), os.O_WRONLY)
+        try:
+            data = b"".join(lines)
+            view = memoryview(data)
+            while (view):
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+
+    thread = threading.Thread(target=writer, daemon=True)  # blockiert in open(), falls get_output() vorher scheitert
+    thread.start()
+    start = time.perf_counter()
+    count = sum(1 for data in ftrace.get_output() if data is not None)
+    total = time.perf_counter() - start
+    thread.join()
+    result = {"events": count, "seconds": total, "events_per_sec": count / total}
+    result.update(ftrace.reader_stats())
+    return result
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("--root", help="tracefs root (default: temporary stub)")
+    argparser.add_argument("--repeat", type=int, default=20)
+    argparser.add_argument("--events", type=int, default=100000)
+    argparser.add_argument("--output", help="result file (default: stdout)")
+    args = argparser.parse_args()
+
+    stub_dir = None
+    if (args.root):
+        tracefs = TraceFS(args.root)
+    else:
+        stub_dir = tempfile.mkdtemp(prefix="tracefs-")
+        tracefs = TraceFS.create_stub(stub_dir)
+
+    try:
+        result = {"root": tracefs.root, "stub": stub_dir is not None, "control": bench_control(tracefs, args.repeat)}
+        for phase, values in result["control"].items():
+            print("{:<10} min {:8.3f} ms  avg {:8.3f} ms".format(phase, values["min_ms"], values["avg_ms"]))
+        if (stub_dir is not None):
+            result["stream"] = bench_stream(tracefs, args.events)
+            print("stream     {:>12,.0f} events/s".format(result["stream"]["events_per_sec"]))
+    finally:
+        if (stub_dir is not None):
+            shutil.rmtree(stub_dir)
+
+    if (args.output is None):
+        print(json.dumps(result, indent=2))
+        return
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print("results written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+'''
+Vergleicht den Durchsatz (Zeilen/s) des SysCallParsers mit den kompilierten Decodern
+mit dem bisherigen Verfahren (reguläre Ausdrücke über str(bytes), pro Zeile neu kompiliert).
+
+Aufruf (ohne root):
+
+  python benchmarks/bench_decoders.py [anzahl_zeilen]
+'''
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ftrace.tracers import NopTracer  # noqa: E402
+
+
+LINES = [
+    b'            bash-4588  [001] d... 6788.794592: sched_process_fork: comm=bash pid=4588 child_comm=bash child_pid=7291\n',
+    b'           <...>-7291  [000] d... 6788.795131: sys_execve_kprobe: (SyS_execve+0x0/0x30) arg1="/usr/bin/sudo" arg2="sudo" arg3="ls" arg4="-la" arg5="/tmp" arg6=(fault)\n',
+    b'            sudo-7291  [000] d... 6794.881823: sys_setuid_kprobe: (SyS_setuid+0x0/0x60) arg1=0\n',
+    b'            sudo-7291  [002] d... 6794.881901: sys_setreuid_kprobe: (SyS_setreuid+0x0/0x60) arg1=1000 arg2=0\n',
+    b'            bash-4588  [001] d... 6794.882534: sys_kill_kprobe: (SyS_kill+0x0/0x60) arg1=7291 arg2=15\n',
+    b'      gnome-shell-1911  [003] d... 6794.891240: sys_close_kprobe: (SyS_close+0x0/0x60) arg1=42\n',
+]
+
+
+class LegacySysCallParser(object):
+    '''
+    Nachbildung des bisherigen Parsers (Stand vor den kompilierten Decodern) als Vergleichswert.
+    '''
+    _REGEXKNAME = re.compile(r"^.*?\s\S.*-(?=\d+\s*)\d+\s*\[\d*\].*\s[0-9.]*:\s*(\w*):\s*")
+    _REGEXARGS = re.compile(r"\sarg\d+=(.*?(?=\sarg\d+=|$|\\n'))")
+    _REGEXFORK = re.compile(r"^.*?\s(\S.*)-(?=\d+\s*)(\d+)\s*\[(\d*)\].*\s([0-9.]*):\s*(sched_process_fork):\s*comm=(.*)\s*pid=(\d*)\s*child_comm=(.*)\s*child_pid=(\d*)")
+
+    def __init__(self, syscalls):
+        self.syscalls = syscalls
+        self._last_line = b""
+
+    @staticmethod
+    def _standard_fields(line):
+        regex = re.compile(r"^.*?\s(\S.*)-(?=\d+\s*)(\d+)\s*\[(\d*)\].*\s([0-9.]*):\s*(\w*):\s*\((.*?(?=\)))\)")
+        m = regex.match(str(line))
+        return [m.group(1), m.group(2), m.group(4), m.group(5), m.group(6).split("+")[0]]
+
+    @staticmethod
+    def _fill(parts, syscall):
+        vd = {}
+        i = 0
+        for name, typ in dict(syscall.STANDARD_FIELDS, **syscall.valid_params).items():
+            if (not typ.value.is_list):
+                vd[name] = typ.convert(parts[i])
+                i += 1
+            else:
+                vd[name] = [typ.convert(parts[i + x]) for x in range(syscall.ARGCOUNT)]
+                i += syscall.ARGCOUNT
+        return vd
+
+    def parse(self, line):
+        self._last_line += line
+        kname = self._REGEXKNAME.match(str(self._last_line))
+        if (not kname):
+            return
+        syscall = self.syscalls[kname.group(1)]
+        line = self._last_line
+        if (syscall.kname == "sched_process_fork"):
+            m = self._REGEXFORK.match(str(line))
+            parts = [m.group(1), m.group(2), m.group(4), m.group(5), m.group(5), m.group(8), m.group(9)]
+        else:
+            parts = self._standard_fields(line) + self._REGEXARGS.findall(str(line))
+            expected = len(syscall.STANDARD_FIELDS) + sum((syscall.ARGCOUNT if t.value.is_list else 1) for t in syscall.valid_params.values())
+            if (len(parts) != expected):
+                return
+            n = len(syscall.STANDARD_FIELDS)
+            parts[n:] = [(v[1:-1] if (v[0] == '"' and v[-1] == '"') else v) for v in parts[n:]]
+        self._last_line = b""
+        return self._fill(parts, syscall)
+
+
+def run(parser, lines):
+    parse = parser.parse
+    start = time.perf_counter()
+    for line in lines:
+        parse(line)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    lines = (LINES * (count // len(LINES) + 1))[:count]
+    syscalls = NopTracer().parser.syscalls
+
+    before = run(LegacySysCallParser(syscalls), lines)
+    after = run(NopTracer().parser, lines)
+
+    print("lines:  {}".format(count))
+    print("before: {:>12,.0f} lines/s".format(before))
+    print("after:  {:>12,.0f} lines/s".format(after))
+    print("factor: {:.2f}x".format(after / before))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark des Parser-Hot-Paths auf synthetischen Korpora (siehe corpus.py).
+
+Gemessen werden für SysCallParser.parse() und für die Pipeline von get_output()
+(PipeReader + parse_lines(), über eine Replay-Aufzeichnung, daher ohne root und ohne tracefs):
+
+* events_per_sec
+* Latenz pro Event (p50, p90, p99, max) in Mikrosekunden
+* peak_rss_kb (jeder Lauf in einem eigenen Prozess)
+
+Aufruf:
+
+  python benchmarks/bench_parser.py [--events 200000] [--output bench_parser.json] [korpus ...]
+
+Jeder Lauf zählt die geparsten Events; ergibt nicht jede Zeile des Korpus ein Event,
+bricht das Skript mit einem Fehler ab.
+
+Mit --baseline wird mit einer früheren Ergebnisdatei verglichen; ist der Durchsatz eines
+Laufs um mehr als --tolerance (Anteil) gesunken, endet das Skript mit Exit-Code 1.
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import shutil
+import platform
+import resource
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import CORPORA, generate  # noqa: E402
+from ftrace import syscalls  # noqa: E402
+from ftrace.tracefs import TraceFS  # noqa: E402
+from ftrace.tracers import NopTracer  # noqa: E402
+from ftrace.replay import Replay  # noqa: E402
+
+# Korpora, die nur mit einem anderen SysCall.BACKEND als "kprobe" geparst werden
+BACKENDS = {
+    "tracepoint": "auto",
+}
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    samples = sorted(samples)
+    result = {"p{}".format(p): samples[min(len(samples) - 1, len(samples) * p // 100)] for p in points}
+    result["max"] = samples[-1]
+    return result
+
+
+def bench_parse(lines, tracer):
+    parse = tracer.parser.parse
+    clock = time.perf_counter
+    latencies = []
+    append = latencies.append
+    count = 0
+    start = clock()
+    for line in lines:
+        t = clock()
+        if (parse(line)):
+            count += 1
+        append(clock() - t)
+    total = clock() - start
+    return total, latencies, count
+
+
+def bench_get_output(lines, tracer):
+    with tempfile.NamedTemporaryFile(suffix=".trace", delete=False) as f:
+        f.writelines(lines)
+        path = f.name
+    try:
+        clock = time.perf_counter
+        latencies = []
+        append = latencies.append
+        count = 0
+        start = last = clock()
+        for _ in Replay(path, tracer=tracer).get_output():
+            t = clock()
+            append(t - last)
+            last = t
+            count += 1
+        total = clock() - start
+    finally:
+        os.unlink(path)
+    return total, latencies, count
+
+
+TARGETS = {
+    "parse": bench_parse,
+    "get_output": bench_get_output,
+}
+
+
+def _run(target, corpus, count, conn):
+    lines = generate(corpus, count)
+    # BACKEND wird beim Instanzieren der SysCalls ausgewertet; der Lauf hat einen eigenen Prozess,
+    # die Änderung wirkt also nicht auf spätere Läufe.
+    syscalls.SysCall.BACKEND = BACKENDS.get(corpus, "kprobe")
+    stub_dir = tempfile.mkdtemp(prefix="tracefs-")
+    try:
+        tracer = NopTracer(TraceFS.create_stub(stub_dir, tracepoints=True))
+        total, latencies, events = TARGETS[target](lines, tracer)
+    finally:
+        shutil.rmtree(stub_dir)
+    result = {
+        "target": target,
+        "corpus": corpus,
+        "lines": len(lines),
+        "events": events,
+        "seconds": total,
+        "events_per_sec": events / total,
+        "latency_us": {k: v * 1e6 for k, v in percentiles(latencies).items()},
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    conn.send(result)
+    conn.close()
+
+
+def run(target, corpus, count):
+    '''
+    Führt einen Lauf in einem eigenen Prozess aus, damit peak_rss_kb nicht von vorherigen Läufen abhängt.
+    '''
+    context = multiprocessing.get_context("fork")
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=_run, args=(target, corpus, count, child))
+    process.start()
+    child.close()  # sonst wartet recv() ewig, falls der Lauf mit einer Exception endet
+    try:
+        result = parent.recv()
+    except EOFError:
+        process.join()
+        raise RuntimeError("{} {}: benchmark process failed with exit code {}".format(target, corpus, process.exitcode))
+    process.join()
+    if (result["events"] != count):
+        raise RuntimeError("{} {}: only {} of {} lines parsed".format(target, corpus, result["events"], count))
+    return result
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("corpora", nargs="*", default=sorted(CORPORA))
+    argparser.add_argument("--events", type=int, default=200000)
+    argparser.add_argument("--targets", nargs="+", default=sorted(TARGETS))
+    argparser.add_argument("--output", default="bench_parser.json")
+    argparser.add_argument("--baseline", help="previous result file to compare against")
+    argparser.add_argument("--tolerance", type=float, default=0.1)
+    args = argparser.parse_args()
+
+    results = []
+    for corpus in args.corpora:
+        for target in args.targets:
+            result = run(target, corpus, args.events)
+            results.append(result)
+            print("{:<10} {:<10} {:>12,.0f} events/s  p50 {:6.1f}us  p99 {:6.1f}us  rss {:>8} kB".format(
+                result["target"], result["corpus"], result["events_per_sec"],
+                result["latency_us"]["p50"], result["latency_us"]["p99"], result["peak_rss_kb"]))
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "time": time.time(),
+            "results": results,
+        }, f, indent=2)
+    print("results written to {}".format(args.output))
+
+    if (args.baseline):
+        return compare(args.baseline, results, args.tolerance)
+    return 0
+
+
+def compare(baseline_path, results, tolerance):
+    '''
+    Vergleicht die Ergebnisse mit einer früheren Ergebnisdatei und gibt 1 zurück,
+    falls ein Lauf langsamer als (1 - tolerance) * Baseline ist.
+    '''
+    with open(baseline_path) as f:
+        baseline = {(r["target"], r["corpus"]): r for r in json.load(f)["results"]}
+
+    regressions = 0
+    for result in results:
+        old = baseline.get((result["target"], result["corpus"]))
+        if (old is None):
+            continue
+        ratio = result["events_per_sec"] / old["events_per_sec"]
+        if (ratio < 1 - tolerance):
+            regressions += 1
+            print("REGRESSION {} {}: {:.0f} -> {:.0f} events/s ({:+.1%})".format(
+                result["target"], result["corpus"], old["events_per_sec"], result["events_per_sec"], ratio - 1))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+'''
+Vergleicht das Parsen in einem Prozess (SysCallParser.parse_lines()) mit dem ProcessPoolParser
+bei unterschiedlicher Anzahl an Workern und Events, um den Punkt zu finden, ab dem sich
+das Verteilen auf mehrere Prozesse lohnt.
+
+Gemessen wird nur das Parsen (die Daten liegen bereits im Speicher), inklusive Start der Worker
+und Übertragung der Ergebnisse. Ausgegeben werden events/s je Kombination und pro Anzahl Worker
+der Übergangspunkt (kleinste Anzahl Events, ab der der ProcessPoolParser schneller ist).
+
+Aufruf:
+
+  python benchmarks/bench_procpool.py [--events 10000 100000 1000000] [--workers 1 2 4 8] [--corpus mix]
+                                      [--batch-size 262144] [--output bench_procpool.json]
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import CORPORA, generate  # noqa: E402
+from ftrace.tracers import NopTracer  # noqa: E402
+from ftrace.procpool import ProcessPoolParser  # noqa: E402
+
+
+def chunks(data, size=65536):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def bench_single(lines):
+    parser = NopTracer().parser
+    start = time.perf_counter()
+    count = sum(1 for value_dict in parser.parse_lines(lines) if value_dict)
+    return count, time.perf_counter() - start
+
+
+def bench_pool(data, workers, batch_size):
+    pool = ProcessPoolParser(NopTracer().parser, workers=workers, batch_size=batch_size)
+    start = time.perf_counter()
+    count = sum(1 for _ in pool.parse_chunks(chunks(data)))
+    return count, time.perf_counter() - start
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("--events", type=int, nargs="+", default=[10000, 100000, 1000000])
+    argparser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    argparser.add_argument("--corpus", choices=sorted(CORPORA), default="mix")
+    argparser.add_argument("--batch-size", type=int, default=256 * 1024)
+    argparser.add_argument("--output", default="bench_procpool.json")
+    args = argparser.parse_args()
+
+    results = []
+    for events in args.events:
+        lines = generate(args.corpus, events)
+        data = b"".join(lines)
+        count, seconds = bench_single(lines)
+        results.append({"events": events, "workers": 0, "events_per_s": count / seconds, "seconds": seconds})
+        print("{:>9,} events  single        {:>12,.0f} events/s".format(events, count / seconds))
+        for workers in args.workers:
+            pool_count, pool_seconds = bench_pool(data, workers, args.batch_size)
+            if (pool_count != count):
+                sys.exit("pool parsed {} events, single process {}".format(pool_count, count))
+            results.append({"events": events, "workers": workers, "events_per_s": count / pool_seconds, "seconds": pool_seconds})
+            print("{:>9,} events  {:>2} workers    {:>12,.0f} events/s  ({:.2f}x)".format(events, workers, count / pool_seconds, seconds / pool_seconds))
+
+    crossover = {}
+    for workers in args.workers:
+        for events in args.events:
+            single = next(r for r in results if r["events"] == events and r["workers"] == 0)
+            pool = next(r for r in results if r["events"] == events and r["workers"] == workers)
+            if (pool["seconds"] < single["seconds"]):
+                crossover[workers] = events
+                break
+        else:
+            crossover[workers] = None
+        print("crossover {:>2} workers: {}".format(workers, "{:,} events".format(crossover[workers]) if crossover[workers] else "not reached"))
+
+    with open(args.output, "w") as f:
+        json.dump({"corpus": args.corpus, "batch_size": args.batch_size, "cpus": os.cpu_count(), "results": results, "crossover": crossover}, f, indent=2)
+    print("results written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+'''
+Vergleicht das Event-Volumen und die CPU-Zeit von get_output() mit und ohne Einschränkung
+auf einen Prozessbaum (FTrace.set_scope()).
+
+Es werden zwei gleichartige Lasten gestartet, die jeweils in einer Schleife Kindprozesse
+(/bin/true) starten: der "Dienst", auf den eingeschränkt wird, und eine Hintergrundlast.
+Gemessen werden für beide Läufe die gelesenen Events und die CPU-Zeit des lesenden Prozesses.
+
+Das Einschränken übernimmt der Kernel; gegen eine Nachbildung (TraceFS.create_stub())
+lässt sich das nicht messen. Daher ist root und das echte Kernelfeature notwendig.
+
+Aufruf (als root):
+
+  python benchmarks/bench_scope.py [--root /sys/kernel/tracing] [--duration 5] [--output bench_scope.json]
+
+Ohne --output werden die Ergebnisse als JSON auf stdout ausgegeben.
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ftrace import FTrace  # noqa: E402
+from ftrace.tracefs import TraceFS  # noqa: E402
+from ftrace.tracers import NopTracer  # noqa: E402
+from ftrace import syscalls  # noqa: E402
+
+
+WORKLOAD = "import subprocess, time\nend = time.time() + {duration}\nwhile time.time() < end:\n    subprocess.call(['/bin/true'])\n"
+
+
+def run(tracefs, duration, scoped):
+    ftrace = FTrace(tracefs)
+    ftrace.tracer = NopTracer(tracefs, register_all=False)
+    timer = threading.Timer(duration, ftrace.stop)
+    workloads = []  # Dienst und Hintergrundlast
+    events = 0
+    try:
+        for _ in range(2):
+            workloads.append(subprocess.Popen([sys.executable, "-c", WORKLOAD.format(duration=duration)]))
+        ftrace.reset()
+        if (scoped):
+            ftrace.set_scope([workloads[0].pid])
+        ftrace.setup()
+        ftrace.tracer.syscalls = [syscalls.Sys_Execve, syscalls.Sched_Process_Fork]
+
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        timer.start()
+        for value_dict in ftrace.get_output():
+            if (value_dict):
+                events += 1
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+    finally:
+        timer.cancel()
+        ftrace.reset()
+        for process in workloads:
+            process.kill()
+            process.wait()
+
+    return {
+        "events": events,
+        "events_per_s": events / wall,
+        "cpu_s": cpu,
+        "cpu_us_per_event": cpu / events * 1e6 if events else None,
+        "reader": ftrace.reader_stats(),
+    }
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("--root", help="Verzeichnis von tracefs (Standard: automatisch ermittelt)")
+    argparser.add_argument("--duration", type=float, default=5.0, help="Dauer eines Laufs in Sekunden")
+    argparser.add_argument("--output", help="Ergebnisdatei (Standard: stdout)")
+    args = argparser.parse_args()
+
+    tracefs = TraceFS(args.root)
+    if (not tracefs.is_system or os.geteuid() != 0):
+        sys.exit("bench_scope.py needs root and the tracefs of the kernel ({})".format(tracefs.root))
+
+    results = {
+        "unscoped": run(tracefs, args.duration, scoped=False),
+        "scoped": run(tracefs, args.duration, scoped=True),
+    }
+    for name, result in results.items():
+        print("{:<10} {:>9,} events  {:>10,.0f} events/s  cpu {:6.3f} s".format(name, result["events"], result["events_per_s"], result["cpu_s"]))
+    if (results["scoped"]["cpu_s"]):
+        print("cpu reduction  {:.1f}x".format(results["unscoped"]["cpu_s"] / results["scoped"]["cpu_s"]))
+
+    if (args.output is None):
+        print(json.dumps(results, indent=2))
+        return
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("results written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+'''
+Erzeugt synthetische, realistische trace_pipe-Aufzeichnungen für die Benchmarks.
+
+Aufruf:
+
+  python benchmarks/corpus.py mix 100000 corpus.txt
+
+Verfügbare Korpora: siehe CORPORA.
+'''
+
+import sys
+import socket
+import struct
+import random
+
+
+COMMS = ["bash", "sshd", "sudo", "<...>", "python3", "systemd", "nginx", "kworker/u16:2", "gnome-shell", "containerd-shim"]
+BINARIES = ["/bin/ls", "/usr/bin/git", "/usr/bin/python3", "/usr/sbin/sshd", "/usr/bin/sudo", "/bin/sh", "/usr/bin/curl"]
+WORDS = ["--color=auto", "-la", "status", "-c", "/etc/passwd", "merge", "dev/library", "--verbose", "-o", "out.txt", "https://example.org/", "x" * 64]
+
+
+class CorpusGenerator(object):
+    '''
+    Erzeugt Logzeilen im Format von trace_pipe für die SysCalls der Library.
+    Mit gleichem seed entsteht immer dieselbe Aufzeichnung.
+    '''
+
+    def __init__(self, seed=0, argcount=5):
+        self.random = random.Random(seed)
+        self.argcount = argcount
+        self.timestamp = 1000.0
+        self.next_pid = 3000
+
+    def _header(self, kname, comm=None, pid=None):
+        r = self.random
+        self.timestamp += r.random() * 0.0005
+        comm = comm or r.choice(COMMS)
+        pid = pid or r.randint(300, 40000)
+        return "{:>16}-{:<5} [{:03d}] d... {:.6f}: {}: ".format(comm, pid, r.randint(0, 63), self.timestamp, kname)
+
+    def execve(self):
+        r = self.random
+        argv = [r.choice(BINARIES).rsplit("/", 1)[-1]] + [r.choice(WORDS) for _ in range(r.randint(0, 12))]
+        argv = (argv + ["(fault)"] * self.argcount)[:self.argcount]
+        args = ['"{}"'.format(r.choice(BINARIES))] + [a if a == "(fault)" else '"{}"'.format(a) for a in argv]
+        return self._header("sys_execve_kprobe") + "(SyS_execve+0x0/0x30) " + " ".join(
+            "arg{}={}".format(i + 1, a) for i, a in enumerate(args))
+
+    def _sockaddr(self, kname, syscall):
+        r = self.random
+        info = [0] * 6
+        if (r.random() < 0.7):
+            family = socket.AF_INET
+            ipv4 = struct.unpack("<I", socket.inet_aton(r.choice(["127.0.0.1", "10.0.0.12", "192.168.1.20", "93.184.216.34"])))[0]
+            ipv6 = (0, 0)
+        else:
+            family = socket.AF_INET6
+            ipv4 = 0
+            ipv6 = struct.unpack("<QQ", socket.inet_pton(socket.AF_INET6, r.choice(["::1", "2001:db8::1", "fe80::1"])))
+        port = socket.htons(r.choice([80, 443, 53, 5432, 8080]))
+        values = info + [ipv4, ipv6[0], ipv6[1], family, port]
+        return self._header(kname) + "({}+0x0/0x20) ".format(syscall) + " ".join(
+            "arg{}={}".format(i + 1, v) for i, v in enumerate(values))
+
+    def connect(self):
+        return self._sockaddr("sys_connect_kprobe", "SyS_connect")
+
+    def accept(self):
+        return self._sockaddr("sys_accept_kprobe", "SyS_accept")
+
+    def fork(self):
+        comm = self.random.choice(COMMS)
+        pid = self.random.randint(300, 40000)
+        self.next_pid += 1
+        return self._header("sched_process_fork", comm, pid) + "comm={} pid={} child_comm={} child_pid={}".format(comm, pid, comm, self.next_pid)
+
+    def simple(self):
+        r = self.random
+        kname, syscall, args = r.choice([
+            ("sys_setuid_kprobe", "SyS_setuid", [r.choice([0, 1000])]),
+            ("sys_setgid_kprobe", "SyS_setgid", [r.choice([0, 1000])]),
+            ("sys_setreuid_kprobe", "SyS_setreuid", [1000, 0]),
+            ("sys_kill_kprobe", "SyS_kill", [r.randint(300, 40000), 15]),
+            ("sys_tkill_kprobe", "SyS_tkill", [r.randint(300, 40000), 9]),
+            ("sys_exit_group_kprobe", "SyS_exit_group", [0]),
+            ("sys_close_kprobe", "SyS_close", [r.randint(0, 1024)]),
+            ("sys_umask_kprobe", "SyS_umask", [18]),
+        ])
+        return self._header(kname) + "({}+0x0/0x60) ".format(syscall) + " ".join(
+            "arg{}={}".format(i + 1, a) for i, a in enumerate(args))
+
+    def simple_tracepoint(self):
+        '''
+        Wie simple(), aber im Format der Syscall-Tracepoints (sys_enter_<name>): hexadezimale
+        Argumente in der Breite eines Registers.
+        '''
+        r = self.random
+        name, args = r.choice([
+            ("sys_setuid", [("uid", r.choice([0, 1000]))]),
+            ("sys_setgid", [("gid", r.choice([0, 1000]))]),
+            ("sys_setreuid", [("ruid", 1000), ("euid", 0)]),
+            ("sys_kill", [("pid", r.randint(300, 40000)), ("sig", 15)]),
+            ("sys_tkill", [("pid", r.randint(300, 40000)), ("sig", 9)]),
+            ("sys_exit_group", [("error_code", 0)]),
+            ("sys_close", [("fd", r.randint(0, 1024))]),
+            ("sys_umask", [("mask", 18)]),
+        ])
+        return self._header(name)[:-2] + "({})".format(", ".join("{}: {:x}".format(arg, value) for arg, value in args))
+
+    def lines(self, kinds, count):
+        '''
+        Erzeugt count Zeilen (als bytes inklusive b"\\n").
+        kinds ist eine Liste von (Methode, Gewicht).
+        '''
+        funcs = [getattr(self, name) for name, _ in kinds]
+        weights = [weight for _, weight in kinds]
+        for func in self.random.choices(funcs, weights, k=count):
+            yield (func() + "\n").encode()
+
+
+CORPORA = {
+    "execve": [("execve", 1)],
+    "sockaddr": [("connect", 3), ("accept", 1)],
+    "fork": [("fork", 1)],
+    "simple": [("simple", 1)],
+    "tracepoint": [("simple_tracepoint", 1)],
+    "mix": [("execve", 2), ("connect", 3), ("accept", 1), ("fork", 2), ("simple", 4)],
+}
+
+
+def generate(name, count, seed=0, argcount=5):
+    '''
+    Gibt die Zeilen des Korpus name als Liste von bytes zurück.
+    '''
+    return list(CorpusGenerator(seed, argcount).lines(CORPORA[name], count))
+
+
+def main():
+    name = sys.argv[1] if len(sys.argv) > 1 else "mix"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    out = sys.argv[3] if len(sys.argv) > 3 else "corpus_{}.txt".format(name)
+    with open(out, "wb") as f:
+        f.writelines(generate(name, count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+
+import os
+import errno
+import asyncio
+import logging
+from collections import deque
+
+from ftrace.buffers import BufferMonitor
+from ftrace.exceptions import ReadPipeException
+
+
+class AsyncEventStream(object):
+    '''
+    Asynchrone Alternative zu FTrace.get_output() für asyncio:
+
+    .. code:: python
+
+      async with ftrace.get_output_async(idle_timeout=10) as stream:
+          async for data in stream:
+              print(data)
+
+    Der Filedeskriptor von trace_pipe wird mit loop.add_reader() bei der Event-Loop registriert.
+    Sobald Daten anliegen, werden bis zu chunk_size Bytes gelesen und alle darin enthaltenen
+    vollständigen Zeilen auf einmal geparst (ein Batch pro Aufwachen, ohne Thread).
+
+    * Backpressure: liegen mehr als max_pending geparste Events vor, die noch nicht abgeholt
+      wurden, wird der Filedeskriptor abgemeldet, bis der Konsument sie auf die Hälfte abgebaut
+      hat. In dieser Zeit puffert der Ringpuffer des Kernels (siehe buffer_stats()).
+    * Timeouts: idle_timeout beendet den Strom, sobald so viele Sekunden lang keine Events kamen.
+      Einzelne Aufrufe können mit asyncio.wait_for() begrenzt werden.
+    * Abbruch: wird der wartende Task abgebrochen, bleibt der Strom benutzbar; stop() bzw.
+      aclose() beenden ihn. Bereits geparste Events werden danach noch ausgegeben.
+
+    Mit batches() werden statt einzelner Events Listen aller bereits geparsten Events zurückgegeben.
+    '''
+
+    def __init__(self, path, parser, tracefs=None, chunk_size=65536, idle_timeout=None, max_pending=10000,
+                 on_lost=None, stats_interval=1.0, loop=None):
+        self.path = path
+        self.parser = parser
+        self.tracefs = tracefs
+        self.chunk_size = chunk_size
+        self.idle_timeout = idle_timeout
+        self.max_pending = max_pending
+        self.on_lost = on_lost
+        self.stats_interval = stats_interval
+        self.monitor = None
+        self._loop = loop
+
+        self.bytes_read = 0
+        self.lines_read = 0
+        self.events = 0
+        self.wakeups = 0
+        self.pauses = 0
+        '''Anzahl der Unterbrechungen durch Backpressure'''
+
+        self._fd = None
+        self._rest = b""
+        self._pending = deque()
+        self._waiter = None
+        self._paused = False
+        self._eof = False
+        self._stopped = False
+        self._error = None
+
+    @property
+    def loop(self):
+        if (self._loop is None):
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    async def open(self):
+        '''
+        Öffnet trace_pipe. Ein FIFO (Nachbildung) wird erst geöffnet, wenn ein Schreiber vorhanden ist;
+        darauf wird in einem Thread gewartet, damit die Event-Loop nicht blockiert.
+        Ein beendeter Strom wird nicht wieder geöffnet.
+        '''
+        if (self._fd is not None or self._stopped):
+            return
+        try:
+            fd = await self.loop.run_in_executor(None, os.open, self.path, os.O_RDONLY)
+            os.set_blocking(fd, False)
+        except OSError as e:
+            raise ReadPipeException("Unable to open {}: {}".format(self.path, e))
+        self._fd = fd
+
+        if (self.tracefs is not None):
+            self.monitor = BufferMonitor(self.tracefs, interval=self.stats_interval, callback=self.on_lost)
+            if (hasattr(self.parser, "on_lost")):
+                self.parser.on_lost = self.monitor.report
+        if (not self._stopped):
+            self.loop.add_reader(fd, self._on_readable)
+
+    def _on_readable(self):
+        self.wakeups += 1
+        try:
+            data = os.read(self._fd, self.chunk_size)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            if (e.errno in (errno.EAGAIN, errno.EINTR)):
+                return
+            self._error = ReadPipeException("Unable to read {}: {}".format(self.path, e))
+            self._finish()
+            return
+
+        if (not data):  # EOF, z.B. Schreiber eines FIFOs hat geschlossen
+            logging.debug("AsyncEventStream reached EOF of {}".format(self.path))
+            if (self._rest):
+                self._parse([self._rest])
+                self._rest = b""
+            self._finish()
+            return
+
+        self.bytes_read += len(data)
+        if (self._rest):
+            data = self._rest + data
+        lines = data.split(b"\n")
+        self._rest = lines.pop()
+        self._parse([line + b"\n" for line in lines])
+
+        if (self.monitor is not None and self.monitor.due()):
+            self.monitor.poll()
+        if (len(self._pending) >= self.max_pending):
+            self._pause()
+        self._wake()
+
+    def _parse(self, lines):
+        parse = self.parser.parse
+        pending = self._pending
+        count = len(pending)
+        for line in lines:
+            value_dict = parse(line)
+            if (value_dict):
+                pending.append(value_dict)
+        self.lines_read += len(lines)
+        self.events += len(pending) - count
+
+    def _pause(self):
+        if (not self._paused and self._fd is not None):
+            self.loop.remove_reader(self._fd)
+            self._paused = True
+            self.pauses += 1
+
+    def _resume(self):
+        if (self._paused and not self._eof and not self._stopped):
+            self.loop.add_reader(self._fd, self._on_readable)
+            self._paused = False
+
+    def _wake(self):
+        waiter = self._waiter
+        if (waiter is not None and not waiter.done()):
+            waiter.set_result(None)
+
+    def _finish(self):
+        self._eof = True
+        if (self._fd is not None and not self._paused):
+            self.loop.remove_reader(self._fd)
+        self._paused = False
+        self._wake()
+
+    async def _wait(self):
+        '''
+        Wartet, bis Events vorliegen oder der Strom endet.
+        Gibt False zurück, wenn idle_timeout abgelaufen ist.
+        '''
+        await self.open()
+        while (not self._pending and not self._eof and not self._stopped):
+            self._waiter = self.loop.create_future()
+            try:
+                if (self.idle_timeout is None):
+                    await self._waiter
+                else:
+                    await asyncio.wait_for(self._waiter, self.idle_timeout)
+            except asyncio.TimeoutError:
+                logging.debug("AsyncEventStream idle timeout on {}".format(self.path))
+                return False
+            finally:
+                self._waiter = None
+        return True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if (not self._pending and not await self._wait()):
+            await self.aclose()
+            raise StopAsyncIteration
+        if (self._pending):
+            value_dict = self._pending.popleft()
+            if (self._paused and len(self._pending) <= self.max_pending // 2):
+                self._resume()
+            return value_dict
+        if (self._error is not None):
+            error, self._error = self._error, None
+            raise error
+        await self.aclose()
+        raise StopAsyncIteration
+
+    async def next_batch(self):
+        '''
+        Gibt alle bereits geparsten Events als Liste zurück (wartet, falls keine vorliegen),
+        bzw. eine leere Liste, wenn der Strom beendet ist.
+        '''
+        if (not self._pending and not await self._wait()):
+            await self.aclose()
+            return []
+        batch = list(self._pending)
+        self._pending.clear()
+        self._resume()
+        if (not batch):
+            if (self._error is not None):
+                error, self._error = self._error, None
+                raise error
+            await self.aclose()
+        return batch
+
+    def batches(self):
+        '''
+        Asynchroner Iterator über Batches (Listen von Events), siehe next_batch().
+        '''
+        return _BatchIterator(self)
+
+    def stop(self):
+        '''
+        Beendet den Strom. Bereits geparste Events werden noch ausgegeben.
+        Kann auch aus einem anderen Thread aufgerufen werden (z.B. über FTrace.stop()), die Event-Loop
+        meldet den Filedeskriptor dann selbst ab.
+        '''
+        self._stopped = True
+        if (self._loop is None):
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._stop_reading)
+        except RuntimeError:  # Event-Loop bereits geschlossen
+            pass
+
+    def _stop_reading(self):
+        if (self._fd is not None and not self._paused and not self._eof):
+            self._loop.remove_reader(self._fd)
+            self._paused = True
+        self._wake()
+
+    async def aclose(self):
+        '''
+        Beendet den Strom und schließt trace_pipe. Wie bei stop() werden bereits geparste Events
+        noch ausgegeben.
+        '''
+        self._stopped = True
+        if (self._fd is not None):
+            self._stop_reading()
+            if (self.monitor is not None):
+                self.monitor.poll()
+            os.close(self._fd)
+            self._fd = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+        return False
+
+    def stats(self):
+        return {
+            "bytes_read": self.bytes_read,
+            "lines_read": self.lines_read,
+            "events": self.events,
+            "wakeups": self.wakeups,
+            "pauses": self.pauses,
+            "pending": len(self._pending),
+        }
+
+
+class _BatchIterator(object):
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        batch = await self.stream.next_batch()
+        if (not batch):
+            raise StopAsyncIteration
+        return batch
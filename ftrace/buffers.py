@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import math
+import time
+import logging
+
+
+LOST_FIELDS = ("overrun", "commit overrun", "dropped events")
+'''
+Zähler in per_cpu/cpuN/stats, die verlorene Events angeben:
+
+* overrun: vom Kernel überschriebene, noch nicht gelesene Events (Puffer voll)
+* commit overrun: verlorene Events, weil zu viele verschachtelte Events geschrieben wurden
+* dropped events: verworfene Events, weil der Puffer voll war und nicht überschrieben wird
+'''
+
+
+def parse_cpu_stats(text):
+    '''
+    Wertet den Inhalt von per_cpu/cpuN/stats aus und gibt ein dictionary zurück, z.B.:
+
+    .. code:: python
+
+      {"entries": 12, "overrun": 0, "commit overrun": 0, "bytes": 1024,
+       "oldest event ts": 6788.794592, "now ts": 6794.882801, "dropped events": 0, "read events": 130}
+    '''
+    stats = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition(":")
+        if (not sep):
+            continue
+        value = value.strip()
+        try:
+            stats[key.strip()] = int(value)
+        except ValueError:
+            try:
+                stats[key.strip()] = float(value)
+            except ValueError:
+                stats[key.strip()] = value
+    return stats
+
+
+def estimate_buffer_size_kb(events_per_s, cpus=1, seconds=2.0, event_size=128, minimum=64):
+    '''
+    Schätzt die nötige Größe des Ringpuffers (buffer_size_kb, pro CPU), um bei einer erwarteten Rate
+    von events_per_s Events pro Sekunde (über alle CPUs) seconds Sekunden ohne Lesen zu überbrücken.
+    event_size ist die durchschnittliche Größe eines Events im Puffer in Bytes.
+    '''
+    per_cpu = float(events_per_s) / max(cpus, 1)
+    return max(minimum, int(math.ceil(per_cpu * seconds * event_size / 1024.0)))
+
+
+class LostEvents(object):
+    '''
+    Beschreibt verlorene Events, wie sie an den Callback des BufferMonitors übergeben werden.
+
+    * source: "stats" (aus per_cpu/cpuN/stats) bzw. "pipe" (Meldung "[LOST n EVENTS]" in trace_pipe)
+    * cpu: betroffene CPU
+    * count: Anzahl der neu verlorenen Events
+    * total: Anzahl aller bisher verlorenen Events (aus derselben Quelle)
+    '''
+
+    __slots__ = ("source", "cpu", "count", "total")
+
+    def __init__(self, source, cpu, count, total):
+        self.source = source
+        self.cpu = cpu
+        self.count = count
+        self.total = total
+
+    def __repr__(self):
+        return "LostEvents(source={!r}, cpu={}, count={}, total={})".format(self.source, self.cpu, self.count, self.total)
+
+
+class BufferMonitor(object):
+    '''
+    Liest in regelmäßigen Abständen per_cpu/cpuN/stats eines `TraceFS <#module-ftrace.tracefs>`_ aus
+    und zählt verlorene Events (siehe LOST_FIELDS). Gehen neue Events verloren, wird callback
+    mit einer LostEvents-Instanz aufgerufen.
+
+    FTrace.get_output() ruft poll() zwischen den Events auf, sobald interval Sekunden vergangen sind;
+    der Callback wird also im Strom der Events aufgerufen, in dem die Lücke entstanden ist.
+    Die vom Parser erkannten Meldungen "[LOST n EVENTS]" werden über report() gezählt.
+    '''
+
+    def __init__(self, tracefs, cpus=None, interval=1.0, callback=None):
+        self.tracefs = tracefs
+        self.cpus = cpus if cpus is not None else tracefs.cpus()
+        self.interval = interval
+        self.callback = callback
+
+        self.lost_events = 0
+        '''Anzahl der laut per_cpu/cpuN/stats verlorenen Events seit dem Start des Monitors'''
+        self.reported_lost_events = 0
+        '''Anzahl der in trace_pipe gemeldeten verlorenen Events'''
+        self.cpu_stats = {}
+        '''zuletzt gelesene Werte von per_cpu/cpuN/stats, {cpu: dictionary}'''
+
+        self._baseline = {}
+        self._next_poll = 0.0
+        self.poll(notify=False)  # bisherige Verluste (vor dem Start) nicht mitzählen
+
+    def read(self, cpu):
+        try:
+            return parse_cpu_stats(self.tracefs.file("per_cpu", "cpu{}".format(cpu), "stats").read())
+        except (OSError, IOError):
+            return {}
+        except Exception as e:
+            logging.debug("reading stats of cpu {} failed: {}".format(cpu, e))
+            return {}
+
+    def due(self):
+        '''
+        Gibt an, ob seit dem letzten poll() interval Sekunden vergangen sind.
+        '''
+        return time.monotonic() >= self._next_poll
+
+    def poll(self, notify=True):
+        '''
+        Liest die Zähler aller CPUs und gibt die Anzahl der seit dem letzten Aufruf verlorenen Events zurück.
+        '''
+        self._next_poll = time.monotonic() + self.interval
+        new = 0
+        for cpu in self.cpus:
+            stats = self.cpu_stats[cpu] = self.read(cpu)
+            lost = sum(stats.get(field, 0) for field in LOST_FIELDS)
+            previous = self._baseline.get(cpu)
+            self._baseline[cpu] = lost
+            if (previous is None or lost <= previous):
+                continue  # erster Aufruf bzw. Zähler zurückgesetzt (z.B. durch Leeren des Puffers)
+            delta = lost - previous
+            new += delta
+            self.lost_events += delta
+            if (notify and self.callback is not None):
+                self.callback(LostEvents("stats", cpu, delta, self.lost_events))
+        return new
+
+    def report(self, cpu, count):
+        '''
+        Zählt eine Meldung "[LOST n EVENTS]" aus trace_pipe.
+        '''
+        self.reported_lost_events += count
+        if (self.callback is not None):
+            self.callback(LostEvents("pipe", cpu, count, self.reported_lost_events))
+
+    def stats(self):
+        '''
+        Gibt die Zähler zurück:
+
+        .. code:: python
+
+          {"lost_events": 0, "reported_lost_events": 0, "entries": 12, "cpus": {0: {...}, 1: {...}}}
+        '''
+        return {
+            "lost_events": self.lost_events,
+            "reported_lost_events": self.reported_lost_events,
+            "entries": sum(stats.get("entries", 0) for stats in self.cpu_stats.values()),
+            "cpus": dict(self.cpu_stats),
+        }
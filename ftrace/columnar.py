@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+import time
+from array import array
+from collections import OrderedDict
+
+from ftrace.syscallparam import SysCallParam
+
+
+def _typecode(param_type):
+    '''
+    Gibt den Typcode des arrays für einen SysCallParam zurück, "str" für Strings bzw. None für
+    Werte, die als Python-Objekte gespeichert werden.
+    '''
+    config = param_type.value
+    if (config.convert is int):
+        return "Q" if config.format_string.endswith(":u64") else "q"
+    if (config.convert is float):
+        return "d"
+    if (config.convert is str):
+        return "str"
+    return None
+
+
+class StringColumn(object):
+    '''
+    Spalte mit Strings im Layout offsets + bytes: der i-te String steht UTF-8-kodiert in
+    data[offsets[i]:offsets[i + 1]]. offsets ist ein array("q") mit einem Eintrag mehr als Zeilen.
+    '''
+
+    def __init__(self):
+        self.offsets = array("q", [0])
+        self.data = bytearray()
+
+    def append(self, value):
+        if (value.__class__ is not bytes):
+            value = value.encode("utf-8", "surrogateescape")
+        self.data += value
+        self.offsets.append(len(self.data))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if (i < 0):
+            i += len(self)
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8", "backslashreplace")
+
+    def tolist(self):
+        return [self[i] for i in range(len(self))]
+
+
+class ListColumn(object):
+    '''
+    Spalte mit Listen (z.B. argv): die Elemente aller Zeilen stehen hintereinander in values
+    (array bzw. StringColumn), die i-te Liste ist values[offsets[i]:offsets[i + 1]].
+    '''
+
+    def __init__(self, values):
+        self.offsets = array("q", [0])
+        self.values = values
+
+    def append(self, value):
+        start = len(self.values)
+        try:
+            for element in value:
+                self.values.append(element)
+        except Exception:
+            self._truncate(start)
+            raise
+        self.offsets.append(len(self.values))
+
+    def _truncate(self, length):
+        values = self.values
+        if (isinstance(values, StringColumn)):
+            del values.data[values.offsets[length]:]
+            del values.offsets[length + 1:]
+        else:
+            del values[length:]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if (i < 0):
+            i += len(self)
+        return [self.values[j] for j in range(self.offsets[i], self.offsets[i + 1])]
+
+    def tolist(self):
+        return [self[i] for i in range(len(self))]
+
+
+def _column(typecode, is_list=False):
+    if (typecode is None):
+        column = []
+    elif (typecode == "str"):
+        column = StringColumn()
+    else:
+        column = array(typecode)
+    return ListColumn(column) if is_list and typecode is not None else column
+
+
+class ColumnBatch(object):
+    '''
+    Die Events eines SysCalls (kname) in Spalten, eine Spalte pro Feld:
+
+    * Zahlen (pid_t, uid_t, int_t, long_t, ...) als array("q") bzw. array("Q") für u64
+    * timestamp als array("d") in Sekunden, bzw. mit timestamp_ns=True als array("q") in Nanosekunden
+    * Strings als StringColumn (offsets + bytes)
+    * Listen (z.B. argv) als ListColumn
+    * alles andere (z.B. "adress" bei Sys_Connect) als Liste von Python-Objekten
+
+    arrays unterstützen das Buffer-Protokoll und lassen sich ohne Kopie z.B. mit
+    ``numpy.frombuffer(batch["caller_pid"], dtype="int64")`` weiterverarbeiten.
+    '''
+
+    def __init__(self, kname, columns):
+        self.kname = kname
+        self.columns = columns
+        '''OrderedDict {Feld: Spalte}'''
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __repr__(self):
+        return "ColumnBatch(kname={!r}, rows={}, columns={})".format(self.kname, len(self), list(self.columns))
+
+    def rows(self):
+        '''
+        Generator, der die Zeilen wieder als dictionaries zurückgibt (z.B. zum Testen).
+        '''
+        names = list(self.columns)
+        columns = list(self.columns.values())
+        for i in range(len(self)):
+            row = {}
+            for name, column in zip(names, columns):
+                value = column[i]
+                if (name == "timestamp" and column.__class__ is array and column.typecode == "q"):
+                    value = value / 1e9
+                row[name] = value
+            yield row
+
+
+class ColumnBuilder(object):
+    '''
+    Sammelt die Events eines SysCalls in Spalten. Die Typen der Spalten ergeben sich aus den
+    STANDARD_FIELDS und PARAMS des SysCalls; Felder ohne bekannten Typ werden als Python-Objekte
+    gespeichert. Lässt sich ein Wert nicht im array speichern, wird die Spalte dafür in eine Liste
+    umgewandelt.
+    '''
+
+    def __init__(self, kname, syscall=None, timestamp_ns=False):
+        self.kname = kname
+        self.timestamp_ns = timestamp_ns
+        self.types = OrderedDict()
+        if (syscall is not None):
+            for name, typ in syscall.STANDARD_FIELDS.items():
+                self.types[name] = (_typecode(typ), False)
+            for name, typ in syscall.valid_params.items():
+                if (isinstance(typ, SysCallParam)):
+                    self.types[name] = (_typecode(typ), typ.value.is_list)
+        if (timestamp_ns):
+            self.types["timestamp"] = ("q", False)
+        self.started = None
+        '''time.monotonic() beim ersten Event des aktuellen Batches'''
+        self._reset()
+
+    def _reset(self):
+        self.columns = OrderedDict()
+        self._appenders = None
+        self.started = None
+
+    def _prepare(self, event):
+        for name in event:
+            typecode, is_list = self.types.get(name, (None, False))
+            self.columns[name] = _column(typecode, is_list)
+        self._appenders = [(name, column.append) for name, column in self.columns.items()]
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def append(self, event):
+        if (self._appenders is None):
+            self._prepare(event)
+            self.started = time.monotonic()
+        for name, append in self._appenders:
+            value = event[name]
+            if (name == "timestamp" and self.timestamp_ns):
+                value = int(round(value * 1e9))
+            try:
+                append(value)
+            except (TypeError, OverflowError, AttributeError):
+                self._to_objects(name)
+                self.columns[name].append(value)
+
+    def _to_objects(self, name):
+        column = self.columns[name]
+        self.columns[name] = column.tolist() if hasattr(column, "tolist") else list(column)
+        self._appenders = [(field, self.columns[field].append) for field in self.columns]
+
+    def build(self):
+        '''
+        Gibt die gesammelten Events als ColumnBatch zurück und beginnt einen neuen Batch.
+        '''
+        batch = ColumnBatch(self.kname, self.columns)
+        self._reset()
+        return batch
+
+
+class ColumnBatcher(object):
+    '''
+    Verteilt Events auf einen ColumnBuilder pro SysCall (kname) und gibt einen ColumnBatch zurück,
+    sobald ein SysCall batch_size Events gesammelt hat bzw. sein ältestes Event max_delay Sekunden
+    alt ist (siehe due() und flush()).
+
+    .. code:: python
+
+      batcher = ColumnBatcher(tracer.parser.syscalls, batch_size=4096)
+      for data in events:
+          batch = batcher.add(data)
+          if (batch is not None):
+              ...
+      remaining = batcher.flush()
+    '''
+
+    def __init__(self, syscalls=None, batch_size=4096, max_delay=0.1, timestamp_ns=False):
+        self.syscalls = syscalls if syscalls is not None else {}
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.timestamp_ns = timestamp_ns
+        self.batches = 0
+        self.events = 0
+        self._builders = {}
+
+    def add(self, event):
+        kname = event["kname"]
+        builder = self._builders.get(kname)
+        if (builder is None):
+            builder = self._builders[kname] = ColumnBuilder(kname, self.syscalls.get(kname), self.timestamp_ns)
+        builder.append(event)
+        self.events += 1
+        if (len(builder) >= self.batch_size):
+            self.batches += 1
+            return builder.build()
+        return None
+
+    def due(self):
+        '''
+        Gibt an, ob ein Batch seit max_delay Sekunden auf weitere Events wartet.
+        '''
+        if (self.max_delay is None):
+            return False
+        deadline = time.monotonic() - self.max_delay
+        return any(builder.started is not None and builder.started <= deadline for builder in self._builders.values())
+
+    def flush(self, expired_only=False):
+        '''
+        Gibt alle (mit expired_only=True nur die seit max_delay Sekunden wartenden) nicht leeren
+        Batches zurück.
+        '''
+        deadline = time.monotonic() - (self.max_delay or 0.0)
+        batches = []
+        for builder in self._builders.values():
+            if (builder.started is None or (expired_only and builder.started > deadline)):
+                continue
+            batches.append(builder.build())
+        self.batches += len(batches)
+        return batches
+
+    def stats(self):
+        return {"batches": self.batches, "events": self.events}
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+from collections.abc import Mapping
+
+
+_UNSET = object()
+'''Platzhalter für ein noch nicht umgewandeltes Feld'''
+
+
+class _LazyField(object):
+    '''
+    Deskriptor eines Feldes einer Event-Klasse: der Wert wird beim ersten Zugriff mit load(event)
+    aus den Rohdaten erzeugt und in event._values[index] zwischengespeichert.
+    '''
+    __slots__ = ("name", "index", "load")
+
+    def __init__(self, name, index, load):
+        self.name = name
+        self.index = index
+        self.load = load
+
+    def __get__(self, event, cls=None):
+        if (event is None):
+            return self
+        values = event._values
+        value = values[self.index]
+        if (value is _UNSET):
+            value = values[self.index] = self.load(event)
+        return value
+
+    def __set__(self, event, value):
+        event._values[self.index] = value
+
+
+class Event(Mapping):
+    '''
+    Parent-Klasse der Event-Klassen, die für jeden SysCall erstellt werden (siehe make_event_class()).
+
+    Ein Event speichert nur die Rohdaten (STANDARD_FIELDS als parts, Argumente als args) in Slots;
+    die Namen der Felder stehen einmal in der Klasse (_fields). Umgewandelt wird ein Feld erst beim
+    ersten Zugriff, danach ist der Wert in einer Liste (_values, mit _UNSET vorbelegt) zwischengespeichert.
+
+    Statt args kann auch die Logzeile (line) samt Position der Argumente (pos) und einer Funktion
+    split(line, pos) übergeben werden, die die Argumente ausliest. Das geschieht dann erst beim
+    ersten Zugriff auf ein Argument; wird nur auf die STANDARD_FIELDS zugegriffen (z.B. in einem
+    Filter auf caller_pid), werden die Argumente nie ausgewertet. Danach wird die Logzeile freigegeben.
+
+    Zugriff ist per Attribut oder wie auf ein dictionary möglich:
+
+    .. code:: python
+
+      event.caller_pid
+      event["caller_pid"]
+      event.to_dict()  # {'caller_name': ..., 'caller_pid': ..., ...}
+
+    Events sind gleich einem dictionary mit denselben Feldern und Werten.
+    '''
+    __slots__ = ("_parts", "_args", "_q", "_line", "_pos", "_split", "_values")
+
+    _fields = ()
+    _empty = []
+
+    def __init__(self, parts, args=None, unquote=False, line=None, pos=0, split=None):
+        self._parts = parts
+        self._q = unquote
+        self._values = self._empty[:]
+        if (split is None):
+            self._args = args
+        else:
+            self._line = line
+            self._pos = pos
+            self._split = split
+
+    def __getattr__(self, name):
+        # nur für nicht gesetzte Slots aufgerufen, also für _args eines Events mit split
+        if (name != "_args"):
+            raise AttributeError(name)
+        try:
+            split = self._split
+        except AttributeError:
+            raise AttributeError(name)
+        args = split(self._line, self._pos)
+        if (args is None):
+            raise ValueError("unable to parse arguments of {}: {!r}".format(self.__class__.__name__, self._line))
+        self._args = args
+        del self._line, self._pos, self._split
+        return args
+
+    def __getitem__(self, key):
+        if (key not in self._fieldset):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if (key not in self._fieldset):
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __contains__(self, key):
+        return key in self._fieldset
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, ", ".join("{}={!r}".format(name, getattr(self, name)) for name in self._fields))
+
+    def __reduce__(self):
+        return (dict, (self.to_dict(),))  # die Klassen werden zur Laufzeit erstellt und sind nicht importierbar
+
+    def to_dict(self):
+        '''
+        Gibt das Event als dictionary zurück, wie es der Parser ohne Event-Klassen liefert.
+        '''
+        return {name: getattr(self, name) for name in self._fields}
+
+    def raw(self, name):
+        '''
+        Gibt die Rohdaten eines Feldes ohne Umwandlung zurück (bytes bzw. Liste von bytes, falls
+        aus trace_pipe gelesen).
+        '''
+        return self._raw_loaders[name](self)
+
+
+def make_event_class(name, fields, raw_loaders=None):
+    '''
+    Erstellt eine Event-Klasse. fields ist eine Liste von (Name, load), wobei load(event) den
+    umgewandelten Wert eines Feldes aus event._parts und event._args erzeugt.
+    raw_loaders ist ein dictionary {Name: Funktion}, das die Rohdaten liefert (siehe Event.raw()).
+    '''
+    names = tuple(field for field, _ in fields)
+    namespace = {
+        "__slots__": (),
+        "__module__": __name__,
+        "_fields": names,
+        "_fieldset": frozenset(names),
+        "_empty": [_UNSET] * len(names),
+        "_raw_loaders": raw_loaders or {},
+    }
+    for index, (field, load) in enumerate(fields):
+        namespace[field] = _LazyField(field, index, load)
+    return type(name, (Event,), namespace)
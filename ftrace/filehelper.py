@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-import os.path
+import os
 import logging
 
 from ftrace.exceptions import WriteFileException, ReadFileException
@@ -28,19 +28,14 @@ class PWDFile(object):
             txt = val
         elif (isinstance(val, list)):
             for element in val:
-                txt += str(val)
+                txt += str(element)
         else:
             raise WriteFileException("Unable to write to " + self.path + " -> Value must be boolean , string or list of strings" + type(val) + " given")
 
         try:
             with open(self.path, writing_mode) as f:
-                print(self.path)
-                print(os.path.exists(self.path))
                 f.write(txt)
         except FileNotFoundError:
-            print("-------------------------------------")
-            print(writing_mode)
-            print(self.path)
             raise
         except Exception:
             raise WriteFileException("Unable to write to {} with mode \"{}\"-> Value: {}".format(self.path, writing_mode, val))
@@ -59,6 +54,30 @@ class PWDFile(object):
         '''
         self.edit(val, "a")
 
+    def append_lines(self, lines):
+        '''
+        Hängt mehrere Zeilen mit einem einzigen write() an ein File an, ohne es
+        zuvor zu leeren (O_APPEND, kein O_TRUNC).
+        Das ist z.B. für kprobe_events notwendig, das bei O_TRUNC alle KProbes entfernt.
+        '''
+        txt = "".join("{}\n".format(line) for line in lines)
+        logging.debug("appending to file {}: {}".format(self.path, txt))
+        if (not txt):
+            return
+
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            raise WriteFileException("Unable to open {}".format(self.path))
+        try:
+            os.write(fd, txt.encode())
+        except OSError as e:
+            raise WriteFileException("Unable to append to {} -> {}: {}".format(self.path, txt, e))
+        finally:
+            os.close(fd)
+
     def read_bool(self):
         '''
         Liest ein File aus und gibt in Abhängigkeit vom Inhalt True oder False zurück.
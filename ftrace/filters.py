@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+
+import abc
+import logging
+import operator
+from fnmatch import fnmatchcase
+
+
+HEADER_FIELDS = frozenset(["caller_name", "caller_pid", "timestamp", "kname"])
+'''
+Felder, die bereits im Kopf einer Logzeile (bzw. eines Events im Ringpuffer) stehen.
+Prädikate, die nur diese Felder verwenden, werden vor dem Dekodieren der Argumente ausgewertet.
+'''
+
+_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "~": lambda value, pattern: fnmatchcase(value, pattern),
+}
+
+_STRING_OPERATORS = frozenset(["==", "!=", "~"])
+'''Operatoren, die der Kernel für String-Felder unterstützt'''
+
+
+class Field(object):
+    '''
+    Ein Feld der Ausgabe eines SysCalls (PARAMS oder STANDARD_FIELDS), aus dem mit
+    Vergleichsoperatoren Prädikate für Filter gebildet werden:
+
+    .. code:: python
+
+      Field("uid") == 0
+      (Field("caller_pid") != os.getpid()) & ~Field("filename").glob("/proc/*")
+      Field("sig").isin([9, 15])
+      Field("argv").test(lambda argv: "--debug" in argv)  # wird nur in Python ausgewertet
+    '''
+
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, value):
+        return Compare(self.name, "==", value)
+
+    def __ne__(self, value):
+        return Compare(self.name, "!=", value)
+
+    def __lt__(self, value):
+        return Compare(self.name, "<", value)
+
+    def __le__(self, value):
+        return Compare(self.name, "<=", value)
+
+    def __gt__(self, value):
+        return Compare(self.name, ">", value)
+
+    def __ge__(self, value):
+        return Compare(self.name, ">=", value)
+
+    __hash__ = object.__hash__
+
+    def glob(self, pattern):
+        '''
+        Vergleich mit einem Muster mit Platzhaltern (*, ?, [...]), wie der Operator '~' des Kernels.
+        '''
+        return Compare(self.name, "~", pattern)
+
+    def isin(self, values):
+        predicate = None
+        for value in values:
+            predicate = Compare(self.name, "==", value) if predicate is None else predicate | Compare(self.name, "==", value)
+        if (predicate is None):
+            raise ValueError("isin() requires at least one value")
+        return predicate
+
+    def test(self, func):
+        '''
+        Beliebige Funktion func(wert) -> bool. Kann nicht im Kernel ausgewertet werden.
+        '''
+        return Test(self.name, func)
+
+
+class Predicate(abc.ABC):
+    '''
+    Abstrakte Parent-Klasse aller Prädikate. Prädikate können mit &, | und ~ verknüpft werden.
+    Subklassen müssen fields() und evaluate() implementieren, kernel() ist optional.
+    '''
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    @abc.abstractmethod
+    def fields(self):
+        '''
+        Menge der Felder, die das Prädikat verwendet.
+        '''
+
+    @abc.abstractmethod
+    def evaluate(self, values):
+        '''
+        Wertet das Prädikat auf einem dictionary (Ausgabe des Parsers) aus.
+        '''
+
+    def kernel(self, fields):
+        '''
+        Gibt das Prädikat in der Syntax der Filter des Kernelfeatures FTrace zurück, bzw. None,
+        falls das nicht möglich ist. fields ist das Ergebnis von SysCall.filter_fields().
+        '''
+        return None
+
+
+class Compare(Predicate):
+    def __init__(self, field, op, value):
+        self.field = field
+        self.op = op
+        self.value = value
+        self._func = _OPERATORS[op]
+
+    def __repr__(self):
+        return "({} {} {!r})".format(self.field, self.op, self.value)
+
+    def fields(self):
+        return {self.field}
+
+    def evaluate(self, values):
+        value = values.get(self.field)
+        if (value is None):
+            return False
+        try:
+            return bool(self._func(value, self.value))
+        except TypeError:
+            return False
+
+    def kernel(self, fields):
+        field = fields.get(self.field)
+        if (field is None):
+            return None
+        name, is_string = field
+
+        if (is_string):
+            if (self.op not in _STRING_OPERATORS or not isinstance(self.value, str) or '"' in self.value):
+                return None
+            return '{} {} "{}"'.format(name, self.op, self.value)
+
+        if (self.op == "~" or isinstance(self.value, bool) or not isinstance(self.value, int)):
+            return None
+        return "{} {} {}".format(name, self.op, self.value)
+
+
+class Test(Predicate):
+    def __init__(self, field, func):
+        self.field = field
+        self.func = func
+
+    def __repr__(self):
+        return "({}.test({!r}))".format(self.field, self.func)
+
+    def fields(self):
+        return {self.field}
+
+    def evaluate(self, values):
+        return bool(self.func(values.get(self.field)))
+
+
+class And(Predicate):
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def __repr__(self):
+        return "({})".format(" & ".join(repr(p) for p in self.predicates))
+
+    def fields(self):
+        return set().union(*(p.fields() for p in self.predicates))
+
+    def evaluate(self, values):
+        return all(p.evaluate(values) for p in self.predicates)
+
+    def kernel(self, fields):
+        parts = [p.kernel(fields) for p in self.predicates]
+        if (None in parts):
+            return None
+        return "({})".format(" && ".join(parts))
+
+    def conjuncts(self):
+        '''
+        Liste aller Prädikate, die mit & verknüpft sind (verschachtelte And aufgelöst).
+        '''
+        result = []
+        for predicate in self.predicates:
+            result.extend(predicate.conjuncts() if isinstance(predicate, And) else [predicate])
+        return result
+
+
+class Or(Predicate):
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def __repr__(self):
+        return "({})".format(" | ".join(repr(p) for p in self.predicates))
+
+    def fields(self):
+        return set().union(*(p.fields() for p in self.predicates))
+
+    def evaluate(self, values):
+        return any(p.evaluate(values) for p in self.predicates)
+
+    def kernel(self, fields):
+        parts = [p.kernel(fields) for p in self.predicates]
+        if (None in parts):
+            return None
+        return "({})".format(" || ".join(parts))
+
+
+class Not(Predicate):
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    def __repr__(self):
+        return "~{!r}".format(self.predicate)
+
+    def fields(self):
+        return self.predicate.fields()
+
+    def evaluate(self, values):
+        return not self.predicate.evaluate(values)
+
+    def kernel(self, fields):
+        part = self.predicate.kernel(fields)
+        if (part is None):
+            return None
+        return "!({})".format(part)
+
+
+def _all(predicates):
+    if (not predicates):
+        return None
+    if (len(predicates) == 1):
+        return predicates[0].evaluate
+    return And(*predicates).evaluate
+
+
+class EventFilter(object):
+    '''
+    Der für einen SysCall kompilierte Filter (siehe SysCall.filter).
+
+    Das Prädikat wird an den &-Verknüpfungen aufgeteilt:
+
+    * Teile, die sich in der Syntax des Kernels ausdrücken lassen, werden in
+      events/kprobes/<kname>/filter geschrieben (kernel_filter). Solche Events erscheinen gar nicht
+      erst in trace_pipe.
+    * Teile, die nur Felder aus dem Kopf der Logzeile verwenden (HEADER_FIELDS), werden vor dem
+      Dekodieren der Argumente in Python ausgewertet (Vorfilter).
+    * alle übrigen Teile nach dem Dekodieren (Nachfilter).
+
+    Solange der Kernel den Filter nicht übernommen hat (kernel_applied, z.B. vor dem Setup, wenn
+    er abgelehnt wurde oder beim Abspielen einer Aufzeichnung), wird alles in Python ausgewertet.
+
+    Wie viele Events der Kernel verworfen hat, lässt sich nicht ermitteln; gezählt werden die im
+    Vor- und Nachfilter verworfenen sowie die durchgelassenen Events.
+    '''
+
+    def __init__(self, predicate, fields):
+        self.predicate = predicate
+        conjuncts = predicate.conjuncts() if isinstance(predicate, And) else [predicate]
+
+        kernel = []
+        header = []
+        self._python = []  # Prädikate, die immer in Python ausgewertet werden
+        self._kernel = []  # Prädikate, die (falls kernel_applied) im Kernel ausgewertet werden
+        for conjunct in conjuncts:
+            expr = conjunct.kernel(fields)
+            if (expr is None):
+                self._python.append(conjunct)
+            else:
+                self._kernel.append(conjunct)
+                kernel.append(expr)
+                if (conjunct.fields() <= HEADER_FIELDS):
+                    header.append(expr)
+        self.kernel_filter = " && ".join(kernel) if kernel else None
+        self.header_kernel_filter = " && ".join(header) if header else None
+        '''
+        Der Teil von kernel_filter, der nur comm und common_pid verwendet. Diese Felder hat jedes
+        Event, z.B. auch die Rückkehr aus dem SysCall (siehe write_header()).
+        '''
+
+        self.dropped_prefilter = 0
+        self.dropped_postfilter = 0
+        self.passed = 0
+        self.kernel_applied = False
+
+    @property
+    def kernel_applied(self):
+        return self._kernel_applied
+
+    @kernel_applied.setter
+    def kernel_applied(self, val):
+        self._kernel_applied = val
+        predicates = self._python if val else self._python + self._kernel
+        self._header_check = _all([p for p in predicates if p.fields() <= HEADER_FIELDS])
+        self._check = _all([p for p in predicates if not p.fields() <= HEADER_FIELDS])
+
+    @property
+    def has_header_check(self):
+        return self._header_check is not None
+
+    def accept_header(self, values):
+        '''
+        Vorfilter auf den Feldern des Kopfes (caller_name, caller_pid, timestamp, kname).
+        '''
+        if (self._header_check is None or self._header_check(values)):
+            return True
+        self.dropped_prefilter += 1
+        return False
+
+    def accept(self, value_dict):
+        '''
+        Nachfilter auf dem fertig dekodierten dictionary.
+        '''
+        if (self._check is not None and not self._check(value_dict)):
+            self.dropped_postfilter += 1
+            return False
+        self.passed += 1
+        return True
+
+    def write(self, file):
+        '''
+        Schreibt den Kernel-Teil des Filters in file (PWDFile) bzw. löscht den Filter dort.
+        Lehnt der Kernel den Filter ab, wird er vollständig in Python ausgewertet.
+        '''
+        try:
+            file.write(self.kernel_filter if self.kernel_filter else "0")
+            self.kernel_applied = self.kernel_filter is not None
+        except Exception as e:
+            logging.debug("kernel rejected filter {!r} ({}), filtering in python".format(self.kernel_filter, e))
+            self.kernel_applied = False
+        return self.kernel_applied
+
+    def write_header(self, file):
+        '''
+        Schreibt header_kernel_filter in file (PWDFile) bzw. löscht den Filter dort, z.B. für die
+        Kretprobe bzw. sys_exit_<name> eines SysCalls, deren Events keine Argumente haben. Die Rückkehr
+        wird in Python nicht gefiltert; ein abgelehnter Filter hat daher nur mehr Events zur Folge.
+        '''
+        try:
+            file.write(self.header_kernel_filter if self.header_kernel_filter else "0")
+            return self.header_kernel_filter is not None
+        except Exception as e:
+            logging.debug("kernel rejected filter {!r} ({})".format(self.header_kernel_filter, e))
+            return False
+
+    def stats(self):
+        return {
+            "kernel_filter": self.kernel_filter if self.kernel_applied else None,
+            "dropped_kernel": None,
+            "dropped_prefilter": self.dropped_prefilter,
+            "dropped_postfilter": self.dropped_postfilter,
+            "passed": self.passed,
+        }
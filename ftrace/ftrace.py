@@ -5,6 +5,15 @@ import logging
 from sys import version_info
 
 from ftrace.tracers import Tracer
+from ftrace.reader import PipeReader
+from ftrace.aio import AsyncEventStream
+from ftrace.pipeline import Pipeline
+from ftrace.procpool import ProcessPoolParser
+from ftrace.columnar import ColumnBatcher
+from ftrace.rawbuffer import RawEventDecoder, RawBufferReader, PageHeader, load_formats
+from ftrace.percpu import ParallelRawReader
+from ftrace.tracefs import TraceFS
+from ftrace.buffers import BufferMonitor, estimate_buffer_size_kb
 from ftrace.filehelper import PWDFile
 from ftrace.exceptions import RootRequiredException, WriteFileException, VersionException
 
@@ -21,26 +30,42 @@ class FTrace(object):
       logging.basicConfig(level=logging.DEBUG)
 
     einfügen.
+
+    Mit tracefs kann angegeben werden, wo sich das Dateisystem des Kernelfeatures befindet
+    (Standard: automatisch ermittelt, siehe `TraceFS <#module-ftrace.tracefs>`_).
+    Root-Rechte sind nur für das echte Dateisystem des Kernels notwendig.
     '''
     tracer = None
 
     _setup = False
+    _reader = None
+    _monitor = None
+    _buffer_cpus = None
 
-    _WORKINGDIR = "/sys/kernel/debug/tracing"
-    _file_enable_ftrace = PWDFile("/proc/sys/kernel/ftrace_enabled")
-    _file_activate_ftrace = PWDFile(os.path.join(_WORKINGDIR, "tracing_on"))
-    _file_current_tracer = PWDFile(os.path.join(_WORKINGDIR, "current_tracer"))
-    _file_trace = PWDFile(os.path.join(_WORKINGDIR, "trace"))
-    _file_pipe = PWDFile(os.path.join(_WORKINGDIR, "trace_pipe"))
-    _file_set_kprobes = PWDFile(os.path.join(_WORKINGDIR, "kprobe_events"))
-    _file_enable_all_kprobes = PWDFile(os.path.join(_WORKINGDIR, "events/kprobes/enable"))
+    buffer_size_kb = None
+    '''Größe des Ringpuffers pro CPU, die beim Setup gesetzt wird (None: unverändert), siehe set_buffer_size()'''
+    _scope = None
+    _follow_forks = True
+    _exclude_self = True
 
-    def __init__(self):
+    def __init__(self, tracefs=None):
         logging.debug("initialising FTrace")
 
-        if (os.geteuid() != 0):
+        self.tracefs = tracefs if tracefs is not None else TraceFS.default()
+
+        if (self.tracefs.is_system and os.geteuid() != 0):
             raise RootRequiredException()
 
+        self._file_enable_ftrace = PWDFile(self.tracefs.ftrace_enabled_path)
+        self._file_activate_ftrace = self.tracefs.file("tracing_on")
+        self._file_current_tracer = self.tracefs.file("current_tracer")
+        self._file_trace = self.tracefs.file("trace")
+        self._file_pipe = self.tracefs.file("trace_pipe")
+        self._file_enable_all_kprobes = self.tracefs.file("events/kprobes/enable")
+        self._file_event_pid = self.tracefs.file("set_event_pid")
+        self._file_event_notrace_pid = self.tracefs.file("set_event_notrace_pid")
+        self._file_event_fork = self.tracefs.file("options/event-fork")
+
         if (version_info < (3, 0)):
             raise VersionException("Python-version must be at least 3")
 
@@ -50,13 +75,16 @@ class FTrace(object):
         '''
         Schematischer Ablauf:
 
-        * Wenn Tracer gesetzt ist, resette ihn
+        * Wenn Tracer gesetzt ist, resette ihn (gibt dessen KProbes frei, siehe
+          `KprobeRegistry <#module-ftrace.kprobes>`_)
         * aktiviere Kernelfeature FTrace
         * enable Kernelfeature FTrace
         * leere Ausagabe-File
-        * disable alle KProbes (alle auf einmal, nicht einzeln)
-        * entferne alle KProbes
-        * enable wieder alle KProbes zusammen, sonst ist es später nicht mehr möglich sie einzeln zu enablen
+        * disable alle KProbes in diesem Ringpuffer (alle auf einmal, nicht einzeln)
+        * entferne die Einschränkung auf Prozesse (siehe set_scope())
+
+        kprobe_events wird nicht geleert: die KProbes gelten für alle Instanzen und werden
+        womöglich noch von einer `Session <#module-ftrace.session>`_ verwendet.
         '''
         logging.debug("resetting FTrace")
         try:
@@ -68,9 +96,7 @@ class FTrace(object):
             self._file_trace.write("")
             if (self._file_enable_all_kprobes.exists()):
                 self._file_enable_all_kprobes.write(False)
-            self._file_set_kprobes.write("")
-            if (self._file_enable_all_kprobes.exists()):
-                self._file_enable_all_kprobes.write(True)
+            self._reset_scope()
 
             self._setup = False
         except WriteFileException:
@@ -85,7 +111,9 @@ class FTrace(object):
         * überprüft, ob Tracer gesetzt ist
         * setzt current_tracer im Kernelfeature FTrace
         * enabled Kernelfeature FTrace
+        * setzt die Größe des Ringpuffers (siehe set_buffer_size())
         * aktiviert Kernelfeature FTrace
+        * schränkt die Events auf die Prozesse aus set_scope() ein
         * duchläuft setup von Tracer
         '''
 
@@ -93,26 +121,324 @@ class FTrace(object):
 
         if (not isinstance(self.tracer, Tracer)):
             raise ValueError("FTrace.tracer must be instance of (subclass of) Tracer, {} given".format(type(self.tracer)))
+        if (self.tracer.tracefs is not self.tracefs):
+            self.tracer.tracefs = self.tracefs
 
         self._file_current_tracer.write(self.tracer.name)
         self._file_enable_ftrace.write(True)
+        self._apply_buffer_size()
         self._file_activate_ftrace.write(True)
+        self._apply_scope()
         self.tracer.setup()
 
         self._setup = True
 
         logging.debug("FTrace set up")
 
-    def get_output(self):
+    @property
+    def scope(self):
+        '''
+        Liste der PIDs, auf die die Events eingeschränkt sind, bzw. None (systemweit).
+        Siehe set_scope().
+        '''
+        return self._scope
+
+    def set_scope(self, pids=None, follow_forks=True, exclude_self=True):
+        '''
+        Schränkt die Events auf die Prozesse mit den angegebenen PIDs ein (None: systemweit).
+        Gefiltert wird vom Kernel über set_event_pid, Events anderer Prozesse erscheinen also gar
+        nicht erst in trace_pipe.
+
+        * follow_forks: setzt options/event-fork, sodass Kindprozesse (und Threads) automatisch
+          hinzugefügt werden, sobald sie erstellt werden. Damit wird ein ganzer Prozessbaum getracet
+          (bzw. mit exclude_self auch die Kindprozesse des eigenen Prozesses ausgenommen).
+        * exclude_self: der eigene Prozess (alle Threads) wird nie getracet. Er wird aus pids entfernt
+          und, sofern der Kernel es unterstützt (set_event_notrace_pid, ab Kernel 5.8), auch beim
+          systemweiten Tracen ausgenommen.
+
+        Ist FTrace aufgesetzt, wird die Einschränkung sofort geschrieben, ansonsten beim Setup.
+        '''
+        scope = sorted(set(int(pid) for pid in pids)) if pids is not None else None
+        if (scope is not None and exclude_self and not set(scope) - set(self._own_pids())):
+            raise ValueError("scope contains no pid except the own process")
+        self._scope = scope
+        self._follow_forks = follow_forks
+        self._exclude_self = exclude_self
+        if (self._setup):
+            self._apply_scope()
+
+    @staticmethod
+    def _own_pids():
+        '''
+        PIDs aller Threads des eigenen Prozesses.
+        '''
+        try:
+            return sorted(int(tid) for tid in os.listdir("/proc/self/task"))
+        except OSError:
+            return [os.getpid()]
+
+    def _apply_scope(self):
+        own = set(self._own_pids()) if self._exclude_self else set()
+
+        if (self._scope is not None):
+            pids = [pid for pid in self._scope if pid not in own]
+            if (not pids):
+                raise ValueError("scope contains no pid except the own process")
+            logging.debug("restricting events to pids {}".format(pids))
+            self._file_event_pid.write(" ".join(str(pid) for pid in pids))
+        elif (self._file_event_pid.exists()):
+            self._file_event_pid.write("")
+
+        if (self._file_event_fork.exists()):
+            self._file_event_fork.write(self._follow_forks)
+
+        if (self._file_event_notrace_pid.exists()):
+            self._file_event_notrace_pid.write(" ".join(str(pid) for pid in sorted(own)))
+        elif (own and self._scope is None):
+            logging.debug("set_event_notrace_pid not available, own process is not excluded")
+
+    def _reset_scope(self):
+        for file in (self._file_event_pid, self._file_event_notrace_pid):
+            if (file.exists()):
+                file.write("")
+        if (self._file_event_fork.exists()):
+            self._file_event_fork.write(False)
+
+    def set_buffer_size(self, kb=None, events_per_s=None, seconds=2.0, cpus=None):
+        '''
+        Setzt die Größe des Ringpuffers pro CPU in KB (buffer_size_kb).
+        Statt kb kann die erwartete Rate events_per_s (Events pro Sekunde über alle CPUs) angegeben
+        werden; der Puffer wird dann so groß gewählt, dass er seconds Sekunden überbrückt
+        (siehe `estimate_buffer_size_kb <#module-ftrace.buffers>`_).
+        Mit cpus wird nur der Puffer der angegebenen CPUs geändert (per_cpu/cpuN/buffer_size_kb).
+
+        Ist FTrace aufgesetzt, wird die Größe sofort geschrieben, ansonsten beim Setup.
+        '''
+        if (kb is None):
+            if (events_per_s is None):
+                raise ValueError("either kb or events_per_s is required")
+            kb = estimate_buffer_size_kb(events_per_s, cpus=len(cpus if cpus is not None else self.tracefs.cpus()), seconds=seconds)
+        self.buffer_size_kb = int(kb)
+        self._buffer_cpus = cpus
+        if (self._setup):
+            self._apply_buffer_size()
+
+    def _apply_buffer_size(self):
+        if (self.buffer_size_kb is None):
+            return
+        logging.debug("setting buffer_size_kb to {}".format(self.buffer_size_kb))
+        if (self._buffer_cpus is None):
+            self.tracefs.file("buffer_size_kb").write(str(self.buffer_size_kb))
+        else:
+            for cpu in self._buffer_cpus:
+                self.tracefs.file("per_cpu", "cpu{}".format(cpu), "buffer_size_kb").write(str(self.buffer_size_kb))
+
+    def _monitored(self, events, on_lost, stats_interval):
+        '''
+        Reicht die Events durch und liest zwischendurch (alle stats_interval Sekunden) die Zähler
+        der Ringpuffer aus, siehe `BufferMonitor <#module-ftrace.buffers>`_.
+        '''
+        monitor = self._monitor = BufferMonitor(self.tracefs, interval=stats_interval, callback=on_lost)
+        parser = self.tracer.parser if self.tracer is not None else None
+        if (parser is not None and not hasattr(parser, "on_lost")):
+            parser = None
+        if (parser is not None):
+            previous, parser.on_lost = parser.on_lost, monitor.report
+        try:
+            for value_dict in events:
+                if (monitor.due()):
+                    monitor.poll()
+                yield value_dict
+        finally:
+            monitor.poll()
+            if (parser is not None):
+                parser.on_lost = previous
+
+    def get_output(self, idle_timeout=None, chunk_size=65536, on_lost=None, stats_interval=1.0):
         '''
         Liest die Pipe des Kernelfeatures FTrace aus, parst die eraltenen Zeilen
         und gibt das Ergebnis in Form eines Generators zurück.
+
+        Auf neue Daten wird blockierend gewartet (siehe `PipeReader <#module-ftrace.reader>`_),
+        im Leerlauf wird also keine CPU-Zeit verbraucht.
+        Ist idle_timeout gesetzt, endet der Generator, sobald so viele Sekunden lang
+        keine Daten gelesen wurden. Mit stop() kann er jederzeit beendet werden.
+        Die Zähler des Readers sind während und nach dem Lesen über reader_stats() abrufbar.
+
+        Gehen Events verloren (Ringpuffer übergelaufen), wird on_lost mit einer
+        `LostEvents <#module-ftrace.buffers>`_-Instanz aufgerufen, und zwar zwischen den Events,
+        in deren Strom die Lücke liegt. Die Zähler sind über buffer_stats() abrufbar.
         '''
         logging.debug("reading pipe of FTrace")
-        with open('/sys/kernel/debug/tracing/trace_pipe', 'rb') as trace_pipe:
-            while True:
-                line = trace_pipe.readline()
-                if not line:
-                    continue
+        self._reader = PipeReader(self._file_pipe.path, chunk_size=chunk_size, idle_timeout=idle_timeout)
+        try:
+            for value_dict in self._monitored(self.tracer.parser.parse_lines(self._reader), on_lost, stats_interval):
+                yield value_dict
+        finally:
+            self._reader.close()
 
-                yield self.tracer.parser.parse(line)
+    def get_output_pipelined(self, idle_timeout=None, chunk_size=65536, queue_size=256, overflow="block", sample_every=10,
+                             on_lost=None, stats_interval=1.0):
+        '''
+        Wie get_output(), aber Lesen, Parsen und Ausliefern laufen in getrennten Stufen, die über
+        begrenzte Queues verbunden sind (siehe `Pipeline <#module-ftrace.pipeline>`_). Ein langsamer
+        Konsument hält so das Lesen der Pipe nicht auf.
+
+        overflow gibt an, was bei einer vollen Queue geparster Events passiert: "block" (warten),
+        "drop_oldest" oder "sample" (nur jeden sample_every-ten Batch behalten). Die Füllstände und
+        verworfenen Events sind über reader_stats() abrufbar.
+        '''
+        logging.debug("reading pipe of FTrace with a pipeline")
+        reader = PipeReader(self._file_pipe.path, chunk_size=chunk_size, idle_timeout=idle_timeout)
+        self._reader = Pipeline(reader, self.tracer.parser, raw_queue_size=queue_size, event_queue_size=queue_size,
+                                policy=overflow, sample_every=sample_every)
+        for value_dict in self._monitored(self._reader, on_lost, stats_interval):
+            yield value_dict
+
+    def get_output_multiprocess(self, workers=None, ordered=True, batch_size=256 * 1024, idle_timeout=None, chunk_size=65536,
+                                on_lost=None, stats_interval=1.0):
+        '''
+        Wie get_output(), aber das Parsen wird auf workers Prozesse verteilt
+        (siehe `ProcessPoolParser <#module-ftrace.procpool>`_). Lohnt sich erst bei hohen Event-Raten,
+        siehe benchmarks/bench_procpool.py.
+
+        Mit ordered=False werden die Events ausgegeben, sobald sie geparst sind, und zwar als
+        Tupel (Batchnummer, dictionary).
+        '''
+        logging.debug("reading pipe of FTrace, parsing with {} processes".format(workers))
+        self._reader = PipeReader(self._file_pipe.path, chunk_size=chunk_size, idle_timeout=idle_timeout)
+        pool = ProcessPoolParser(self.tracer.parser, workers=workers, batch_size=batch_size, ordered=ordered)
+        try:
+            for value in self._monitored(pool.parse_chunks(self._reader.read_chunks(), self._reader), on_lost, stats_interval):
+                yield value
+        finally:
+            self._reader.close()  # parse_chunks() hat den Lese-Thread bereits beendet
+
+    def get_output_async(self, idle_timeout=None, chunk_size=65536, max_pending=10000, on_lost=None, stats_interval=1.0):
+        '''
+        Wie get_output(), gibt aber einen `AsyncEventStream <#module-ftrace.aio>`_ für asyncio zurück:
+
+        .. code:: python
+
+          async for data in ftrace.get_output_async():
+              ...
+
+        Die Pipe wird bei der Event-Loop registriert und in Batches geparst, ohne Thread.
+        Liegen mehr als max_pending Events vor, wird das Lesen bis zu deren Abholung pausiert.
+        '''
+        logging.debug("reading pipe of FTrace asynchronously")
+        self._reader = AsyncEventStream(
+            self._file_pipe.path, self.tracer.parser, tracefs=self.tracefs, chunk_size=chunk_size,
+            idle_timeout=idle_timeout, max_pending=max_pending, on_lost=on_lost, stats_interval=stats_interval
+        )
+        self._monitor = None
+        return self._reader
+
+    def get_output_columnar(self, batch_size=4096, max_delay=0.1, timestamp_ns=False, idle_timeout=None, chunk_size=65536,
+                            on_lost=None, stats_interval=1.0):
+        '''
+        Wie get_output(), gibt aber die Events spaltenweise als
+        `ColumnBatch <#module-ftrace.columnar>`_ zurück, einen pro SysCall und batch_size Events.
+        Kommen keine weiteren Events, wird ein Batch spätestens nach max_delay Sekunden auch
+        unvollständig ausgegeben. Zahlen stehen in arrays, Strings im Layout offsets + bytes:
+
+        .. code:: python
+
+          for batch in ftrace.get_output_columnar():
+              pids = batch["caller_pid"]  # array("q")
+        '''
+        logging.debug("reading pipe of FTrace into column batches")
+        self._reader = PipeReader(self._file_pipe.path, chunk_size=chunk_size, poll_interval=max_delay, idle_timeout=idle_timeout)
+        batcher = ColumnBatcher(self.tracer.parser.syscalls, batch_size=batch_size, max_delay=max_delay, timestamp_ns=timestamp_ns)
+        try:
+            for batch in self._monitored(self._columnar(self._reader, batcher), on_lost, stats_interval):
+                yield batch
+        finally:
+            self._reader.close()
+
+    def _columnar(self, reader, batcher):
+        parse = self.tracer.parser.parse
+        add = batcher.add
+        rest = b""
+        for chunk in reader.read_chunks(idle_chunks=True):
+            if (chunk):
+                lines = (rest + chunk).split(b"\n")
+                rest = lines.pop()
+                for line in lines:
+                    value_dict = parse(line + b"\n")
+                    if (value_dict):
+                        batch = add(value_dict)
+                        if (batch is not None):
+                            yield batch
+            if (batcher.due()):
+                for batch in batcher.flush(expired_only=True):
+                    yield batch
+        if (rest):
+            value_dict = parse(rest)
+            if (value_dict):
+                add(value_dict)
+        for batch in batcher.flush():
+            yield batch
+
+    def get_raw_output(self, cpus=None, idle_timeout=None, parallel=False, ordered=True, reorder_window=0.5, use_processes=False,
+                       on_lost=None, stats_interval=1.0):
+        '''
+        Alternative zu get_output(): Liest die binären Ringpuffer (per_cpu/cpuN/trace_pipe_raw)
+        aus und dekodiert die Events direkt anhand von events/*/*/format, ohne den
+        Textformatierer des Kernels und ohne reguläre Ausdrücke.
+        Die zurückgegebenen dictionaries entsprechen denen von get_output(), sind
+        allerdings nur innerhalb einer CPU zeitlich geordnet.
+
+        Mit parallel=True wird jede CPU von einem eigenen Worker (Thread, bzw. Prozess mit
+        use_processes=True) gelesen und dekodiert. Die Ströme werden dann zeitlich geordnet
+        zusammengeführt, wobei höchstens um reorder_window Sekunden umgeordnet wird.
+        ordered=False verzichtet auf die Sortierung (siehe `ParallelRawReader <#module-ftrace.percpu>`_).
+        on_lost und stats_interval siehe get_output().
+        '''
+        logging.debug("reading raw buffers of FTrace")
+        syscalls = self.tracer.parser.syscalls
+        names = set(name for syscall in syscalls.values() for name in syscall.format_names())
+        decoder = RawEventDecoder(
+            syscalls,
+            load_formats(self.tracefs.path("events"), names=names),
+            PageHeader.from_file(self.tracefs.path("events/header_page")),
+            cmdlines_path=self.tracefs.top.path("saved_cmdlines"),
+            objects=self.tracer.parser.objects
+        )
+        if (parallel):
+            self._reader = ParallelRawReader(
+                self.tracefs.root, decoder, cpus=cpus, ordered=ordered, reorder_window=reorder_window,
+                use_processes=use_processes, idle_timeout=idle_timeout
+            )
+        else:
+            self._reader = RawBufferReader(self.tracefs.root, decoder, cpus=cpus, idle_timeout=idle_timeout)
+        for value_dict in self._monitored(self._reader, on_lost, stats_interval):
+            yield value_dict
+
+    def stop(self):
+        '''
+        Beendet einen laufenden get_output()- bzw. get_raw_output()-Generator.
+        '''
+        if (self._reader is not None):
+            self._reader.stop()
+
+    def reader_stats(self):
+        '''
+        Gibt die Zähler des zuletzt verwendeten PipeReaders zurück
+        (time_blocked, time_working, bytes_read, lines_read, wakeups) bzw. die des AsyncEventStreams
+        oder der Pipeline.
+        '''
+        if (not isinstance(self._reader, (PipeReader, AsyncEventStream, Pipeline))):
+            return {}
+        return self._reader.stats()
+
+    def buffer_stats(self):
+        '''
+        Gibt die Zähler der Ringpuffer des zuletzt gestarteten get_output()- bzw.
+        get_raw_output()-Generators zurück (lost_events, reported_lost_events, entries, cpus),
+        siehe `BufferMonitor <#module-ftrace.buffers>`_.
+        '''
+        monitor = self._reader.monitor if isinstance(self._reader, AsyncEventStream) else self._monitor
+        if (monitor is None):
+            return {}
+        return monitor.stats()
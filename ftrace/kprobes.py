@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from ftrace.exceptions import WriteFileException
+
+
+RETPROBE_SUFFIX = "_kretprobe"
+
+
+def retprobe_kname(kname):
+    '''
+    Gibt den KName der Kretprobe zur KProbe kname zurück: sys_connect_kprobe -> sys_connect_kretprobe
+    '''
+    if (kname.endswith("_kprobe")):
+        kname = kname[:-len("_kprobe")]
+    return kname + RETPROBE_SUFFIX
+
+
+class KprobeEvents(object):
+    '''
+    KprobeEvents verwaltet die Datei kprobe_events eines `TraceFS <#module-ftrace.tracefs>`_
+    und registriert bzw. entfernt mehrere KProbes auf einmal.
+
+    Statt für jeden SysCall die ganze Datei zu lesen und wieder zu schreiben, wird
+    der gewünschte Zustand mit dem aktuellen Inhalt verglichen und nur die Differenz mit
+    einem einzigen write() angehängt. Schlägt das fehl, werden die bereits registrierten
+    KProbes wieder entfernt.
+    '''
+
+    GROUP = "kprobes"
+
+    def __init__(self, tracefs):
+        self.tracefs = tracefs
+        self._file = tracefs.top.file("kprobe_events")  # gilt für alle Instanzen
+
+    def current(self):
+        '''
+        Gibt die momentan registrierten KProbes als OrderedDict {kname: Definition} zurück.
+        Zeilen der Form "-:gruppe/kname" (z.B. in einer Nachbildung von tracefs) entfernen
+        eine vorher definierte KProbe.
+        '''
+        probes = OrderedDict()
+        for line in self._file.read().splitlines():
+            line = line.strip()
+            if (not line or line.startswith("#")):
+                continue
+            kind, _, rest = line.partition(":")
+            name = rest.split(None, 1)[0].rsplit("/", 1)[-1] if rest else ""
+            if (kind == "-"):
+                probes.pop(name, None)
+            else:
+                probes[name] = line
+        return probes
+
+    def is_registered(self, kname):
+        return kname in self.current()
+
+    def register(self, syscalls):
+        '''
+        Registriert die KProbes (und ggf. Kretprobes, siehe SysCall.probes()) aller übergebenen
+        SysCalls, die noch nicht registriert sind, mit einem einzigen write(). Gibt die Liste
+        der KNames der SysCalls zurück, für die neue KProbes registriert wurden.
+        SysCalls ohne KProbe (z.B. Sched_Process_Fork) werden übersprungen.
+        '''
+        return self.register_probes(syscalls)[0]
+
+    def register_probes(self, syscalls):
+        '''
+        Wie register(), gibt aber (KNames der SysCalls, KNames aller neu registrierten Probes) zurück.
+        '''
+        existing = self.current()
+        added = []
+        probes = []
+        lines = []
+        for syscall in syscalls:
+            new = [(kname, kprobe) for kname, kprobe in syscall.probes() if kname not in existing and kname not in probes]
+            if (not new):
+                continue
+            added.append(syscall.kname)
+            for kname, kprobe in new:
+                probes.append(kname)
+                lines.append(kprobe)
+
+        if (not lines):
+            return added, probes
+
+        try:
+            self._file.append_lines(lines)
+        except WriteFileException:
+            logging.debug("registering kprobes failed, rolling back")
+            self._remove([kname for kname in probes if kname in self.current()])
+            raise
+        return added, probes
+
+    def unregister(self, knames):
+        '''
+        Entfernt die KProbes mit den übergebenen KNames und die zugehörigen Kretprobes mit einem
+        einzigen write(), sofern sie registriert sind. Die KProbes dürfen nicht enablet sein.
+        '''
+        self.remove([name for kname in knames for name in (kname, retprobe_kname(kname))])
+
+    def remove(self, knames):
+        '''
+        Entfernt genau die Probes mit den übergebenen KNames (ohne Kretprobes) mit einem einzigen
+        write(), sofern sie registriert sind.
+        '''
+        existing = self.current()
+        self._remove([kname for kname in knames if kname in existing])
+
+    def _remove(self, knames):
+        if (not knames):
+            return
+        self._file.append_lines(["-:{}/{}".format(self.GROUP, kname) for kname in knames])
+
+
+class KprobeRegistry(object):
+    '''
+    Zählt, wie viele Tracer (bzw. Sessions, siehe `Session <#module-ftrace.session>`_) eine KProbe
+    verwenden. Da kprobe_events für alle Instanzen eines tracefs gilt, wird eine KProbe beim
+    ersten acquire() registriert und erst entfernt, wenn sie mit release() von allen wieder
+    freigegeben wurde.
+
+    Gezählt und entfernt werden nur die Probes, die die Registry selbst registriert hat. Probes, die
+    beim acquire() bereits in kprobe_events standen (z.B. von einem anderen Prozess oder Werkzeug),
+    werden mitbenutzt, aber nie entfernt.
+
+    Die Zähler gelten innerhalb eines Prozesses; zwischen Prozessen gibt es keine gemeinsame
+    Zählung. Ein zweiter Prozess findet die Probes des ersten bereits registriert vor und entfernt
+    sie daher nicht. Gibt der erste Prozess sie frei, während der zweite sie noch in seiner Instanz
+    enablet hat, lehnt der Kernel das Entfernen ab und sie bleiben registriert; ist sie dort nur
+    registriert, aber (noch) nicht enablet, wird sie entfernt.
+    '''
+
+    _lock = threading.Lock()
+    _refs = {}  # {oberstes tracefs (realpath): {kname: Anzahl}}
+
+    def __init__(self, tracefs):
+        self.kprobe_events = KprobeEvents(tracefs)
+        self._key = os.path.realpath(tracefs.top.root)
+
+    def _counts(self):
+        return self._refs.setdefault(self._key, {})
+
+    def refcount(self, kname):
+        with self._lock:
+            return self._counts().get(kname, 0)
+
+    def acquire(self, syscalls):
+        '''
+        Registriert die KProbes der SysCalls, sofern noch nicht geschehen, und erhöht die Zähler
+        der Probes, die von dieser Registry registriert wurden.
+        Gibt die Liste der KNames der SysCalls mit neu registrierten Probes zurück.
+        '''
+        syscalls = list(syscalls)
+        with self._lock:
+            added, probes = self.kprobe_events.register_probes(syscalls)
+            counts = self._counts()
+            for kname in probes:
+                counts.setdefault(kname, 0)
+            for syscall in syscalls:
+                for kname, _ in syscall.probes():
+                    if (kname in counts):
+                        counts[kname] += 1
+            return added
+
+    def release(self, knames):
+        '''
+        Verringert die Zähler der SysCalls mit den übergebenen KNames (samt Kretprobes) und entfernt
+        die eigenen Probes, die nicht mehr verwendet werden. Gibt die Liste der entfernten KNames zurück.
+        '''
+        with self._lock:
+            counts = self._counts()
+            unused = []
+            for kname in knames:
+                for name in (kname, retprobe_kname(kname)):
+                    if (name not in counts):
+                        continue  # nicht von dieser Registry registriert
+                    count = counts[name] - 1
+                    if (count > 0):
+                        counts[name] = count
+                    else:
+                        del counts[name]
+                        unused.append(name)
+
+            try:
+                self.kprobe_events.remove(unused)
+            except WriteFileException:
+                # mindestens eine KProbe ist noch anderweitig enablet: einzeln entfernen
+                for kname in unused:
+                    try:
+                        self.kprobe_events.remove([kname])
+                    except WriteFileException:
+                        logging.debug("kprobe {} is still in use, keeping it".format(kname))
+            return unused
+
+
+class SetupTimer(object):
+    '''
+    Misst die Dauer einzelner Phasen (z.B. des Setups eines Tracers) in Sekunden.
+
+    .. code:: python
+
+      timer = SetupTimer()
+      with timer.phase("register"):
+          ...
+      timer.stats  # {"register": 0.0012}
+    '''
+
+    def __init__(self):
+        self.stats = OrderedDict()
+
+    def phase(self, name):
+        return _Phase(self.stats, name)
+
+
+class _Phase(object):
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.stats[self.name] = self.stats.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+import errno
+from collections import OrderedDict
+
+from ftrace.syscalls import SysCall
+from ftrace.kprobes import retprobe_kname
+from ftrace.proctree import EXIT_KNAMES
+
+
+def error_name(ret):
+    '''
+    Gibt den Namen des Fehlers zurück, wenn ret ein negativer errno-Wert ist (-4095 bis -1,
+    wie beim Kernel), z.B. -111 -> "ECONNREFUSED", sonst None.
+    '''
+    if (ret is None or not -4095 <= ret < 0):
+        return None
+    return errno.errorcode.get(-ret, "E{}".format(-ret))
+
+
+class LatencyHistogram(object):
+    '''
+    Histogramm der Dauer eines SysCalls mit logarithmischen Klassen: Klasse k enthält die Dauern
+    von 2^(k-1) bis unter 2^k Mikrosekunden, Klasse 0 die unter einer Mikrosekunde.
+    add() kostet unabhängig von der Anzahl der Werte nur bit_length() und eine Liste;
+    Anzahl, Summe, Minimum und Maximum werden exakt mitgeführt.
+    '''
+
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def __len__(self):
+        return self.count
+
+    def add(self, duration):
+        '''
+        Fügt eine Dauer in Sekunden hinzu.
+        '''
+        bucket = int(duration * 1e6).bit_length()
+        counts = self.counts
+        if (bucket >= len(counts)):
+            counts.extend([0] * (bucket + 1 - len(counts)))
+        counts[bucket] += 1
+        self.count += 1
+        self.total += duration
+        if (self.min is None or duration < self.min):
+            self.min = duration
+        if (self.max is None or duration > self.max):
+            self.max = duration
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def buckets(self):
+        '''
+        Gibt die belegten Klassen als Liste von (Obergrenze in Sekunden, Anzahl) zurück.
+        '''
+        return [((1 << k) / 1e6, count) for k, count in enumerate(self.counts) if count]
+
+    def percentile(self, p):
+        '''
+        Gibt eine obere Schranke für das p-te Perzentil (0-100) in Sekunden zurück: die Obergrenze
+        der Klasse, in die es fällt, höchstens aber das Maximum. Ohne Werte None.
+        '''
+        if (not self.count):
+            return None
+        rank = max(1, -(-self.count * p // 100))  # aufgerundet
+        seen = 0
+        for k, count in enumerate(self.counts):
+            seen += count
+            if (seen >= rank):
+                return min((1 << k) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "buckets": self.buckets(),
+        }
+
+
+class ReturnPairer(object):
+    '''
+    Ordnet die Rückkehr aus einem SysCall (Kretprobe bzw. sys_exit_<name>, siehe SysCall.RETPROBE)
+    ihrem Aufruf zu und gibt beide als ein Event zurück, ergänzt um
+
+    * ret: Rückgabewert
+    * error: Name des Fehlers bei negativem Rückgabewert (siehe error_name()), sonst None
+    * duration: Dauer in Sekunden (Differenz der Zeitstempel, auf Mikrosekunden genau)
+
+    .. code:: python
+
+      syscalls.Sys_Connect.RETPROBE = True  # vor dem Instanzieren der SysCalls
+      pairer = ReturnPairer()
+      for data in pairer.pair(ftrace.get_output()):
+          print(data["adress"], data["ret"], data["error"], data["duration"])
+      pairer.histograms["sys_connect_kprobe"].percentile(99)
+
+    Ein Thread befindet sich immer nur in einem SysCall, daher werden die Aufrufe bis zu ihrer
+    Rückkehr in einer Tabelle {caller_pid (= Thread-ID): Event} gehalten; Zuordnen kostet so
+    nur einen Zugriff auf ein dictionary. Gepaart werden die SysCalls aus syscalls (Klassen oder
+    Instanzen, Standard: alle mit RETPROBE beim Erstellen des ReturnPairers, außer Sys_Exit und
+    Sys_Exit_Group, die nie zurückkehren); alle anderen Events werden unverändert weitergegeben.
+    Ein Aufruf erscheint im Strom also erst mit seiner Rückkehr.
+
+    Unvollständige Aufrufe werden mit ret, error und duration None ausgegeben:
+
+    * der Thread ruft den nächsten gepaarten SysCall auf, ohne dass die Rückkehr gesehen wurde
+      (verlorenes Event, siehe RETPROBE_MAXACTIVE)
+    * der Thread beendet sich (Sys_Exit bzw. Sys_Exit_Group desselben Threads), das Event des
+      Aufrufs wird vor dem des Exits ausgegeben
+    * der Aufruf ist laut Zeitstempel der Events älter als timeout Sekunden
+    * es warten mehr als max_inflight Aufrufe, dann der älteste
+    * am Ende von pair() bzw. mit flush()
+
+    Rückkehr-Events ohne Aufruf (z.B. weil der Filter des SysCalls ihn verworfen hat) werden
+    verworfen und in orphans gezählt. Die Dauer jedes vollständigen Aufrufs wird im
+    LatencyHistogram seines SysCalls (histograms, nach KName) gezählt.
+    '''
+
+    def __init__(self, syscalls=None, timeout=10.0, max_inflight=65536):
+        if (syscalls is None):
+            syscalls = [syscall for syscall in SysCall.__subclasses__() if syscall.RETPROBE and syscall.class_kname() not in EXIT_KNAMES]
+        self.timeout = timeout
+        self.max_inflight = max_inflight
+        self.histograms = {}
+        '''{KName des SysCalls: LatencyHistogram}'''
+
+        self.paired = 0
+        self.orphans = 0
+        '''Rückkehr-Events ohne zugehörigen Aufruf'''
+        self.unmatched = 0
+        '''Aufrufe, auf die ein weiterer Aufruf desselben Threads ohne Rückkehr folgte'''
+        self.exited = 0
+        '''Aufrufe, auf die ein Exit desselben Threads ohne Rückkehr folgte'''
+        self.expired = 0
+        self.evicted = 0
+
+        self._entry_knames = frozenset(syscall.class_kname() for syscall in syscalls)
+        self._return_knames = {retprobe_kname(kname): kname for kname in self._entry_knames}
+        self._inflight = OrderedDict()  # {caller_pid: Event des Aufrufs}, älteste zuerst
+
+    def __len__(self):
+        return len(self._inflight)
+
+    @staticmethod
+    def _incomplete(entry):
+        entry["ret"] = None
+        entry["error"] = None
+        entry["duration"] = None
+        return entry
+
+    def _expire(self, now, out):
+        inflight = self._inflight
+        limit = now - self.timeout
+        while (inflight):
+            tid, entry = next(iter(inflight.items()))
+            if (entry["timestamp"] >= limit):
+                break
+            del inflight[tid]
+            self.expired += 1
+            out.append(self._incomplete(entry))
+
+    def update(self, event):
+        '''
+        Verarbeitet ein Event und gibt die Liste der Events zurück, die jetzt ausgegeben werden
+        (siehe Klassenbeschreibung): keins, das Event selbst, ein gepaartes oder unvollständige.
+        '''
+        kname = event["kname"]
+        if (kname in self._entry_knames):
+            if (not isinstance(event, dict)):
+                event = event.to_dict()
+            out = []
+            self._expire(event["timestamp"], out)
+            inflight = self._inflight
+            previous = inflight.pop(event["caller_pid"], None)
+            if (previous is not None):
+                self.unmatched += 1
+                out.append(self._incomplete(previous))
+            inflight[event["caller_pid"]] = event
+            if (len(inflight) > self.max_inflight):
+                self.evicted += 1
+                out.append(self._incomplete(inflight.popitem(last=False)[1]))
+            return out
+
+        entry_kname = self._return_knames.get(kname)
+        if (entry_kname is None):
+            if (kname in EXIT_KNAMES):
+                entry = self._inflight.pop(event["caller_pid"], None)
+                if (entry is not None):
+                    self.exited += 1
+                    return [self._incomplete(entry), event]
+            return [event]
+
+        entry = self._inflight.get(event["caller_pid"])
+        if (entry is None or entry["kname"] != entry_kname):
+            self.orphans += 1
+            return []
+        del self._inflight[event["caller_pid"]]
+        out = []
+        self._expire(event["timestamp"], out)
+
+        ret = event["ret"]
+        duration = round(max(event["timestamp"] - entry["timestamp"], 0.0), 6)  # Zeitstempel verschiedener CPUs
+        entry["ret"] = ret
+        entry["error"] = error_name(ret)
+        entry["duration"] = duration
+        histogram = self.histograms.get(entry_kname)
+        if (histogram is None):
+            histogram = self.histograms[entry_kname] = LatencyHistogram()
+        histogram.add(duration)
+        self.paired += 1
+        out.append(entry)
+        return out
+
+    def flush(self):
+        '''
+        Gibt alle noch wartenden Aufrufe als unvollständig zurück (älteste zuerst).
+        '''
+        out = [self._incomplete(entry) for entry in self._inflight.values()]
+        self._inflight.clear()
+        return out
+
+    def pair(self, events):
+        '''
+        Generator, der die Events aus events mit update() verarbeitet und das Ergebnis ausgibt;
+        am Ende folgen die noch wartenden Aufrufe (siehe flush()). Event-Objekte der gepaarten
+        SysCalls werden in dictionaries umgewandelt, leere Ergebnisse (None) unverändert weitergegeben.
+        '''
+        update = self.update
+        for event in events:
+            if (not event):
+                yield event
+                continue
+            for data in update(event):
+                yield data
+        for data in self.flush():
+            yield data
+
+    def stats(self):
+        return {
+            "inflight": len(self._inflight),
+            "paired": self.paired,
+            "orphans": self.orphans,
+            "unmatched": self.unmatched,
+            "exited": self.exited,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "histograms": {kname: histogram.to_dict() for kname, histogram in self.histograms.items()},
+        }
@@ -3,7 +3,205 @@
 import re
 import logging
 
-from ftrace.sockaddr import SockAddr
+from ftrace.events import make_event_class
+from ftrace.sockaddr import SockAddr, ARG_NAMES
+from ftrace.syscallparam import SysCallParam
+from ftrace.tracepoints import kname_of
+
+
+_REGEXHEADER = re.compile(rb"\s*(.+?)-(\d+)\s+\[(\d*)\][^:\n]*?\s([0-9.]+):\s+(\w+(?:\s->)?)(?::\s*|(?=\()|(?<=->)\s*)")
+'''
+Kopf einer Logzeile: pname-pid [cpu] flags timestamp: kname:
+Er wird für alle SysCalls gleich ausgewertet, der Rest der Zeile vom Decoder des SysCalls.
+Bei Syscall-Tracepoints folgen auf den Namen direkt die Argumente: timestamp: sys_setuid(uid: 3e8),
+bei der Rückkehr (sys_exit_<name>) der Rückgabewert: timestamp: sys_setuid -> 0x0
+'''
+_REGEXLOST = re.compile(rb"CPU:(\d+) \[LOST (\d+) EVENTS\]")
+'''Meldung in trace_pipe, wenn Events einer CPU verloren gegangen sind (Ringpuffer übergelaufen)'''
+_REGEXSYMBOL = rb"\(([^)+]*)[^)]*\)"  # (SyS_execve+0x0/0x30)
+_SYMBOL = re.compile(_REGEXSYMBOL)
+_REGEXARG = rb"\sarg\d+=(.*?)"
+_REGEXEND = rb"\s*\Z"
+
+_MAX_PENDING = 65536
+'''Maximale Länge einer auf mehrere Zeilen verteilten Logzeile in Bytes'''
+
+
+def _decode(value):
+    if (value.__class__ is bytes):
+        return value.decode("utf-8", "backslashreplace")
+    return value
+
+
+def _unquote(value):
+    if (value[:1] == b'"' and value[-1:] == b'"' and len(value) > 1):
+        return value[1:-1]
+    return value
+
+
+def _converter(param_type):
+    '''
+    Liefert eine Funktion, die einen Wert (bytes aus trace_pipe oder bereits dekodiert)
+    in den Typ des SysCallParams umwandelt.
+    int() und float() können bytes direkt umwandeln, alles andere wird zuvor dekodiert.
+    '''
+    convert = param_type.value.convert
+    if (convert is int or convert is float):
+        return convert
+    if (convert is str):
+        return _decode
+    return lambda value: convert(_decode(value))
+
+
+class FieldLayout(object):
+    '''
+    Zwischengespeicherte Beschreibung der Ausgabe eines SysCalls: Reihenfolge der Felder,
+    Konverter, Anzahl der Listenelemente und ob der letzte Parameter ein String ist.
+    Wird einmal pro SysCall-Klasse (und ARGCOUNT) erstellt, statt bei jedem Event
+    valid_params und die erwartete Anzahl an Argumenten neu zu berechnen.
+    '''
+
+    def __init__(self, syscall):
+        self.argcount = syscall.ARGCOUNT
+        self.standard = [(name, _converter(typ)) for name, typ in syscall.STANDARD_FIELDS.items()]
+        self.params = [
+            (name, _converter(typ), syscall.ARGCOUNT if typ.value.is_list else 0)
+            for name, typ in syscall.valid_params.items() if isinstance(typ, SysCallParam)
+        ]
+        self.arg_len = sum(count or 1 for _, _, count in self.params)
+        self.last_is_string = bool(self.params) and self.params[-1][1] is _decode
+        self.deferrable = not any(convert is _decode for _, convert, _ in self.params[:-1]) and not (self.params and self.params[-1][2] and self.last_is_string)
+        '''
+        Ob sich schon ohne Auswerten der Argumente erkennen lässt, dass eine Logzeile vollständig ist:
+        nur Zahlen bzw. ein einzelner String als letzter Parameter (siehe StandardSysCallParser.compile())
+        '''
+        self.name = syscall.__class__.__name__
+        self._event_class = None
+
+    @property
+    def event_class(self):
+        '''
+        Event-Klasse mit einem Slot pro Feld (siehe `Event <#module-ftrace.events>`_), wird beim ersten
+        Zugriff erstellt.
+        '''
+        if (self._event_class is None):
+            fields = []
+            raw_loaders = {}
+            for i, (name, convert) in enumerate(self.standard):
+                fields.append((name, _part_loader(i, convert)))
+                raw_loaders[name] = _part_loader(i, None)
+            i = 0
+            for name, convert, count in self.params:
+                fields.append((name, _arg_loader(i, count, convert)))
+                raw_loaders[name] = _arg_loader(i, count, None)
+                i += count or 1
+            self._event_class = make_event_class(self.name + "Event", fields, raw_loaders)
+        return self._event_class
+
+    def make(self, parts, args, unquote=False):
+        '''
+        Wie fill(), gibt aber ein Event-Objekt zurück. Die Werte werden erst beim Zugriff umgewandelt.
+        '''
+        return self.event_class(parts, args, unquote)
+
+    def fill(self, parts, args, unquote=False):
+        '''
+        Befüllt das Ausgabe-dictionary aus den STANDARD_FIELDS (parts) und den Argumenten.
+        '''
+        vd = {name: convert(value) for (name, convert), value in zip(self.standard, parts)}
+        i = 0
+        for name, convert, count in self.params:
+            if (count):
+                if (unquote):
+                    vd[name] = [convert(_unquote(value)) for value in args[i:i + count]]
+                else:
+                    vd[name] = [convert(value) for value in args[i:i + count]]
+                i += count
+            else:
+                vd[name] = convert(_unquote(args[i]) if unquote else args[i])
+                i += 1
+        return vd
+
+
+def _arg_shape(count):
+    '''
+    Liefert die match-Funktion eines regulären Ausdrucks, der ohne Gruppen prüft, ob ab einer Position
+    count Argumente folgen, wobei nur das letzte Leerzeichen enthalten darf (siehe FieldLayout.deferrable).
+    Passt er, findet auch der Ausdruck aus _REGEXARG die Argumente, sodass sie beim Zugriff auf ein
+    Event sicher ausgelesen werden können.
+    '''
+    if (count == 0):
+        return re.compile(_REGEXEND).match
+    return re.compile(rb"(?:\sarg\d+=\S*){" + str(count - 1).encode() + rb"}\sarg\d+=").match
+
+
+def _part_loader(i, convert):
+    if (convert is None):
+        return lambda event: event._parts[i]
+    return lambda event: convert(event._parts[i])
+
+
+def _arg_loader(i, count, convert):
+    '''
+    Liefert eine Funktion, die den Wert eines Parameters (Listen: count Elemente ab i) aus den
+    Argumenten eines Events ausliest und mit convert umwandelt (None: Rohdaten).
+    '''
+    if (convert is None):
+        if (count):
+            return lambda event: list(event._args[i:i + count])
+        return lambda event: event._args[i]
+    if (count):
+        def load(event):
+            if (event._q):
+                return [convert(_unquote(value)) for value in event._args[i:i + count]]
+            return [convert(value) for value in event._args[i:i + count]]
+        return load
+    return lambda event: convert(_unquote(event._args[i]) if event._q else event._args[i])
+
+
+def line_timestamp(line):
+    '''
+    Gibt den Zeitstempel einer Logzeile (in Sekunden) zurück, bzw. None falls die Zeile
+    keinen gültigen Kopf besitzt.
+    '''
+    header = _REGEXHEADER.match(line)
+    if (header is None):
+        return None
+    return float(header.group(4))
+
+
+def header_values(header):
+    '''
+    Gibt die Felder des Kopfes einer Logzeile (siehe _REGEXHEADER) als dictionary zurück,
+    z.B. für den Vorfilter eines `EventFilter <#module-ftrace.filters>`_.
+    '''
+    return {
+        "caller_name": _decode(header.group(1)),
+        "caller_pid": int(header.group(2)),
+        "timestamp": float(header.group(4)),
+        "kname": _decode(header.group(5))
+    }
+
+
+def _filtered(decoder, event_filter):
+    '''
+    Umhüllt einen Decoder mit einem EventFilter: der Vorfilter wird vor dem Auswerten der Argumente
+    angewendet, der Nachfilter danach. Verworfene Events ergeben False.
+    '''
+    accept_header = event_filter.accept_header
+    accept = event_filter.accept
+
+    def decoder_filtered(line, header):
+        if (event_filter.has_header_check and not accept_header(header_values(header))):
+            return False
+        value_dict = decoder(line, header)
+        if (not value_dict):
+            return value_dict
+        if (not accept(value_dict)):
+            return False
+        return value_dict
+
+    return decoder_filtered
 
 
 class Parser(object):
@@ -14,14 +212,108 @@ class Parser(object):
         bereitzustellen.
         '''
 
+    def parse_lines(self, lines):
+        '''
+        Parst alle Zeilen eines Iterables und gibt die Ergebnisse von parse() als Generator zurück.
+        Wird von FTrace.get_output() und Replay.get_output() gleichermaßen verwendet.
+        '''
+        parse = self.parse
+        for line in lines:
+            yield parse(line)
+
 
 class SysCallParser(Parser):
     _last_line = b""
 
-    _REGEXKNAME = re.compile(r"^.*?\s\S.*-(?=\d+\s*)\d+\s*\[\d*\].*\s[0-9.]*:\s*(\w*):\s*")
+    lost_events = 0
+    '''Anzahl der in trace_pipe gemeldeten verlorenen Events ("CPU:n [LOST m EVENTS]")'''
+    on_lost = None
+    '''Wird mit (cpu, Anzahl) aufgerufen, sobald eine solche Meldung geparst wird'''
 
-    def __init__(self, syscall_dict):
+    def __init__(self, syscall_dict, objects=False):
         self.syscalls = syscall_dict  # {kname:  instance}
+        self.objects = objects
+        '''True: parse() gibt Event-Objekte statt dictionaries zurück (siehe `Event <#module-ftrace.events>`_)'''
+        self._decoders = {}  # {kname (bytes): (syscall, ARGCOUNT, filter, decoder, objects, tracepoint)}
+
+    def compile(self, knames=None):
+        '''
+        Erstellt für die angegebenen (Standard: alle) SysCalls einen Decoder
+        (siehe compile() der einzelnen Parser). Wird beim Setup des Tracers aufgerufen;
+        SysCalls, die erst später hinzukommen, werden beim ersten Auftreten kompiliert.
+        '''
+        for kname in (knames if knames is not None else list(self.syscalls)):
+            syscall = self.syscalls.get(kname)
+            names = syscall.trace_names() if syscall is not None else [kname]  # so heißen die Events in trace_pipe
+            for name in names:
+                self._decoder(name.encode())
+
+    def _decoder(self, kname):
+        entry = self._decoders.get(kname)
+        if (entry is not None and entry[0].ARGCOUNT == entry[1] and entry[0].filter is entry[2] and entry[4] == self.objects
+                and entry[0].tracepoint is entry[5] and entry[0].RETPROBE is entry[6]):
+            return entry[3]
+
+        name = kname.decode()
+        syscall, parser = self._syscall(name)
+        if (syscall is None):
+            return None
+        decoder = parser.compile(syscall, self.objects)
+        if (syscall.filter is not None and parser is not syscall.RETURN_PARSER and parser is not syscall.EXIT_PARSER):
+            decoder = _filtered(decoder, syscall.filter)  # die Rückkehr hat nur STANDARD_FIELDS und "ret"
+        self._decoders[kname] = (syscall, syscall.ARGCOUNT, syscall.filter, decoder, self.objects, syscall.tracepoint, syscall.RETPROBE)
+        return decoder
+
+    def _syscall(self, name):
+        '''
+        Gibt den SysCall und dessen Parser (siehe SysCall.parser_for()) zu einem Namen aus dem
+        Kopf einer Logzeile zurück, bzw. (None, None): dem KName, bei Tracepoints dem Namen des
+        SysCalls (sys_setuid statt sys_setuid_kprobe, siehe kname_of()), bei der Rückkehr dem
+        KName der Kretprobe bzw. "sys_setuid ->".
+        '''
+        syscall = self.syscalls.get(name)
+        if (syscall is None):
+            syscall = self.syscalls.get(kname_of(name))
+            if (syscall is None):
+                return None, None
+        parser = syscall.parser_for(name)
+        if (parser is None):
+            return None, None
+        return syscall, parser
+
+    def _parse(self, line):
+        '''
+        Gibt das dictionary, None (Zeile unvollständig) oder False (Zeile unbekannt) zurück.
+        '''
+        header = _REGEXHEADER.match(line)
+        if (header is None):
+            lost = _REGEXLOST.match(line)
+            if (lost is not None):
+                self.report_lost(int(lost.group(1)), int(lost.group(2)))
+            return False
+
+        decoder = self._decoder(header.group(5))
+        if (decoder is None):
+            logging.debug("syscall unknown, line: %s", line)
+            return False
+        return decoder(line, header)
+
+    def report_lost(self, cpu, count):
+        '''
+        Zählt count verlorene Events der CPU cpu (lost_events) und meldet sie an on_lost.
+        Wird beim Parsen einer Meldung "CPU:n [LOST m EVENTS]" aufgerufen, aber z.B. auch vom
+        `ProcessPoolParser <#module-ftrace.procpool>`_ für die Meldungen aus seinen Workern.
+        '''
+        logging.debug("cpu {} lost {} events".format(cpu, count))
+        self.lost_events += count
+        if (self.on_lost is not None):
+            self.on_lost(cpu, count)
+
+    def reset(self):
+        '''
+        Verwirft eine zwischengespeicherte, unvollständige Logzeile (siehe parse()).
+        '''
+        self._last_line = b""
 
     def parse(self, line):
         '''
@@ -42,69 +334,116 @@ class SysCallParser(Parser):
 
         Schematischer Ablauf:
 
-        * Neue Zeile an variable 'last_line' anhängen
-        * KName herausfinden
-        * SysCall-Instanz mit passendem KName herausfinden
-        * Aufruf der PARSING_FUNCTION des SysCalls (gibt entweder dictionary oder None zurück)
-        * wenn Rückgabewert nicht None ist, dann last_line zurücksetzen und dictionary zurückgeben
-        '''
-        logging.debug("parsing new line {}".format(line))
-
-        self._last_line += line
-        kname = self._REGEXKNAME.match(str(self._last_line))
-
-        if kname:
-            kname = kname.group(1)
-
-            if (kname not in self.syscalls):
-                print("syscall unknown\nline: {}".format(line))
-                return
-
-            syscall = self.syscalls[kname]
-            value_dict = syscall.PARSER.parse(syscall, self._last_line)
-            if (value_dict):
-                self._last_line = b""
-                return value_dict
+        * Kopf der Zeile (pname, pid, cpu, timestamp, KName) einmalig auswerten
+        * zum KName passenden, beim Setup kompilierten Decoder des SysCalls heraussuchen
+        * der Decoder wertet den Rest der Zeile in einem Durchgang aus (gibt entweder dictionary oder None zurück)
+        * ist die Zeile unvollständig (z.B. Zeilenumbruch in einem String-Argument), wird sie in
+          'last_line' gespeichert und mit der nächsten Zeile zusammen erneut geparst
+        * hat der SysCall einen Filter (siehe SysCall.filter), wird der Decoder davon umhüllt;
+          verworfene Events ergeben None
 
-
-def _parse_standard_fields(syscall, line):
-    '''
-    Parst die STANDARD_FIELDS eines SysCalls
-    '''
-    _REGEXSYSCALLINFO = re.compile(r"^.*?\s(\S.*)-(?=\d+\s*)(\d+)\s*\[(\d*)\].*\s([0-9.]*):\s*(\w*):\s*\((.*?(?=\)))\)")
-    matchsyscallinfo = _REGEXSYSCALLINFO.match(str(line))
-    return [
-        matchsyscallinfo.group(1),  # pname
-        matchsyscallinfo.group(2),  # pid
-        matchsyscallinfo.group(4),  # timestamp
-        matchsyscallinfo.group(5),  # kname
-        matchsyscallinfo.group(6).split("+")[0]  # syscall
-    ]
+        Mit objects=True wird statt des dictionaries ein Event-Objekt mit denselben Feldern
+        zurückgegeben, das die Werte erst beim Zugriff umwandelt (siehe `Event <#module-ftrace.events>`_).
+        '''
+        if (line.__class__ is not bytes):
+            line = bytes(line, "utf-8") if isinstance(line, str) else bytes(line)
+
+        if (self._last_line):
+            if (_REGEXHEADER.match(line) is None and _REGEXLOST.match(line) is None):
+                value_dict = self._parse(self._last_line + line)
+                if (value_dict is not None):  # vollständig (False: vom Filter verworfen)
+                    self._last_line = b""
+                    return value_dict or None
+                if (len(self._last_line) < _MAX_PENDING):
+                    self._last_line += line
+                    return
+            self._last_line = b""  # neue Logzeile beginnt, die alte bleibt unvollständig
+
+        value_dict = self._parse(line)
+        if (value_dict is None):
+            self._last_line = line
+            return
+        if (value_dict):
+            return value_dict
 
 
-def _fill_value_dict(parts, syscall):
-    '''
-    Nimmt die einzelnen Teile einer Logzeile und den passenden SysCall, und
-    befüllt ein dictionary mit dessen Parametern und wandelt die Werte zum richtigen Typ um.
-    '''
-    vd = {}  # {name: wert richtigen typs}
-    i = 0
-    for param_name, param_type in dict(syscall.STANDARD_FIELDS, **syscall.valid_params).items():
-        element = None
-        if (not param_type.value.is_list):
-            element = param_type.convert(parts[i])
-            i += 1
-        else:
-            element = []
-            for x in range(0, syscall.ARGCOUNT):
-                element.append(param_type.convert(parts[i]))
-                i += 1
-        vd[param_name] = element
-    return vd
+class StandardSysCallParser(object):
+    def __init__(self):
+        self._layouts = {}
+        self._decoders = {}
 
+    def layout(self, syscall):
+        '''
+        Gibt das zwischengespeicherte FieldLayout eines SysCalls zurück.
+        '''
+        key = (syscall.__class__, syscall.ARGCOUNT)
+        layout = self._layouts.get(key)
+        if (layout is None):
+            layout = self._layouts[key] = FieldLayout(syscall)
+        return layout
 
-class StandardSysCallParser(object):
-    _REGEXARGS = re.compile(r"\sarg\d+=(.*?(?=\sarg\d+=|$|\\n'))")
+    def compile(self, syscall, objects=False):
+        '''
+        Erstellt einen Decoder für einen gewöhnlichen SysCall.
+
+        Der Decoder ist eine Funktion decoder(line, header), die den Rest einer Logzeile ab dem
+        bereits ausgewerteten Kopf (header) mit einem einzigen, für diesen SysCall erstellten
+        regulären Ausdruck ausliest und das dictionary (mit objects=True das Event-Objekt) zurückgibt.
+        Stimmt die Anzahl der Argumente nicht, oder ist der letzte String-Parameter nicht
+        abgeschlossen (ohne '"' bzw. ')' am Ende), ist die Zeile unvollständig und es wird None
+        zurückgegeben.
+
+        Mit objects=True werden nur Kopf und Symbol sofort ausgelesen und die Anzahl der Argumente
+        geprüft (siehe _arg_shape()), die Argumente selbst erst beim ersten Zugriff darauf
+        (siehe `Event <#module-ftrace.events>`_). Das gilt für SysCalls,
+        bei denen die Vollständigkeit der Zeile schon am Zeilenende erkennbar ist (FieldLayout.deferrable);
+        bei mehreren String-Parametern wird weiterhin sofort ausgelesen, umgewandelt wird aber
+        auch dann erst beim Zugriff.
+        '''
+        layout = self.layout(syscall)
+        check_last = layout.last_is_string and layout.arg_len > 0
+        if (objects and layout.deferrable):
+            return self._deferred_decoder(layout, check_last)
+
+        body = re.compile(_REGEXSYMBOL + _REGEXARG * layout.arg_len + _REGEXEND, re.S)
+        fill = layout.make if objects else layout.fill
+
+        def decoder(line, header):
+            match = body.match(line, header.end())
+            if (match is None):
+                return None
+            args = match.groups()
+            if (check_last):
+                last = args[-1]
+                if not ((last[:1] == b'"' and last[-1:] == b'"') or (last[:1] == b'(' and last[-1:] == b')')):
+                    return None
+            return fill((header.group(1), header.group(2), header.group(4), header.group(5), args[0]), args[1:], unquote=True)
+
+        return decoder
+
+    def _deferred_decoder(self, layout, check_last):
+        args = re.compile(_REGEXARG * layout.arg_len + _REGEXEND, re.S)
+        shape = _arg_shape(layout.arg_len)
+        symbol = _SYMBOL.match
+        event_class = layout.event_class
+
+        def split(line, pos):
+            match = args.match(line, pos)
+            return match.groups() if match is not None else None
+
+        def decoder(line, header):
+            match = symbol(line, header.end())
+            if (match is None):
+                return None
+            if (check_last):
+                end = line.rstrip()[-1:]
+                if (end != b'"' and end != b')'):
+                    return None
+            if (shape(line, match.end()) is None):
+                return None
+            return event_class((header.group(1), header.group(2), header.group(4), header.group(5), match.group(1)), None, True, line, match.end(), split)
+
+        return decoder
 
     def parse(self, syscall, line):
         '''
@@ -112,58 +451,82 @@ class StandardSysCallParser(object):
 
         Schematischer Ablauf
 
-        * parst zunächst nur die STANDARD_FIELDS
-        * falls Argumente/Parameter gefunden werden konnten, werden diese angehängt
+        * parst zunächst den Kopf der Logzeile (STANDARD_FIELDS)
+        * übergibt die Zeile an den Decoder des SysCalls (siehe compile())
         * falls die Anzahl an Argumenten der erwarteten Anzahl entspricht, wird ein dictionary mit den Werten zurückgegeben
         '''
-        parts = _parse_standard_fields(syscall, line)
+        header = _REGEXHEADER.match(line)
+        if (header is None):
+            return
+        key = (syscall.__class__, syscall.ARGCOUNT)
+        decoder = self._decoders.get(key)
+        if (decoder is None):
+            decoder = self._decoders[key] = self.compile(syscall)
+        return decoder(line, header)
 
-        matchargs = self._REGEXARGS.findall(str(line))
+    def build(self, syscall, parts, args, objects=False):
+        '''
+        Erstellt das Ausgabe-dictionary (bzw. Event-Objekt) aus den bereits ausgelesenen
+        STANDARD_FIELDS (parts) und den Argumenten (args) in der Reihenfolge der Kprobe.
+        Wird auch vom `RawEventDecoder <#module-ftrace.rawbuffer>`_ verwendet.
+        '''
+        if (objects):
+            return self.layout(syscall).make(parts, args)
+        return self.layout(syscall).fill(parts, args)
 
-        if matchargs:
-            parts += matchargs
 
-        expected_len = len(syscall.STANDARD_FIELDS) + sum((syscall.ARGCOUNT if param_typ.value.is_list else 1) for param_typ in syscall.valid_params.values())
+class SchedProcessForkParser(StandardSysCallParser):
+    _REGEXFORK = re.compile(rb"comm=(.*?)\s+pid=(\d*)\s+child_comm=(.*?)\s+child_pid=(\d*)" + _REGEXEND, re.S)
 
-        if (len(parts) == expected_len):
-            last_arg = parts[-1]
-            if not isinstance(list(syscall.valid_params.values())[-1].value.convert, str) or (
-                (last_arg[0] == '"' and last_arg[-1] == '"') or (last_arg[0] == '(' and last_arg[-1] == ')')
-            ):
-                parts[len(syscall.STANDARD_FIELDS):] = [(v[1:-1] if (v[0] == '"' and v[-1] == '"') else v) for v in parts[len(syscall.STANDARD_FIELDS):]]  # unquote
-                value_dict = _fill_value_dict(parts, syscall)
-                return value_dict
-        elif (len(parts) > expected_len):
-            print("got more parts than expected")
-            return
+    def compile(self, syscall, objects=False):
+        '''
+        Dieser Decoder ähnelt dem des StandardSysCallParsers, aber ist auf sched_process_fork spezialisiert,
+        da deren Logzeile einen etwas anderen Aufbau aufweist.
+        '''
+        layout = self.layout(syscall)
+        fill = layout.make if objects else layout.fill
+        regex = self._REGEXFORK
 
+        def decoder(line, header):
+            match = regex.match(line, header.end())
+            if (match is None):
+                return None
+            kname = header.group(5)
+            return fill((header.group(1), header.group(2), header.group(4), kname, kname), (match.group(3), match.group(4)))
 
-class SchedProcessForkParser(object):
-    _REGEXFORK = re.compile(r"^.*?\s(\S.*)-(?=\d+\s*)(\d+)\s*\[(\d*)\].*\s([0-9.]*):\s*(sched_process_fork):\s*comm=(.*)\s*pid=(\d*)\s*child_comm=(.*)\s*child_pid=(\d*)")
+        return decoder
 
-    def parse(self, syscall, line):
+    def build(self, syscall, parts, args, objects=False):
         '''
-        Diese Funktion ähnelt standard_syscall_parsing, aber ist auf sched_process_fork spezialisiert,
-        da deren Logzeile einen etwas anderen Aufbau aufweist.
+        Siehe StandardSysCallParser.build(), args sind hier child_comm und child_pid.
         '''
-        matchfork = self._REGEXFORK.match(str(line))
-        parts = [
-            matchfork.group(1),  # pname
-            matchfork.group(2),  # pid
-            matchfork.group(4),  # timestamp
-            matchfork.group(5),  # kname
-            matchfork.group(5),  # syscall
-            matchfork.group(8),  # name2
-            matchfork.group(9)   # pid2
-        ]
+        return super(SchedProcessForkParser, self).build(syscall, parts, args, objects)
 
-        return _fill_value_dict(parts, syscall)
 
+class IPAdressParser(StandardSysCallParser):
+    def __init__(self):
+        super(IPAdressParser, self).__init__()
+        self._event_classes = {}
 
-class IPAdressParser(object):
-    def parse(self, syscall, line):
+    def event_class(self, syscall):
+        '''
+        Gibt die Event-Klasse eines SysCalls zurück: STANDARD_FIELDS und "adress", das erst beim
+        Zugriff aus den Argumenten berechnet wird.
         '''
-        Diese Funktion ist dafür vorgesehen, aus den Informationen einer recht komplexen KProbe
+        cls = self._event_classes.get(syscall.__class__)
+        if (cls is None):
+            layout = self.layout(syscall)
+            to_address = self._address_converter(syscall)
+            fields = [(name, _part_loader(i, convert)) for i, (name, convert) in enumerate(layout.standard)]
+            fields.append(("adress", lambda event: to_address([int(v) for v in event._args])))
+            raw_loaders = {name: _part_loader(i, None) for i, (name, _) in enumerate(layout.standard)}
+            raw_loaders["adress"] = lambda event: list(event._args)
+            cls = self._event_classes[syscall.__class__] = make_event_class(layout.name + "Event", fields, raw_loaders)
+        return cls
+
+    def compile(self, syscall, objects=False):
+        '''
+        Dieser Decoder ist dafür vorgesehen, aus den Informationen einer recht komplexen KProbe
         eine IP-Adresse und einen Port auszulesen.
         Die Parameter, die die Funktion beinhalten muss sind:
 
@@ -183,16 +546,194 @@ class IPAdressParser(object):
 
         Das Rückgabe-Dictionary beinhaltet dann ein Element ``"addr": ("1.2.3.4", 5678)``
 
+        Mit objects=True werden die Argumente erst beim Zugriff auf "adress" ausgelesen.
         '''
-        parts = _parse_standard_fields(syscall, line)
+        if (objects):
+            return self._deferred_decoder(syscall)
+
+        body = re.compile(_REGEXSYMBOL + _REGEXARG * len(syscall.PARAMS) + _REGEXEND, re.S)
+        build = self.build
 
-        matchargs = self._REGEXARGS.findall(str(line))
+        def decoder(line, header):
+            match = body.match(line, header.end())
+            if (match is None):
+                return None
+            args = match.groups()
+            return build(syscall, (header.group(1), header.group(2), header.group(4), header.group(5), args[0]), [int(arg) for arg in args[1:]])
 
-        if matchargs:
-            parts += [int(arg) for arg in matchargs]
+        return decoder
 
-        parts = {k: v for k, v in zip(list(syscall.STANDARD_FIELDS.keys()) + list(syscall.PARAMS.keys()), parts)}
-        addr = SockAddr.convertToAddress(parts)
+    def _deferred_decoder(self, syscall):
+        args = re.compile(_REGEXARG * len(syscall.PARAMS) + _REGEXEND, re.S)
+        shape = _arg_shape(len(syscall.PARAMS))
+        symbol = _SYMBOL.match
+        event_class = self.event_class(syscall)
 
-        value_dict = {k: v for k, v in zip(list(syscall.STANDARD_FIELDS.keys()) + ["adress"], list(parts.values())[:len(syscall.STANDARD_FIELDS)] + [addr])}
+        def split(line, pos):
+            match = args.match(line, pos)
+            return match.groups() if match is not None else None
+
+        def decoder(line, header):
+            match = symbol(line, header.end())
+            if (match is None or shape(line, match.end()) is None):
+                return None
+            return event_class((header.group(1), header.group(2), header.group(4), header.group(5), match.group(1)), None, False, line, match.end(), split)
+
+        return decoder
+
+    def build(self, syscall, parts, args, objects=False):
+        '''
+        Siehe StandardSysCallParser.build(), args sind hier die Integer-Werte aus PARAMS.
+        '''
+        if (objects):
+            return self.event_class(syscall)(parts, args)
+        value_dict = self.layout(syscall).fill(parts, ())
+        value_dict["adress"] = self._address_converter(syscall)(args)
         return value_dict
+
+    @staticmethod
+    def _address_converter(syscall):
+        '''
+        Gibt eine Funktion zurück, die aus den Integer-Werten der Argumente die Adresse berechnet;
+        entsprechen die PARAMS der Reihenfolge von ARG_NAMES, ohne Umweg über ein dictionary.
+        '''
+        keys = tuple(syscall.PARAMS.keys())
+        if (keys == ARG_NAMES):
+            return SockAddr.convert_args
+        return lambda args: SockAddr.convertToAddress(dict(zip(keys, args)))
+
+
+class TracepointParser(StandardSysCallParser):
+    '''
+    Parser für SysCalls, die über ihren Tracepoint events/syscalls/sys_enter_<name> statt über eine
+    KProbe aufgezeichnet werden (siehe SysCall.tracepoint). Die Logzeile hat die Form
+
+    ``bash-4242 [001] .... 6788.761234: sys_setuid(uid: 3e8)``
+
+    Die Argumente sind hexadezimal und so breit wie ein Register; sie werden auf den Typ aus
+    PARAMS gebracht, sodass das Ergebnis dem der KProbe entspricht. "kname" ist weiterhin der
+    KName des SysCalls, "syscall" der Name aus trace_pipe (z.B. "sys_setuid").
+    '''
+
+    def compile(self, syscall, objects=False):
+        '''
+        Erstellt einen Decoder (siehe StandardSysCallParser.compile()) für die Argumente des Tracepoints.
+        Steht vor den Argumenten ihr Typ (Option verbose in trace_options), wird er übersprungen.
+        '''
+        tracepoint = syscall.tracepoint
+        layout = self.layout(syscall)
+        fill = layout.make if objects else layout.fill
+        args = [rb"(?:[^,:()]*\s)?" + re.escape(arg.encode()) + rb":\s*(?:0x)?([0-9a-fA-F]+)" for arg in tracepoint.args]
+        body = re.compile(rb"\(" + rb",\s*".join(args) + rb"\)" + _REGEXEND, re.S)
+        selectors = tracepoint.selectors
+        kname = syscall.kname
+        name = tracepoint.event_name
+
+        def decoder(line, header):
+            match = body.match(line, header.end())
+            if (match is None):
+                return None
+            values = match.groups()
+            return fill((header.group(1), header.group(2), header.group(4), kname, name), [convert(int(values[i], 16)) for i, convert in selectors])
+
+        return decoder
+
+    def build(self, syscall, parts, args, objects=False):
+        '''
+        Siehe StandardSysCallParser.build(), args sind hier die Werte aller Argumente des Tracepoints
+        in der Reihenfolge der format-Datei (siehe SyscallTracepoint.args).
+        '''
+        values = [convert(args[i]) for i, convert in syscall.tracepoint.selectors]
+        return super(TracepointParser, self).build(syscall, parts, values, objects)
+
+
+class ReturnProbeParser(StandardSysCallParser):
+    '''
+    Parser für die Rückkehr aus einem SysCall über dessen Kretprobe (siehe SysCall.RETPROBE).
+    Die Logzeile hat die Form
+
+    ``curl-4242 [001] d... 6788.761234: sys_connect_kretprobe: (entry_SYSCALL_64_fastpath+0x1a/0xa5 <- SyS_connect) ret=-115``
+
+    Das Ergebnis enthält die STANDARD_FIELDS ("kname" ist der KName der Kretprobe, "syscall" das
+    Symbol hinter "<-") und den Rückgabewert "ret". Zugeordnet zum Aufruf wird es vom
+    `ReturnPairer <#module-ftrace.latency>`_.
+    '''
+
+    _REGEXRETURN = re.compile(rb"\([^)]*?\s*<-\s*([^)+\s]*)[^)]*\)\s+ret=(-?\d+)" + _REGEXEND, re.S)
+
+    def __init__(self):
+        super(ReturnProbeParser, self).__init__()
+        self._event_classes = {}
+
+    def event_class(self, syscall):
+        '''
+        Gibt die Event-Klasse für die Rückkehr aus einem SysCall zurück: STANDARD_FIELDS und "ret".
+        '''
+        cls = self._event_classes.get(syscall.__class__)
+        if (cls is None):
+            layout = self.layout(syscall)
+            fields = [(name, _part_loader(i, convert)) for i, (name, convert) in enumerate(layout.standard)]
+            fields.append(("ret", lambda event: event._args[0]))
+            raw_loaders = {name: _part_loader(i, None) for i, (name, _) in enumerate(layout.standard)}
+            raw_loaders["ret"] = lambda event: event._args[0]
+            cls = self._event_classes[syscall.__class__] = make_event_class(layout.name + "ReturnEvent", fields, raw_loaders)
+        return cls
+
+    def compile(self, syscall, objects=False):
+        '''
+        Erstellt einen Decoder (siehe StandardSysCallParser.compile()) für die Kretprobe.
+        '''
+        regex = self._REGEXRETURN
+        build = self.build
+        kname = syscall.retprobe_kname
+
+        def decoder(line, header):
+            match = regex.match(line, header.end())
+            if (match is None):
+                return None
+            return build(syscall, (header.group(1), header.group(2), header.group(4), kname, match.group(1)), (int(match.group(2)),), objects)
+
+        return decoder
+
+    def convert(self, value):
+        return value
+
+    def build(self, syscall, parts, args, objects=False):
+        '''
+        Siehe StandardSysCallParser.build(), der Rückgabewert ist das letzte Element von args.
+        '''
+        ret = self.convert(args[-1])
+        if (objects):
+            return self.event_class(syscall)(parts, (ret,))
+        value_dict = {name: convert(value) for (name, convert), value in zip(self.layout(syscall).standard, parts)}
+        value_dict["ret"] = ret
+        return value_dict
+
+
+class SyscallExitParser(ReturnProbeParser):
+    '''
+    Parser für die Rückkehr aus einem SysCall über den Tracepoint events/syscalls/sys_exit_<name>
+    (siehe SysCall.RETPROBE), Logzeile: ``bash-4242 [001] .... 6788.761240: sys_setuid -> 0x0``
+
+    Der Rückgabewert steht hexadezimal als unsigned long in der Zeile und wird vorzeichenbehaftet
+    ausgegeben (0xfffffffffffffff2 -> -14), sonst wie beim ReturnProbeParser.
+    '''
+
+    _REGEXEXIT = re.compile(rb"(?:0x)?([0-9a-fA-F]+)" + _REGEXEND)
+
+    def compile(self, syscall, objects=False):
+        regex = self._REGEXEXIT
+        build = self.build
+        kname = syscall.retprobe_kname
+        name = syscall.tracepoint.event_name
+
+        def decoder(line, header):
+            match = regex.match(line, header.end())
+            if (match is None):
+                return None
+            return build(syscall, (header.group(1), header.group(2), header.group(4), kname, name), (int(match.group(1), 16),), objects)
+
+        return decoder
+
+    def convert(self, value):
+        return ((value & 0xffffffffffffffff) ^ 0x8000000000000000) - 0x8000000000000000
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+import os
+import queue
+import heapq
+import logging
+import threading
+import multiprocessing
+from itertools import count
+
+from ftrace.reader import PipeReader
+
+
+class CpuWorker(object):
+    '''
+    Liest und dekodiert den Ringpuffer einer einzelnen CPU (per_cpu/cpuN/trace_pipe_raw)
+    und legt die dekodierten Events seitenweise als (cpu, [dictionaries]) in out_queue ab.
+    Am Ende wird (cpu, None) abgelegt.
+
+    stop_event (threading.Event bzw. multiprocessing.Event bei einem Prozess) beendet den Worker
+    auch dann, wenn er auf Platz in einer vollen out_queue wartet; ohne wird ein eigenes erstellt.
+    '''
+
+    PUT_TIMEOUT = 0.1
+    '''Sekunden, nach denen ein Worker beim Warten auf Platz in out_queue erneut stop_event prüft'''
+
+    def __init__(self, path, cpu, decoder, out_queue, page_size=None, idle_timeout=None, stop_event=None):
+        self.cpu = cpu
+        self.decoder = decoder
+        self.out_queue = out_queue
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.reader = PipeReader(path, chunk_size=page_size or os.sysconf("SC_PAGE_SIZE"), idle_timeout=idle_timeout)
+
+    def _put(self, item):
+        '''
+        Legt item in out_queue ab; gibt False zurück, falls der Worker vorher gestoppt wurde.
+        '''
+        while (not self.stop_event.is_set()):
+            try:
+                self.out_queue.put(item, timeout=self.PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(self):
+        stopped = self.stop_event.is_set
+        try:
+            # leere Blöcke nach jedem Aufwecken ohne Daten, damit ein Prozess stop_event bemerkt
+            for page in self.reader.read_chunks(idle_chunks=True):
+                if (stopped()):
+                    break
+                if (not page):
+                    continue
+                events = self.decoder.decode_page(page)
+                if (events and not self._put((self.cpu, events))):
+                    break
+        except Exception:
+            logging.exception("reading cpu {} failed".format(self.cpu))
+        finally:
+            self.reader.close()
+            if (not self._put((self.cpu, None)) and hasattr(self.out_queue, "cancel_join_thread")):
+                self.out_queue.cancel_join_thread()  # Prozess nicht wegen ungelesener Daten in der Queue aufhalten
+
+    def stop(self):
+        self.stop_event.set()
+        self.reader.stop()
+
+
+class TimestampMerger(object):
+    '''
+    Führt die zeitlich geordneten Event-Ströme mehrerer CPUs mittels Heap (k-way merge)
+    zu einem zeitlich geordneten Strom zusammen.
+
+    Ein Event wird ausgegeben, sobald von jeder noch aktiven CPU ein Event mit
+    gleichem oder späterem Zeitstempel bekannt ist. Damit eine untätige CPU den Strom nicht
+    aufhält, ist das Umordnungsfenster begrenzt: Events, die mehr als reorder_window Sekunden
+    älter als das neueste bekannte Event sind, oder die über max_pending hinaus gepuffert
+    wären, werden auf jeden Fall ausgegeben.
+    '''
+
+    def __init__(self, cpus, reorder_window=0.5, max_pending=100000):
+        self.reorder_window = reorder_window
+        self.max_pending = max_pending
+        self.late_events = 0
+        '''Anzahl der Events, die nach bereits ausgegebenen, späteren Events eintrafen'''
+
+        self._heap = []
+        self._seq = count()
+        self._watermarks = {cpu: None for cpu in cpus}
+        self._newest = None
+        self._last_out = None
+
+    def finish(self, cpu):
+        '''
+        Markiert den Strom einer CPU als beendet.
+        '''
+        self._watermarks.pop(cpu, None)
+
+    def push(self, cpu, events):
+        heap = self._heap
+        seq = self._seq
+        for event in events:
+            ts = event["timestamp"]
+            if (self._last_out is not None and ts < self._last_out):
+                self.late_events += 1
+            heapq.heappush(heap, (ts, next(seq), event))
+        last = events[-1]["timestamp"]
+        self._watermarks[cpu] = last
+        if (self._newest is None or last > self._newest):
+            self._newest = last
+
+    def pop_ready(self, flush=False):
+        '''
+        Gibt alle Events zurück, die ausgegeben werden können, bzw. bei flush=True alle.
+        '''
+        heap = self._heap
+        out = []
+        if (not heap):
+            return out
+
+        watermarks = self._watermarks.values()
+        safe = None if (None in watermarks) else min(watermarks, default=self._newest)
+        limit = self._newest - self.reorder_window
+
+        while (heap):
+            ts = heap[0][0]
+            if (flush or (safe is not None and ts <= safe) or ts < limit or len(heap) > self.max_pending):
+                out.append(heapq.heappop(heap)[2])
+            else:
+                break
+        if (out):
+            self._last_out = out[-1]["timestamp"]
+        return out
+
+
+class ParallelRawReader(object):
+    '''
+    Startet für jede CPU einen eigenen Worker (Thread oder, mit use_processes=True, Prozess),
+    der den Ringpuffer dieser CPU liest und dekodiert.
+    Die Ströme werden mit dem TimestampMerger zeitlich geordnet zusammengeführt.
+
+    Bei ordered=False wird auf die Sortierung verzichtet und jedes Event ausgegeben, sobald
+    es dekodiert wurde. Das ist für Konsumenten geeignet, die nur aggregieren.
+
+    Parameter:
+
+    * workingdir: Verzeichnis des Kernelfeatures FTrace
+    * decoder: RawEventDecoder (jeder Worker erhält eine eigene Kopie über decoder.copy())
+    * cpus: Liste der CPUs (Standard: alle in per_cpu/)
+    * ordered: zeitlich sortierte Ausgabe
+    * reorder_window: maximale Umordnung in Sekunden (Trace-Zeit), siehe TimestampMerger
+    * use_processes: Worker als Prozesse statt als Threads starten
+    '''
+
+    def __init__(self, workingdir, decoder, cpus=None, ordered=True, reorder_window=0.5, use_processes=False,
+                 page_size=None, idle_timeout=None, max_pending=100000):
+        self.workingdir = workingdir
+        self.decoder = decoder
+        if (cpus is None):
+            cpus = sorted(int(d[3:]) for d in os.listdir(os.path.join(workingdir, "per_cpu")) if d.startswith("cpu"))
+        self.cpus = cpus
+        self.ordered = ordered
+        self.reorder_window = reorder_window
+        self.use_processes = use_processes
+        self.page_size = page_size
+        self.idle_timeout = idle_timeout
+        self.max_pending = max_pending
+        self.merger = None
+        self._workers = []
+        self._runners = []
+
+    def pipe_path(self, cpu):
+        return os.path.join(self.workingdir, "per_cpu", "cpu{}".format(cpu), "trace_pipe_raw")
+
+    def _start(self):
+        if (self.use_processes):
+            context = multiprocessing.get_context("fork")  # der Decoder wird vererbt, nicht gepickelt
+            out_queue = context.Queue(maxsize=len(self.cpus) * 64)
+        else:
+            context = threading
+            out_queue = queue.Queue(maxsize=len(self.cpus) * 64)
+
+        for cpu in self.cpus:
+            worker = CpuWorker(self.pipe_path(cpu), cpu, self.decoder.copy(), out_queue, self.page_size, self.idle_timeout, context.Event())
+            if (self.use_processes):
+                runner = context.Process(target=worker.run, name="ftrace-cpu{}".format(cpu), daemon=True)
+            else:
+                runner = context.Thread(target=worker.run, name="ftrace-cpu{}".format(cpu), daemon=True)
+            runner.start()
+            self._workers.append(worker)
+            self._runners.append(runner)
+        return out_queue
+
+    def stop(self):
+        '''
+        Beendet alle Worker. Sie bemerken das auch, während sie auf Platz in der Queue warten
+        (siehe CpuWorker); Prozesse, die nach dem Warten in __iter__() noch laufen, werden beendet.
+        '''
+        for worker in self._workers:
+            worker.stop()
+
+    def __iter__(self):
+        out_queue = self._start()
+        running = len(self.cpus)
+        merger = self.merger = TimestampMerger(self.cpus, self.reorder_window, self.max_pending)
+        try:
+            while (running):
+                try:
+                    cpu, events = out_queue.get(timeout=self.reorder_window if self.ordered else None)
+                except queue.Empty:
+                    # längere Zeit keine neuen Seiten: alles Gepufferte ausgeben
+                    for event in merger.pop_ready(flush=True):
+                        yield event
+                    continue
+
+                if (events is None):
+                    running -= 1
+                    merger.finish(cpu)
+                elif (not self.ordered):
+                    for event in events:
+                        yield event
+                    continue
+                else:
+                    merger.push(cpu, events)
+
+                for event in merger.pop_ready():
+                    yield event
+
+            for event in merger.pop_ready(flush=True):
+                yield event
+        finally:
+            self.stop()
+            for runner in self._runners:
+                runner.join(1)
+            if (self.use_processes):
+                for worker, runner in zip(self._workers, self._runners):
+                    if (runner.is_alive()):
+                        runner.terminate()
+                    worker.reader.close()  # Kopie der Filedeskriptoren im Elternprozess
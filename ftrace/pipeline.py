@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+import threading
+from collections import deque
+
+from ftrace.reader import PipeReader
+
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "sample")
+'''
+Verhalten einer vollen BoundedQueue:
+
+* block: der Produzent wartet, bis wieder Platz ist
+* drop_oldest: der älteste Eintrag wird verworfen
+* sample: nur jeder sample_every-te Eintrag wird (unter Verwerfen des ältesten) aufgenommen,
+  die übrigen werden verworfen
+'''
+
+
+class BoundedQueue(object):
+    '''
+    Begrenzte Queue zwischen zwei Stufen der Pipeline mit wählbarem Verhalten bei Überlauf
+    (siehe OVERFLOW_POLICIES) und Zählern für die Füllstände.
+
+    Einträge können ein Gewicht haben (z.B. Anzahl der Events eines Batches), damit verworfene
+    Events gezählt werden können. Nach close() werden keine Einträge mehr angenommen;
+    get() gibt dann, sobald die Queue leer ist, None zurück.
+    '''
+
+    def __init__(self, maxsize, policy="block", sample_every=10, name=""):
+        if (policy not in OVERFLOW_POLICIES):
+            raise ValueError("policy must be one of {}, {} given".format(OVERFLOW_POLICIES, policy))
+        self.maxsize = maxsize
+        self.policy = policy
+        self.sample_every = sample_every
+        self.name = name
+
+        self.puts = 0
+        self.dropped = 0
+        '''Anzahl der verworfenen Einträge'''
+        self.dropped_weight = 0
+        '''Summe der Gewichte der verworfenen Einträge'''
+        self.max_depth = 0
+        self.time_blocked = 0.0
+        '''Zeit in Sekunden, die Produzenten auf Platz gewartet haben'''
+
+        self._items = deque()
+        self._closed = False
+        self._overflows = 0
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _drop_oldest(self):
+        _, weight = self._items.popleft()
+        self.dropped += 1
+        self.dropped_weight += weight
+
+    def put(self, item, weight=1):
+        '''
+        Fügt einen Eintrag hinzu. Gibt False zurück, falls er nicht aufgenommen wurde
+        (verworfen oder Queue geschlossen).
+        '''
+        with self._cond:
+            if (self._closed):
+                return False
+            if (len(self._items) >= self.maxsize):
+                if (self.policy == "block"):
+                    start = time.monotonic()
+                    while (len(self._items) >= self.maxsize and not self._closed):
+                        self._cond.wait()
+                    self.time_blocked += time.monotonic() - start
+                    if (self._closed):
+                        return False
+                elif (self.policy == "drop_oldest"):
+                    self._drop_oldest()
+                else:
+                    self._overflows += 1
+                    if (self._overflows % self.sample_every):
+                        self.dropped += 1
+                        self.dropped_weight += weight
+                        return False
+                    self._drop_oldest()
+            elif (self._overflows):
+                self._overflows = 0
+
+            self._items.append((item, weight))
+            self.puts += 1
+            if (len(self._items) > self.max_depth):
+                self.max_depth = len(self._items)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        '''
+        Gibt den ältesten Eintrag zurück bzw. None, wenn die Queue geschlossen und leer ist
+        (oder timeout abgelaufen ist).
+        '''
+        with self._cond:
+            if (not self._items and not self._closed):
+                self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            if (not self._items):
+                return None
+            item, _ = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def stats(self):
+        return {
+            "depth": len(self._items),
+            "max_depth": self.max_depth,
+            "maxsize": self.maxsize,
+            "puts": self.puts,
+            "dropped": self.dropped,
+            "dropped_weight": self.dropped_weight,
+            "time_blocked": self.time_blocked,
+        }
+
+
+class Pipeline(object):
+    '''
+    Zerlegt das Lesen von trace_pipe in drei Stufen, die über BoundedQueues verbunden sind:
+
+    * Lesen (Thread): leert die Pipe mit einem `PipeReader <#module-ftrace.reader>`_ und legt Blöcke
+      vollständiger Zeilen in raw_queue ab. Dieser Thread macht sonst nichts, damit der Ringpuffer
+      des Kernels auch dann geleert wird, wenn die folgenden Stufen langsam sind.
+    * Parsen (Thread): zerlegt die Blöcke in Zeilen, parst sie und legt die Events als Batches in
+      event_queue ab.
+    * Ausliefern: der Iterator der Pipeline, also der Thread des Konsumenten.
+
+    Läuft event_queue über, wird entsprechend policy gewartet bzw. verworfen (siehe OVERFLOW_POLICIES).
+    Bei drop_oldest und sample gehen dabei ganze Batches geparster Events verloren, der Kernel
+    verliert dafür keine; die Zähler stehen in stats().
+    raw_queue wartet dagegen immer: ein verworfener Block würde eine auf mehrere Zeilen verteilte
+    Logzeile zerreißen, deren Anfang der Parser bereits zwischengespeichert hat. Kommt das Parsen
+    nicht nach, wartet also das Lesen und der Ringpuffer des Kernels läuft über (siehe buffer_stats()).
+
+    .. code:: python
+
+      pipeline = Pipeline(PipeReader(path), parser, policy="drop_oldest")
+      for data in pipeline:
+          ...
+      pipeline.stats()
+    '''
+
+    def __init__(self, reader, parser, raw_queue_size=256, event_queue_size=256, policy="block", sample_every=10):
+        self.reader = reader
+        self.parser = parser
+        self.raw_queue = BoundedQueue(raw_queue_size, "block", name="raw")
+        self.event_queue = BoundedQueue(event_queue_size, policy, sample_every, name="events")
+        self.time_parsing = 0.0
+        self.events = 0
+        self._threads = []
+
+    def _read(self):
+        rest = b""
+        put = self.raw_queue.put
+        try:
+            for chunk in self.reader.read_chunks():
+                if (rest):
+                    chunk = rest + chunk
+                end = chunk.rfind(b"\n") + 1
+                rest = chunk[end:]
+                if (end):
+                    put(chunk[:end], chunk.count(b"\n", 0, end))
+            if (rest):
+                put(rest)
+        except Exception:
+            logging.exception("reading {} failed".format(self.reader.path))
+        finally:
+            self.reader.close()
+            self.raw_queue.close()
+
+    def _parse(self):
+        get = self.raw_queue.get
+        put = self.event_queue.put
+        parse = self.parser.parse
+        clock = time.perf_counter
+        try:
+            while (True):
+                chunk = get()
+                if (chunk is None):
+                    return
+                start = clock()
+                events = []
+                lines = chunk.split(b"\n")
+                if (not lines[-1]):
+                    lines.pop()
+                for line in lines:
+                    value_dict = parse(line + b"\n")
+                    if (value_dict):
+                        events.append(value_dict)
+                self.time_parsing += clock() - start
+                if (events):
+                    self.events += len(events)
+                    put(events, len(events))
+        except Exception:
+            logging.exception("parsing failed")
+        finally:
+            self.event_queue.close()
+            self.raw_queue.close()
+
+    def start(self):
+        for target, name in ((self._read, "ftrace-read"), (self._parse, "ftrace-parse")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        '''
+        Beendet alle Stufen. Wartende Produzenten werden aufgeweckt.
+        '''
+        self.reader.stop()
+        self.raw_queue.close()
+        self.event_queue.close()
+
+    def __iter__(self):
+        if (not self._threads):
+            self.start()
+        get = self.event_queue.get
+        try:
+            while (True):
+                events = get()
+                if (events is None):
+                    return
+                for value_dict in events:
+                    yield value_dict
+        finally:
+            self.stop()
+            for thread in self._threads:
+                thread.join(1)
+
+    def stats(self):
+        '''
+        Gibt die Zähler aller Stufen zurück:
+
+        .. code:: python
+
+          {"reader": {...}, "raw_queue": {...}, "event_queue": {...}, "time_parsing": 1.2, "events": 100000}
+        '''
+        return {
+            "reader": self.reader.stats() if isinstance(self.reader, PipeReader) else {},
+            "raw_queue": self.raw_queue.stats(),
+            "event_queue": self.event_queue.stats(),
+            "time_parsing": self.time_parsing,
+            "events": self.events,
+        }
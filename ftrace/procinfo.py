@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import time
+import logging
+from collections import OrderedDict
+
+from ftrace import syscalls
+from ftrace.proctree import FORK_KNAMES, EXEC_KNAMES
+
+
+CRED_KNAMES = frozenset([
+    syscalls.Sys_Setuid.class_kname(), syscalls.Sys_Setgid.class_kname(), syscalls.Sys_Setreuid.class_kname()
+])
+'''SysCalls, die uid/gid eines Prozesses ändern und dessen Eintrag im Cache ungültig machen'''
+
+_CONTAINER_ID = re.compile(r"(?:^|[/-])([0-9a-f]{64})(?:\.scope)?$")
+'''Container-ID (64 Hex-Zeichen) am Ende eines cgroup-Pfads, z.B. docker-<id>.scope oder /docker/<id>'''
+
+
+def container_id(cgroups):
+    '''
+    Sucht in den cgroup-Pfaden eines Prozesses nach einer Container-ID (Docker, containerd,
+    CRI-O, Podman) und gibt sie bzw. None zurück.
+    '''
+    for path in cgroups:
+        match = _CONTAINER_ID.search(path)
+        if (match is not None):
+            return match.group(1)
+    return None
+
+
+def read_procinfo(pid, proc_root="/proc"):
+    '''
+    Liest cmdline, uid/gid (real, effektiv) und cgroups eines Prozesses aus proc_root/<pid>
+    und gibt sie als dictionary zurück, bzw. None, falls der Prozess nicht (mehr) existiert:
+
+    .. code:: python
+
+      {"cmdline": ["sudo", "ls"], "uid": 1000, "euid": 0, "gid": 1000, "egid": 1000,
+       "cgroup": ["/user.slice/..."], "container_id": None}
+    '''
+    base = os.path.join(proc_root, str(pid))
+    try:
+        with open(os.path.join(base, "cmdline"), "rb") as f:
+            cmdline = [arg.decode("utf-8", "backslashreplace") for arg in f.read().split(b"\0")]
+        with open(os.path.join(base, "status"), "rb") as f:
+            status = f.read().decode("utf-8", "backslashreplace")
+        with open(os.path.join(base, "cgroup"), "rb") as f:
+            cgroup = f.read().decode("utf-8", "backslashreplace")
+    except (OSError, IOError):
+        return None
+
+    if (cmdline and not cmdline[-1]):
+        cmdline.pop()
+    info = {"cmdline": cmdline, "uid": None, "euid": None, "gid": None, "egid": None}
+    for line in status.splitlines():
+        key, _, value = line.partition(":")
+        if (key in ("Uid", "Gid")):
+            ids = value.split()
+            if (len(ids) >= 2):
+                prefix = key[0].lower()
+                info[prefix + "id"] = int(ids[0])
+                info["e" + prefix + "id"] = int(ids[1])
+    info["cgroup"] = [line.split(":", 2)[-1] for line in cgroup.splitlines() if line]
+    info["container_id"] = container_id(info["cgroup"])
+    return info
+
+
+class ProcInfoCache(object):
+    '''
+    Cache für Metadaten aus /proc (cmdline, uid/gid, cgroup, Container-ID), damit nicht für jedes
+    Event mehrere Dateien gelesen werden müssen; caller_name enthält nur die ersten 15 Zeichen
+    des Prozessnamens bzw. "<...>".
+
+    Ein Prozess wird beim ersten Auftreten seiner PID gelesen (siehe read_procinfo()).
+    Die Events des Stroms halten den Cache aktuell:
+
+    * Sched_Process_Fork: Eintrag des Kindprozesses verwerfen (PID neu vergeben)
+    * Sys_Execve: Eintrag verwerfen, beim nächsten Event wird cmdline neu gelesen
+    * Sys_Setuid, Sys_Setgid, Sys_Setreuid: Eintrag verwerfen (uid/gid geändert)
+
+    Nach Sys_Exit bzw. Sys_Exit_Group bleibt der Eintrag erhalten (/proc ist danach leer), sodass auch
+    spätere Events des Prozesses noch dessen Metadaten bekommen. Wie alle Einträge verfällt er nach
+    ttl Sekunden; danach wird die PID neu gelesen, falls sie inzwischen neu vergeben wurde.
+
+    Sind mehr als max_entries gespeichert, werden die am längsten nicht verwendeten entfernt.
+    Prozesse, die beim Lesen nicht mehr existieren, werden ebenfalls (als None) gespeichert.
+
+    .. code:: python
+
+      cache = ProcInfoCache()
+      for data in cache.enrich(ftrace.get_output()):
+          print(data["procinfo"]["cmdline"] if data["procinfo"] else data["caller_name"])
+      cache.stats()  # {"hits": ..., "misses": ..., "hit_rate": ..., ...}
+    '''
+
+    def __init__(self, max_entries=4096, ttl=30.0, proc_root="/proc"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.proc_root = proc_root
+
+        self.hits = 0
+        self.misses = 0
+        self.reads = 0
+        self.read_errors = 0
+        '''Lesevorgänge, bei denen der Prozess nicht (mehr) existierte'''
+        self.invalidations = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._entries = OrderedDict()  # {pid: (info, Zeitpunkt des Lesens)}, zuletzt verwendete am Ende
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, pid):
+        '''
+        Gibt die Metadaten eines Prozesses aus dem Cache zurück und liest sie bei Bedarf.
+        '''
+        entry = self._entries.get(pid)
+        now = time.monotonic()
+        if (entry is not None):
+            if (now - entry[1] < self.ttl):
+                self._entries.move_to_end(pid)
+                self.hits += 1
+                return entry[0]
+            self.expirations += 1
+
+        self.misses += 1
+        info = self._read(pid)
+        self._entries[pid] = (info, now)
+        self._entries.move_to_end(pid)
+        while (len(self._entries) > self.max_entries):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return info
+
+    def _read(self, pid):
+        self.reads += 1
+        info = read_procinfo(pid, self.proc_root)
+        if (info is None):
+            self.read_errors += 1
+            logging.debug("no /proc entry for pid {}".format(pid))
+        return info
+
+    def invalidate(self, pid):
+        if (self._entries.pop(pid, None) is not None):
+            self.invalidations += 1
+
+    def update(self, event):
+        '''
+        Wertet ein Event für die Invalidierung aus (siehe Klassenbeschreibung).
+        '''
+        kname = event["kname"]
+        if (kname in FORK_KNAMES):
+            self.invalidate(event["called_pid"])
+        elif (kname in EXEC_KNAMES or kname in CRED_KNAMES):
+            self.invalidate(event["caller_pid"])
+
+    def enrich(self, events, field="procinfo"):
+        '''
+        Generator, der die Events aus events um field ergänzt: die Metadaten des aufrufenden
+        Prozesses (siehe read_procinfo()) bzw. None. Event-Objekte werden dafür in dictionaries
+        umgewandelt, leere Ergebnisse (None) unverändert weitergegeben.
+        '''
+        update = self.update
+        get = self.get
+        for event in events:
+            if (event):
+                info = get(event["caller_pid"])
+                update(event)  # erst danach: die KProbe feuert vor dem Execve bzw. Setuid
+                if (not isinstance(event, dict)):
+                    event = event.to_dict()
+                event[field] = info
+            yield event
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "reads": self.reads,
+            "read_errors": self.read_errors,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from ftrace.parsers import _REGEXHEADER
+from ftrace.pipeline import BoundedQueue
+
+
+_worker_parser = None
+'''Parser eines Worker-Prozesses, wird von _init_worker() gesetzt'''
+_worker_lost = []
+
+
+def _init_worker(parser):
+    '''
+    Initialisiert einen Worker-Prozess mit dem Parser des Elternprozesses (initializer des
+    ProcessPoolExecutors). Meldungen über verlorene Events werden gesammelt und mit dem Ergebnis
+    des nächsten Batches zurückgegeben.
+    '''
+    global _worker_parser
+    _worker_parser = parser
+    if (hasattr(parser, "on_lost")):
+        parser.on_lost = lambda cpu, count: _worker_lost.append((cpu, count))
+
+
+def encode_events(events):
+    '''
+    Wandelt eine Liste von dictionaries in die kompakte Form (keys, rows) um: keys ist eine Liste
+    der vorkommenden Schlüssel-Tupel, rows enthält pro Event ein Tupel (Index in keys, Werte...).
+    Die Schlüssel werden so nur einmal pro Batch statt einmal pro Event übertragen.
+    '''
+    keys = []
+    index = {}
+    rows = []
+    for event in events:
+        key = tuple(event)
+        i = index.get(key)
+        if (i is None):
+            i = index[key] = len(keys)
+            keys.append(key)
+        rows.append((i,) + tuple(event.values()))
+    return keys, rows
+
+
+def decode_events(keys, rows):
+    '''
+    Umkehrung von encode_events().
+    '''
+    return [dict(zip(keys[row[0]], row[1:])) for row in rows]
+
+
+def _parse_batch(seq, data):
+    '''
+    Parst einen Batch vollständiger Logzeilen in einem Worker-Prozess.
+    Gibt (seq, keys, rows, lost) zurück, siehe encode_events().
+    '''
+    parse = _worker_parser.parse
+    events = []
+    lines = data.split(b"\n")
+    if (not lines[-1]):
+        lines.pop()
+    for line in lines:
+        value_dict = parse(line + b"\n")
+        if (value_dict):
+            events.append(value_dict)
+    if (hasattr(_worker_parser, "reset")):
+        _worker_parser.reset()  # Batches enden vor dem Kopf einer Logzeile, siehe split_batch()
+
+    lost = list(_worker_lost)
+    del _worker_lost[:]
+    keys, rows = encode_events(events)
+    return seq, keys, rows, lost
+
+
+def split_batch(data):
+    '''
+    Teilt data (vollständige Zeilen) vor der letzten Zeile, die mit dem Kopf einer Logzeile
+    beginnt. Der erste Teil enthält damit nur abgeschlossene Logzeilen (auch solche, die sich
+    über mehrere Zeilen erstrecken), der zweite wird mit den folgenden Daten weitergegeben.
+    '''
+    end = len(data) - 1 if data.endswith(b"\n") else len(data)
+    while (end > 0):
+        start = data.rfind(b"\n", 0, end) + 1
+        if (_REGEXHEADER.match(data, start) is not None):
+            return data[:start], data[start:]
+        end = start - 1
+    return b"", data
+
+
+class ProcessPoolParser(object):
+    '''
+    Verteilt das Parsen auf mehrere Prozesse (`ProcessPoolExecutor`), um es über mehrere Kerne
+    zu skalieren; in einem Prozess ist das Parsen durch den GIL begrenzt.
+
+    Ein Lese-Thread legt die gelesenen Blöcke in einer BoundedQueue ab. Daraus werden Batches von
+    etwa batch_size Bytes gebildet, die jeweils vor dem Kopf einer Logzeile enden, sodass auch über
+    mehrere Zeilen verteilte Logzeilen vollständig in einem Batch liegen. Ein Batch wird als ein
+    bytes-Objekt an einen Worker übergeben; die Ergebnisse kommen in der kompakten Form von
+    encode_events() zurück, statt jedes dictionary einzeln zu pickeln.
+    Liegen flush_interval Sekunden lang keine neuen Daten an, wird auch ein kleinerer Batch abgeschickt;
+    die letzte Logzeile bleibt dabei bis zum Kopf der nächsten (bzw. bis zum Ende) zurück, da sie
+    sich über mehrere Zeilen erstrecken kann.
+
+    * ordered=True: die Events werden in der Reihenfolge der Pipe ausgegeben.
+    * ordered=False: die Events werden ausgegeben, sobald ihr Batch geparst ist, und zwar als
+      (Batchnummer, dictionary); innerhalb eines Batches bleibt die Reihenfolge erhalten.
+
+    Höchstens max_inflight Batches werden gleichzeitig geparst; danach wird das Lesen gebremst.
+
+    Die Worker werden mit fork gestartet und erhalten den Parser samt SysCalls und Filtern im
+    Zustand beim Start (initializer des Executors, siehe _init_worker()). Die Zähler der Filter
+    werden dabei in den Workern, nicht im Elternprozess erhöht. Meldungen über verlorene Events
+    werden an den Parser des Elternprozesses weitergereicht (SysCallParser.report_lost()).
+    '''
+
+    def __init__(self, parser, workers=None, batch_size=256 * 1024, ordered=True, max_inflight=None, flush_interval=0.1):
+        self.parser = parser
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.ordered = ordered
+        self.max_inflight = max_inflight or self.workers * 2
+        self.flush_interval = flush_interval
+
+        self.batches = 0
+        self.events = 0
+        self.bytes_submitted = 0
+        self._stopped = False
+        self._queue = None
+        self._source = None
+
+    def _executor(self):
+        # mit fork werden initargs vererbt, nicht gepickelt
+        context = multiprocessing.get_context("fork")
+        return ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker, initargs=(self.parser,))
+
+    def _read(self, chunks, raw_queue):
+        try:
+            for chunk in chunks:
+                if (not raw_queue.put(chunk)):
+                    break
+        except Exception:
+            logging.exception("reading failed")
+        finally:
+            raw_queue.close()
+            close = getattr(chunks, "close", None)
+            if (close is not None):
+                close()  # z.B. read_chunks(): Pipe im Lese-Thread schließen
+
+    def _results(self, future):
+        seq, keys, rows, lost = future.result()
+        if (hasattr(self.parser, "report_lost")):
+            for cpu, count in lost:
+                self.parser.report_lost(cpu, count)
+        events = decode_events(keys, rows)
+        self.events += len(events)
+        if (self.ordered):
+            return events
+        return [(seq, event) for event in events]
+
+    def parse_chunks(self, chunks, source=None):
+        '''
+        Generator, der die Datenblöcke aus chunks (z.B. PipeReader.read_chunks()) parst,
+        siehe Klassenbeschreibung.
+
+        source ist das Objekt, das chunks liefert (z.B. der PipeReader); endet der Generator vorzeitig
+        (break, Exception), wird source.stop() aufgerufen und gewartet, bis der Lese-Thread beendet
+        ist. Erst danach darf source geschlossen werden. Ohne source wird nur eine Sekunde gewartet.
+        '''
+        raw_queue = BoundedQueue(max(self.max_inflight * 4, 16), "block", name="raw")
+        reader = threading.Thread(target=self._read, args=(chunks, raw_queue), name="ftrace-read", daemon=True)
+        self._queue = raw_queue
+        self._source = source
+        executor = self._executor()
+        executor.submit(int).result()  # Worker starten, bevor der Lese-Thread läuft (fork)
+        inflight = deque()
+        buf = b""
+        seq = 0
+        reader.start()
+        try:
+            while (True):
+                chunk = raw_queue.get(timeout=self.flush_interval)
+                end = chunk is None and raw_queue.closed and not len(raw_queue)
+                data = b""
+                if (chunk is not None):
+                    buf += chunk
+                    if (len(buf) >= self.batch_size):
+                        data, buf = split_batch(buf)
+                elif (end):
+                    data, buf = buf, b""
+                elif (buf):
+                    # flush_interval lang keine neuen Daten: die letzte Logzeile könnte noch fortgesetzt werden
+                    data, buf = split_batch(buf)
+                if (data):
+                    inflight.append(executor.submit(_parse_batch, seq, data))
+                    seq += 1
+                    self.batches += 1
+                    self.bytes_submitted += len(data)
+
+                while (inflight and (len(inflight) >= self.max_inflight or end or inflight[0].done() or not self.ordered)):
+                    if (self.ordered):
+                        future = inflight.popleft()
+                    else:
+                        done, _ = wait(inflight, timeout=None if (len(inflight) >= self.max_inflight or end) else 0, return_when=FIRST_COMPLETED)
+                        if (not done):
+                            break
+                        future = done.pop()
+                        inflight.remove(future)
+                    for value in self._results(future):
+                        yield value
+
+                if (end and not inflight):
+                    return
+        finally:
+            self.stop()
+            for future in inflight:
+                future.cancel()
+            executor.shutdown(wait=True)
+            reader.join(None if source is not None else 1)
+
+    def stop(self):
+        '''
+        Beendet das Parsen: die Queue des Lese-Threads wird geschlossen und source (siehe parse_chunks())
+        gestoppt, sodass auch ein Lese-Thread, der auf Daten wartet, aufwacht.
+        '''
+        self._stopped = True
+        if (self._queue is not None):
+            self._queue.close()
+        if (self._source is not None):
+            self._source.stop()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "batches": self.batches,
+            "events": self.events,
+            "bytes_submitted": self.bytes_submitted,
+        }
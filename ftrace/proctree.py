@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from collections import OrderedDict
+
+from ftrace import syscalls
+
+
+FORK_KNAMES = frozenset([syscalls.Sched_Process_Fork.class_kname()])
+EXEC_KNAMES = frozenset([syscalls.Sys_Execve.class_kname()])
+EXIT_KNAMES = frozenset([syscalls.Sys_Exit.class_kname(), syscalls.Sys_Exit_Group.class_kname()])
+
+
+def _clean_argv(argv):
+    '''
+    Entfernt die nicht belegten Listenelemente am Ende von argv ("(fault)" bzw. "", siehe ARGCOUNT).
+    '''
+    argv = list(argv)
+    while (argv and argv[-1] in ("(fault)", "")):
+        argv.pop()
+    return argv
+
+
+class ProcessInfo(object):
+    '''
+    Ein Prozess im ProcessTree.
+
+    * pid, name: PID und zuletzt bekannter Prozessname
+    * parent: ProcessInfo des Elternprozesses bzw. None, falls unbekannt. Es wird das Objekt
+      referenziert, nicht die PID, damit die Abstammung auch bei Wiederverwendung der PID stimmt.
+    * filename, argv: Parameter des letzten Sys_Execve (argv ohne nicht belegte Elemente)
+    * execs: Anzahl der Sys_Execve
+    * started, exec_time, exited: Zeitstempel von Fork, letztem Execve und Exit (bzw. None)
+    * exit_code: error_code von Sys_Exit bzw. Sys_Exit_Group
+    '''
+
+    __slots__ = ("pid", "name", "parent", "filename", "argv", "execs", "started", "exec_time", "exited", "exit_code", "last_seen")
+
+    def __init__(self, pid, name=None, parent=None, started=None):
+        self.pid = pid
+        self.name = name
+        self.parent = parent
+        self.filename = None
+        self.argv = None
+        self.execs = 0
+        self.started = started
+        self.exec_time = None
+        self.exited = None
+        self.exit_code = None
+        self.last_seen = started
+
+    def __repr__(self):
+        return "ProcessInfo(pid={}, name={!r}, ppid={}, argv={!r}, exited={})".format(
+            self.pid, self.name, self.ppid, self.argv, self.exited)
+
+    @property
+    def ppid(self):
+        return self.parent.pid if self.parent is not None else None
+
+    @property
+    def alive(self):
+        return self.exited is None
+
+    def ancestors(self, limit=64):
+        '''
+        Gibt die Vorfahren (Elternprozess zuerst) als Liste von ProcessInfos zurück.
+        '''
+        chain = []
+        process = self.parent
+        while (process is not None and len(chain) < limit):
+            chain.append(process)
+            process = process.parent
+        return chain
+
+
+class ProcessTree(object):
+    '''
+    Inkrementell gepflegter Prozessbaum aus den Events von Sched_Process_Fork, Sys_Execve,
+    Sys_Exit und Sys_Exit_Group (siehe SYSCALLS), z.B. für die Analyse aus
+    `sudo vs. su <../sudo_vs_su.html>`_ im laufenden Betrieb.
+
+    .. code:: python
+
+      tree = ProcessTree()
+      ftrace.tracer.syscalls = [syscall() for syscall in ProcessTree.SYSCALLS] + [Sys_Setuid()]
+      for data in tree.enrich(ftrace.get_output()):
+          print(data["ancestors"])  # [(7291, 'sudo'), (4588, 'bash'), ...]
+      tree[7292].argv
+
+    * Zugriff per PID in O(1) (tree[pid], tree.get(pid)), Vorfahren über ancestors(pid)
+    * Wird eine PID durch einen Fork neu vergeben, obwohl der alte Prozess noch eingetragen ist
+      (Exit nicht gesehen oder bereits beendet), ersetzt der neue Eintrag den alten; Kindprozesse
+      behalten ihren Verweis auf den alten Elternprozess (pid_reuses zählt diese Fälle).
+    * Beendete Prozesse bleiben bis zu max_exited Stück abrufbar und werden dann in der Reihenfolge
+      ihres Exits entfernt. Sind mehr als max_processes Prozesse eingetragen (z.B. weil Exits
+      verloren gingen), werden die am längsten nicht gesehenen entfernt.
+    * PIDs, die ohne vorherigen Fork auftauchen, werden mit unbekanntem Elternprozess eingetragen.
+    '''
+
+    SYSCALLS = (syscalls.Sched_Process_Fork, syscalls.Sys_Execve, syscalls.Sys_Exit, syscalls.Sys_Exit_Group)
+    '''SysCalls, deren Events den Baum verändern'''
+
+    def __init__(self, max_processes=65536, max_exited=4096):
+        self.max_processes = max_processes
+        self.max_exited = max_exited
+        self.pid_reuses = 0
+        self.evicted = 0
+        '''Anzahl der Prozesse, die wegen max_processes entfernt wurden'''
+        self._processes = OrderedDict()  # {pid: ProcessInfo}, zuletzt gesehene am Ende
+        self._exited = OrderedDict()  # {pid: ProcessInfo}, in Reihenfolge der Exits
+
+    def __len__(self):
+        return len(self._processes)
+
+    def __contains__(self, pid):
+        return pid in self._processes
+
+    def __getitem__(self, pid):
+        return self._processes[pid]
+
+    def get(self, pid, default=None):
+        return self._processes.get(pid, default)
+
+    def ancestors(self, pid, limit=64):
+        '''
+        Gibt die Vorfahren eines Prozesses (Elternprozess zuerst) zurück, bzw. eine leere Liste.
+        '''
+        process = self._processes.get(pid)
+        return process.ancestors(limit) if process is not None else []
+
+    def _add(self, process):
+        pid = process.pid
+        old = self._processes.get(pid)
+        if (old is not None):
+            self.pid_reuses += 1
+            self._exited.pop(pid, None)
+        self._processes[pid] = process
+        self._processes.move_to_end(pid)
+        while (len(self._processes) > self.max_processes):
+            evicted_pid, _ = self._processes.popitem(last=False)
+            self._exited.pop(evicted_pid, None)
+            self.evicted += 1
+        return process
+
+    def _touch(self, pid, name, timestamp):
+        process = self._processes.get(pid)
+        if (process is None or process.exited is not None):
+            if (process is not None):
+                logging.debug("pid {} seen after its exit, assuming reuse".format(pid))
+            process = self._add(ProcessInfo(pid, name, started=None))
+        else:
+            self._processes.move_to_end(pid)
+        if (name and name != "<...>"):
+            process.name = name
+        process.last_seen = timestamp
+        return process
+
+    def update(self, event):
+        '''
+        Verarbeitet ein Event und gibt die ProcessInfo des aufrufenden Prozesses
+        (bei Sched_Process_Fork die des Kindprozesses) zurück.
+        '''
+        kname = event["kname"]
+        timestamp = event["timestamp"]
+        if (kname in FORK_KNAMES):
+            parent = self._touch(event["caller_pid"], event["caller_name"], timestamp)
+            name = event["called_name"].strip() or parent.name
+            child = self._processes.get(event["called_pid"])
+            if (child is not None and child.alive and child.parent is None and child.started is None
+                    and child.last_seen is not None and child.last_seen >= timestamp):
+                child.parent = parent  # Events des Kindprozesses kamen vor dem Fork an (andere CPU)
+                child.started = timestamp
+                return child
+            return self._add(ProcessInfo(event["called_pid"], name, parent, timestamp))
+
+        process = self._touch(event["caller_pid"], event["caller_name"], timestamp)
+        if (kname in EXEC_KNAMES):
+            process.filename = event["filename"]
+            process.argv = _clean_argv(event["argv"])
+            process.execs += 1
+            process.exec_time = timestamp
+            if (process.argv):
+                process.name = process.argv[0].rsplit("/", 1)[-1]
+        elif (kname in EXIT_KNAMES):
+            process.exited = timestamp
+            process.exit_code = event["error_code"]
+            self._exited[process.pid] = process
+            while (len(self._exited) > self.max_exited):
+                pid, old = self._exited.popitem(last=False)
+                if (self._processes.get(pid) is old):
+                    del self._processes[pid]
+        return process
+
+    def enrich(self, events, field="ancestors"):
+        '''
+        Generator, der alle Events aus events mit update() verarbeitet und um field ergänzt:
+        die Vorfahren des aufrufenden Prozesses als Liste von (pid, name), Elternprozess zuerst.
+        Event-Objekte (siehe NopTracer(objects=True)) werden dafür in dictionaries umgewandelt;
+        leere Ergebnisse (None) werden unverändert weitergegeben.
+        '''
+        update = self.update
+        for event in events:
+            if (event):
+                process = update(event)
+                if (event["kname"] in FORK_KNAMES):
+                    process = process.parent
+                if (not isinstance(event, dict)):
+                    event = event.to_dict()
+                event[field] = [(ancestor.pid, ancestor.name) for ancestor in process.ancestors()]
+            yield event
+
+    def stats(self):
+        return {
+            "processes": len(self._processes),
+            "exited": len(self._exited),
+            "pid_reuses": self.pid_reuses,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,465 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+import copy
+import time
+import glob
+import struct
+import select
+import logging
+
+from ftrace.exceptions import ReadFileException, ReadPipeException
+from ftrace.tracepoints import kname_of, exit_kname_of
+
+
+_REGEXFIELD = re.compile(r"field:(.*?)\s*(\w+)(\[\w*\])?;\s*offset:(\d+);\s*size:(\d+);\s*(?:signed:(\d+);)?")
+_REGEXNAME = re.compile(r"^name:\s*(\S+)", re.M)
+_REGEXID = re.compile(r"^ID:\s*(\d+)", re.M)
+
+_INT_FORMATS = {1: "b", 2: "h", 4: "i", 8: "q"}
+
+TYPE_PADDING = 29
+TYPE_TIME_EXTEND = 30
+TYPE_TIME_STAMP = 31
+TS_SHIFT = 27
+
+RB_MISSED_FLAGS = (1 << 31) | (1 << 30)
+'''
+Die obersten beiden Bits von commit im Seiten-Header zeigen an, dass Events verloren gingen
+(RB_MISSED_EVENTS, RB_MISSED_STORED). Sie gehören nicht zur Länge der Daten.
+'''
+
+
+class EventField(object):
+    '''
+    Ein Feld eines Events, wie es in events/<system>/<event>/format beschrieben ist, z.B.:
+
+    ``field:__data_loc char[] arg1;	offset:16;	size:4;	signed:1;``
+    '''
+
+    def __init__(self, type_name, name, array, offset, size, signed, byteorder=sys.byteorder):
+        self.type_name = type_name
+        self.name = name
+        self.offset = offset
+        self.size = size
+        self.signed = signed
+        self.is_data_loc = type_name.startswith("__data_loc")
+        self.is_string = ("char" in type_name and (array is not None or self.is_data_loc))
+
+        prefix = "<" if byteorder == "little" else ">"
+        self._struct = None
+        if (self.is_data_loc):
+            self._struct = struct.Struct(prefix + "I")
+        elif (not self.is_string and size in _INT_FORMATS):
+            fmt = _INT_FORMATS[size]
+            self._struct = struct.Struct(prefix + (fmt if signed else fmt.upper()))
+
+    def decode(self, data, start):
+        '''
+        Liest den Wert des Feldes aus dem Event aus, das in data bei start beginnt.
+        Strings werden als str, Zahlen als int zurückgegeben.
+        Ein String der Länge 0 (fehlgeschlagener Zugriff der Kprobe) wird, wie in
+        trace_pipe, als "(fault)" dargestellt.
+        '''
+        pos = start + self.offset
+        if (self.is_data_loc):
+            loc = self._struct.unpack_from(data, pos)[0]
+            length = loc >> 16
+            if (length == 0):
+                return "(fault)"
+            begin = start + (loc & 0xffff)
+            raw = bytes(data[begin:begin + length])
+            return raw.split(b"\0", 1)[0].decode("utf-8", "backslashreplace")
+        if (self.is_string):
+            raw = bytes(data[pos:pos + self.size])
+            return raw.split(b"\0", 1)[0].decode("utf-8", "backslashreplace")
+        if (self._struct is not None):
+            return self._struct.unpack_from(data, pos)[0]
+        return bytes(data[pos:pos + self.size])
+
+
+class EventFormat(object):
+    '''
+    Beschreibt den binären Aufbau eines Events, wie er in events/<system>/<event>/format
+    vom Kernelfeature FTrace angegeben wird.
+    '''
+
+    def __init__(self, name, event_id, fields):
+        self.name = name
+        self.id = event_id
+        self.fields = fields
+        self.common_fields = [f for f in fields if f.name.startswith("common_")]
+        self.event_fields = [f for f in fields if not f.name.startswith("common_")]
+        self.args = [f for f in self.event_fields if f.name not in ("__probe_ip", "__probe_func", "__probe_ret_ip", "__syscall_nr")]
+        '''
+        Die Felder in der Reihenfolge der Argumente (ohne __probe_ip der KProbes, __probe_func und
+        __probe_ret_ip der Kretprobes bzw. __syscall_nr der Tracepoints)
+        '''
+        self._fields = {f.name: f for f in fields}
+
+    def __getitem__(self, name):
+        return self._fields[name]
+
+    def __contains__(self, name):
+        return name in self._fields
+
+    @classmethod
+    def parse(cls, text, byteorder=sys.byteorder):
+        '''
+        Erstellt ein EventFormat aus dem Inhalt einer format-Datei.
+        '''
+        name = _REGEXNAME.search(text)
+        event_id = _REGEXID.search(text)
+        fields = [
+            EventField(m.group(1).strip(), m.group(2), m.group(3), int(m.group(4)), int(m.group(5)), m.group(6) == "1", byteorder)
+            for m in _REGEXFIELD.finditer(text)
+        ]
+        return cls(name.group(1) if name else None, int(event_id.group(1)) if event_id else None, fields)
+
+    @classmethod
+    def from_file(cls, path, byteorder=sys.byteorder):
+        try:
+            with open(path, "r") as f:
+                return cls.parse(f.read(), byteorder)
+        except FileNotFoundError:
+            raise
+        except Exception:
+            raise ReadFileException("Unable to read {}".format(path))
+
+
+def load_formats(events_dir, names=None, byteorder=sys.byteorder):
+    '''
+    Liest alle events/<system>/<event>/format-Dateien unterhalb von events_dir ein und
+    gibt ein dictionary {name: EventFormat} zurück.
+    Ist names gesetzt, werden nur die Formate dieser Events gelesen.
+    Das Verzeichnis kann auch eine Kopie sein, um aufgezeichnete Seiten offline zu dekodieren.
+    '''
+    formats = {}
+    for path in glob.glob(os.path.join(events_dir, "*", "*", "format")):
+        name = os.path.basename(os.path.dirname(path))
+        if (names is not None and name not in names):
+            continue
+        formats[name] = EventFormat.from_file(path, byteorder)
+    return formats
+
+
+def load_saved_cmdlines(path):
+    '''
+    Liest saved_cmdlines ein und gibt ein dictionary {pid: comm} zurück.
+    Die Rohdaten einer Kprobe enthalten keinen Prozessnamen, trace_pipe bezieht ihn ebenfalls von hier.
+    '''
+    comms = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                pid, _, comm = line.rstrip("\n").partition(" ")
+                if (pid.isdigit()):
+                    comms[int(pid)] = comm
+    except (FileNotFoundError, PermissionError):
+        logging.debug("unable to read {}".format(path))
+    return comms
+
+
+class PageHeader(object):
+    '''
+    Aufbau des Headers einer Seite des Ringpuffers (events/header_page).
+    Standardmäßig: timestamp (u64) bei 0, commit (long) bei 8, Daten ab 8 + sizeof(long).
+    '''
+
+    def __init__(self, commit_size=struct.calcsize("l"), byteorder=sys.byteorder):
+        prefix = "<" if byteorder == "little" else ">"
+        self.commit_size = commit_size
+        self.data_offset = 8 + commit_size
+        self._ts = struct.Struct(prefix + "Q")
+        self._commit = struct.Struct(prefix + ("Q" if commit_size == 8 else "I"))
+
+    @classmethod
+    def from_file(cls, path, byteorder=sys.byteorder):
+        '''
+        Liest events/header_page ein. Existiert die Datei nicht, werden die Standardwerte verwendet.
+        '''
+        try:
+            with open(path, "r") as f:
+                for m in _REGEXFIELD.finditer(f.read()):
+                    if (m.group(2) == "commit"):
+                        return cls(int(m.group(5)), byteorder)
+        except FileNotFoundError:
+            logging.debug("{} not found, using default page header".format(path))
+        return cls(byteorder=byteorder)
+
+    def unpack(self, page):
+        '''
+        Gibt (timestamp, Länge der Daten, Events verloren) einer Seite zurück.
+        '''
+        timestamp = self._ts.unpack_from(page, 0)[0]
+        commit = self._commit.unpack_from(page, 8)[0]
+        return timestamp, commit & ~RB_MISSED_FLAGS & 0xffffffff, bool(commit & RB_MISSED_FLAGS)
+
+
+class RawEventDecoder(object):
+    '''
+    Dekodiert Seiten aus per_cpu/cpuN/trace_pipe_raw direkt, ohne den Umweg über den
+    Textformatierer des Kernels und die regulären Ausdrücke des SysCallParsers.
+
+    Das Ergebnis sind dieselben dictionaries, die SysCallParser.parse() liefert.
+
+    Parameter:
+
+    * syscalls: dictionary {kname: SysCall-Instanz}, wie beim SysCallParser
+    * formats: dictionary {name: EventFormat}, siehe load_formats(); Tracepoints (sys_enter_<name>),
+      Kretprobes und sys_exit_<name> werden den SysCalls zugeordnet, die sie verwenden
+      (siehe SysCall.parser_for())
+    * page_header: PageHeader, siehe PageHeader.from_file()
+    * comms: dictionary {pid: comm}, siehe load_saved_cmdlines()
+    * cmdlines_path: ist dieser Pfad (saved_cmdlines) gesetzt, wird comms bei unbekannten
+      PIDs höchstens einmal pro Sekunde neu eingelesen
+    * objects: True liefert Event-Objekte statt dictionaries (siehe SysCallParser.parse())
+
+    Offline, z.B. für aufgezeichnete Seiten:
+
+    .. code:: python
+
+      decoder = RawEventDecoder(tracer.parser.syscalls, load_formats("dump/events"),
+                                PageHeader.from_file("dump/events/header_page"))
+      for data in decoder.decode_file("dump/cpu0.raw"):
+          print(data)
+    '''
+
+    def __init__(self, syscalls, formats, page_header=None, comms=None, cmdlines_path=None, byteorder=sys.byteorder, objects=False):
+        self.syscalls = syscalls
+        self.objects = objects
+        self.page_header = page_header if page_header is not None else PageHeader(byteorder=byteorder)
+        self.comms = comms if comms is not None else {}
+        self.cmdlines_path = cmdlines_path
+        self._comms_loaded = 0.0
+        self.missed_pages = 0
+        '''Anzahl der Seiten, bei denen der Kernel verlorene Events gemeldet hat'''
+
+        prefix = "<" if byteorder == "little" else ">"
+        self._u16 = struct.Struct(prefix + "H")
+        self._u32 = struct.Struct(prefix + "I")
+        self._by_id = {}  # {id: (EventFormat, SysCall, Parser, kname, Rückkehr?)}
+        for name, fmt in formats.items():
+            if (fmt.id is None):
+                continue
+            syscall = syscalls.get(name) or syscalls.get(kname_of(name)) or syscalls.get(exit_kname_of(name))
+            parser = syscall.parser_for(name) if syscall is not None else None
+            if (parser is None):
+                continue
+            returned = parser is syscall.RETURN_PARSER or parser is syscall.EXIT_PARSER
+            self._by_id[fmt.id] = (fmt, syscall, parser, syscall.retprobe_kname if returned else syscall.kname, returned)
+
+    def copy(self):
+        '''
+        Gibt eine Kopie des Decoders zurück (z.B. für einen Worker pro CPU).
+        Formate und bekannte Prozessnamen werden geteilt, Zähler nicht.
+        '''
+        decoder = copy.copy(self)
+        decoder.missed_pages = 0
+        return decoder
+
+    def iter_records(self, page):
+        '''
+        Generator, der alle Events einer Seite als (timestamp in ns, Offset der Daten, Länge)
+        zurückgibt. Zeitstempel-Erweiterungen und Padding werden dabei verarbeitet.
+        '''
+        timestamp, commit, missed = self.page_header.unpack(page)
+        if (missed):
+            self.missed_pages += 1
+
+        u32 = self._u32.unpack_from
+        pos = self.page_header.data_offset
+        end = min(pos + commit, len(page))
+
+        while (pos + 4 <= end):
+            header = u32(page, pos)[0]
+            type_len = header & 0x1f
+            delta = header >> 5
+            pos += 4
+
+            if (type_len == TYPE_PADDING):
+                if (delta == 0):  # Rest der Seite ist leer
+                    return
+                pos += u32(page, pos)[0]
+                continue
+            if (type_len == TYPE_TIME_EXTEND):
+                timestamp += (u32(page, pos)[0] << TS_SHIFT) + delta
+                pos += 4
+                continue
+            if (type_len == TYPE_TIME_STAMP):
+                timestamp = (u32(page, pos)[0] << TS_SHIFT) + delta
+                pos += 4
+                continue
+
+            if (type_len == 0):
+                length = u32(page, pos)[0] - 4
+                length = (length + 3) & ~3
+                pos += 4
+            else:
+                length = type_len * 4
+
+            timestamp += delta
+            yield timestamp, pos, length
+            pos += length
+
+    def decode_page(self, page):
+        '''
+        Dekodiert eine Seite und gibt eine Liste der dictionaries aller bekannten Events zurück.
+        '''
+        results = []
+        for timestamp, pos, _ in self.iter_records(page):
+            value_dict = self.decode_record(page, pos, timestamp)
+            if (value_dict is not None):
+                results.append(value_dict)
+        return results
+
+    def decode_record(self, page, pos, timestamp):
+        '''
+        Dekodiert ein einzelnes Event, dessen Daten in page bei pos beginnen.
+        Unbekannte Events (nicht in syscalls) und vom Filter des SysCalls verworfene Events
+        werden ignoriert.
+        '''
+        entry = self._by_id.get(self._u16.unpack_from(page, pos)[0])  # common_type
+        if (entry is None):
+            return None
+        fmt, syscall, parser, kname, returned = entry
+
+        pid = fmt["common_pid"].decode(page, pos)
+        if ("parent_comm" in fmt):
+            pname = fmt["parent_comm"].decode(page, pos)
+        else:
+            pname = self.get_comm(pid)
+
+        parts = [
+            pname,
+            pid,
+            (timestamp // 1000) / 1e6,  # wie in trace_pipe auf Mikrosekunden genau
+            kname,
+            syscall.syscall if fmt.name != "sched_process_fork" else fmt.name
+        ]
+        event_filter = syscall.filter if not returned else None  # die Rückkehr hat nur STANDARD_FIELDS und "ret"
+        if (event_filter is not None and event_filter.has_header_check):
+            if (not event_filter.accept_header({"caller_name": pname, "caller_pid": pid, "timestamp": parts[2], "kname": parts[3]})):
+                return None
+
+        if (fmt.name == "sched_process_fork"):
+            args = [fmt["child_comm"].decode(page, pos), fmt["child_pid"].decode(page, pos)]
+        else:
+            args = [field.decode(page, pos) for field in fmt.args]
+        value_dict = parser.build(syscall, parts, args, self.objects)
+        if (event_filter is not None and not event_filter.accept(value_dict)):
+            return None
+        return value_dict
+
+    def get_comm(self, pid):
+        '''
+        Gibt den Prozessnamen zu einer PID zurück, bzw. "<...>" falls er unbekannt ist.
+        '''
+        comm = self.comms.get(pid)
+        if (comm is None and self.cmdlines_path is not None and time.monotonic() - self._comms_loaded > 1.0):
+            self._comms_loaded = time.monotonic()
+            self.comms.update(load_saved_cmdlines(self.cmdlines_path))
+            comm = self.comms.get(pid)
+        return comm if comm is not None else "<...>"
+
+    def decode_file(self, path, page_size=None):
+        '''
+        Generator, der eine Datei mit aufgezeichneten Seiten (z.B. eine Kopie von trace_pipe_raw)
+        Seite für Seite dekodiert.
+        '''
+        page_size = page_size or os.sysconf("SC_PAGE_SIZE")
+        with open(path, "rb") as f:
+            while True:
+                page = f.read(page_size)
+                if (not page):
+                    return
+                for value_dict in self.decode_page(page):
+                    yield value_dict
+
+
+class RawBufferReader(object):
+    '''
+    Liest die Ringpuffer aller (oder der angegebenen) CPUs über per_cpu/cpuN/trace_pipe_raw
+    seitenweise aus und dekodiert sie mit dem RawEventDecoder.
+
+    Innerhalb einer CPU sind die Events zeitlich geordnet, zwischen den CPUs jedoch nicht.
+    Mit stop() kann das Lesen aus einem anderen Thread heraus beendet werden, auch während
+    ohne idle_timeout auf Daten gewartet wird (siehe `PipeReader <#module-ftrace.reader>`_).
+    '''
+
+    def __init__(self, workingdir, decoder, cpus=None, page_size=None, idle_timeout=None):
+        self.workingdir = workingdir
+        self.decoder = decoder
+        self.page_size = page_size or os.sysconf("SC_PAGE_SIZE")
+        self.idle_timeout = idle_timeout
+        if (cpus is None):
+            cpus = sorted(int(d[3:]) for d in os.listdir(os.path.join(workingdir, "per_cpu")) if d.startswith("cpu"))
+        self.cpus = cpus
+        self._stopped = False
+        self._closed = False
+        self._wakeup_r, self._wakeup_w = os.pipe()
+
+    def pipe_path(self, cpu):
+        return os.path.join(self.workingdir, "per_cpu", "cpu{}".format(cpu), "trace_pipe_raw")
+
+    def stop(self):
+        '''
+        Beendet das Lesen. Ein wartender poll-Aufruf wird sofort aufgeweckt.
+        '''
+        self._stopped = True
+        if (self._closed):
+            return
+        try:
+            os.write(self._wakeup_w, b"x")
+        except OSError:
+            pass
+
+    def close(self):
+        '''
+        Gibt die internen Filedeskriptoren frei; geschieht auch am Ende von __iter__().
+        '''
+        if (self._closed):
+            return
+        self._closed = True
+        for fd in (self._wakeup_r, self._wakeup_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __iter__(self):
+        fds = {}
+        try:
+            poller = select.poll()
+            for cpu in self.cpus:
+                try:
+                    fd = os.open(self.pipe_path(cpu), os.O_RDONLY | os.O_NONBLOCK)
+                except OSError as e:
+                    raise ReadPipeException("Unable to open {}: {}".format(self.pipe_path(cpu), e))
+                fds[fd] = cpu
+                poller.register(fd, select.POLLIN)
+            poller.register(self._wakeup_r, select.POLLIN)
+
+            timeout = None if self.idle_timeout is None else int(self.idle_timeout * 1000)
+            while (not self._stopped):
+                ready = poller.poll(timeout)
+                if (not ready):
+                    logging.debug("RawBufferReader idle timeout")
+                    return
+                for fd, _ in ready:
+                    if (fd not in fds):
+                        continue  # stop()
+                    try:
+                        page = os.read(fd, self.page_size)
+                    except BlockingIOError:
+                        continue
+                    if (not page):
+                        continue
+                    for value_dict in self.decoder.decode_page(page):
+                        yield value_dict
+        finally:
+            for fd in fds:
+                os.close(fd)
+            self.close()
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import select
+import errno
+import logging
+import threading
+
+from ftrace.exceptions import ReadPipeException
+
+
+class PipeReader(object):
+    '''
+    Der PipeReader liest die Pipe des Kernelfeatures FTrace (trace_pipe) aus, ohne
+    dabei im Leerlauf CPU-Zeit zu verbrauchen.
+
+    Statt readline() in einer Schleife aufzurufen, wird mittels poll (bzw. select,
+    falls poll nicht verfügbar ist) gewartet, bis Daten anliegen. Diese werden dann
+    blockweise mit readinto() in einen wiederverwendbaren Puffer gelesen und in
+    einzelne Zeilen (inklusive b"\\n") zerlegt.
+
+    Parameter:
+
+    * path: Pfad der Pipe
+    * chunk_size: Größe des Lesepuffers in Bytes
+    * poll_interval: maximale Wartezeit eines einzelnen poll-Aufrufs in Sekunden
+    * idle_timeout: ist dieser Wert gesetzt, wird das Lesen beendet, wenn so viele
+      Sekunden lang keine Daten angekommen sind (None = unbegrenzt warten)
+
+    Beispiel:
+
+    .. code:: python
+
+      reader = PipeReader("/sys/kernel/debug/tracing/trace_pipe", idle_timeout=5)
+      for line in reader:
+          print(line)
+      print(reader.time_blocked, reader.time_working)
+
+    Mit stop() kann das Lesen aus einem anderen Thread heraus beendet werden, auch gleichzeitig
+    mit close().
+    '''
+
+    def __init__(self, path, chunk_size=65536, poll_interval=None, idle_timeout=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+
+        self.time_blocked = 0.0
+        '''Zeit in Sekunden, die mit Warten auf Daten verbracht wurde'''
+        self.time_working = 0.0
+        '''Zeit in Sekunden, die mit Lesen und Zerlegen der Daten verbracht wurde'''
+        self.bytes_read = 0
+        self.lines_read = 0
+        self.wakeups = 0
+
+        self._stopped = False
+        self._closed = False
+        self._lock = threading.Lock()  # stop() darf nicht in einen von close() freigegebenen Filedeskriptor schreiben
+        self._wakeup_r, self._wakeup_w = os.pipe()
+
+    def stop(self):
+        '''
+        Beendet das Lesen. Ein wartender poll-Aufruf wird sofort aufgeweckt.
+        '''
+        logging.debug("stopping PipeReader of {}".format(self.path))
+        self._stopped = True
+        with self._lock:
+            if (self._closed):
+                return
+            try:
+                os.write(self._wakeup_w, b"x")
+            except OSError:
+                pass
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    def close(self):
+        '''
+        Gibt die internen Filedeskriptoren frei. Ein noch laufendes Lesen endet danach.
+        '''
+        self._stopped = True  # sonst würde poll() auf dem geschlossenen Filedeskriptor nicht mehr warten
+        with self._lock:
+            if (self._closed):
+                return
+            self._closed = True
+            for fd in (self._wakeup_r, self._wakeup_w):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+    def stats(self):
+        '''
+        Liefert die Zähler des Readers als dictionary zurück.
+        '''
+        return {
+            "time_blocked": self.time_blocked,
+            "time_working": self.time_working,
+            "bytes_read": self.bytes_read,
+            "lines_read": self.lines_read,
+            "wakeups": self.wakeups
+        }
+
+    def _waiter(self, fd):
+        '''
+        Liefert eine Funktion zurück, die wartet, bis fd lesbar ist, und True zurückgibt,
+        falls Daten anliegen (bzw. False bei einem Timeout oder nach stop()).
+        '''
+        timeout = self.poll_interval if self.poll_interval is not None else self.idle_timeout
+
+        if hasattr(select, "poll"):
+            poller = select.poll()
+            poller.register(fd, select.POLLIN | select.POLLPRI)
+            poller.register(self._wakeup_r, select.POLLIN)
+            poll_timeout = None if timeout is None else int(timeout * 1000)
+
+            def wait():
+                for ready_fd, _ in poller.poll(poll_timeout):
+                    if (ready_fd == fd):
+                        return True
+                return False
+        else:
+            def wait():
+                ready, _, _ = select.select([fd, self._wakeup_r], [], [], timeout)
+                return fd in ready
+        return wait
+
+    def read_chunks(self, idle_chunks=False):
+        '''
+        Generator, der die gelesenen Datenblöcke (bytes) zurückgibt.
+        Ein Datenblock endet nicht notwendigerweise mit einem Zeilenumbruch.
+        Mit idle_chunks=True wird nach jedem Warten ohne Daten (spätestens nach poll_interval)
+        ein leerer Block b"" zurückgegeben, z.B. um zeitgesteuert Batches abzuschließen.
+        '''
+        try:
+            fd = os.open(self.path, os.O_RDONLY)  # ein FIFO wird erst geöffnet, wenn ein Schreiber vorhanden ist
+            os.set_blocking(fd, False)
+        except OSError as e:
+            raise ReadPipeException("Unable to open {}: {}".format(self.path, e))
+
+        buf = bytearray(self.chunk_size)
+        view = memoryview(buf)
+        wait = self._waiter(fd)
+        clock = time.monotonic
+        last_data = clock()
+
+        try:
+            with open(fd, "rb", buffering=0, closefd=True) as pipe:
+                while (not self._stopped):
+                    start = clock()
+                    try:
+                        n = pipe.readinto(buf)
+                    except (BlockingIOError, InterruptedError):
+                        n = None
+                    except OSError as e:
+                        if (e.errno in (errno.EAGAIN, errno.EINTR)):
+                            n = None
+                        else:
+                            raise ReadPipeException("Unable to read {}: {}".format(self.path, e))
+
+                    if (n):
+                        self.bytes_read += n
+                        last_data = clock()
+                        self.time_working += last_data - start
+                        yield bytes(view[:n])
+                        continue
+
+                    if (n == 0):  # EOF, z.B. Schreiber eines FIFOs hat geschlossen oder Dateiende
+                        logging.debug("PipeReader reached EOF of {}".format(self.path))
+                        return
+
+                    if (self.idle_timeout is not None and clock() - last_data >= self.idle_timeout):
+                        logging.debug("PipeReader idle timeout on {}".format(self.path))
+                        return
+
+                    start = clock()
+                    ready = wait()
+                    self.wakeups += 1
+                    self.time_blocked += clock() - start
+                    if (idle_chunks and not ready):
+                        yield b""
+        finally:
+            view.release()
+
+    def __iter__(self):
+        '''
+        Generator, der die einzelnen Zeilen (inklusive b"\\n") zurückgibt.
+        Eine unvollständige letzte Zeile wird erst ausgegeben, wenn sie vervollständigt
+        wurde oder das Lesen endet.
+        '''
+        rest = b""
+        clock = time.monotonic
+        for chunk in self.read_chunks():
+            start = clock()
+            if (rest):
+                chunk = rest + chunk
+            lines = chunk.split(b"\n")
+            rest = lines.pop()
+            self.lines_read += len(lines)
+            self.time_working += clock() - start
+            for line in lines:
+                yield line + b"\n"
+        if (rest):
+            self.lines_read += 1
+            yield rest
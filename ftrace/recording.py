@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import lzma
+import mmap
+import zlib
+import struct
+import logging
+
+from ftrace.procpool import encode_events, decode_events
+from ftrace.exceptions import ReadFileException
+
+
+MAGIC = b"FTREC\x00\x00\x01"
+'''Kennung am Anfang einer Aufzeichnung (inklusive Version des Formats)'''
+
+_BLOCK = struct.Struct("<4sB3xIddII")
+'''Kopf eines Blocks: Kennung, Codec, Anzahl Events, min/max timestamp, Länge der Metadaten und der Daten'''
+_BLOCK_MAGIC = b"FTBK"
+
+CODECS = {
+    "none": (0, lambda data, level: data, lambda data: data),
+    "zlib": (1, lambda data, level: zlib.compress(data, level), zlib.decompress),
+    "lzma": (2, lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+'''Verfügbare Kompressionsverfahren: {Name: (Nummer im Blockkopf, compress(data, level), decompress(data))}'''
+_DECOMPRESS = {number: decompress for number, _, decompress in CODECS.values()}
+
+
+class BlockInfo(object):
+    '''
+    Index-Eintrag eines Blocks: Position in der Datei, Anzahl der Events, kleinster und größter
+    Zeitstempel sowie die vorkommenden PIDs (caller_pid) und KNames.
+    '''
+
+    __slots__ = ("offset", "codec", "count", "min_ts", "max_ts", "pids", "knames", "tuples", "data_offset", "data_len")
+
+    def __init__(self, offset, codec, count, min_ts, max_ts, pids, knames, tuples, data_offset, data_len):
+        self.offset = offset
+        self.codec = codec
+        self.count = count
+        self.min_ts = min_ts
+        self.max_ts = max_ts
+        self.pids = pids
+        self.knames = knames
+        self.tuples = tuples
+        self.data_offset = data_offset
+        self.data_len = data_len
+
+    def __repr__(self):
+        return "BlockInfo(offset={}, count={}, min_ts={}, max_ts={}, knames={})".format(
+            self.offset, self.count, self.min_ts, self.max_ts, sorted(self.knames))
+
+    def matches(self, start=None, end=None, knames=None, pids=None):
+        '''
+        Gibt an, ob der Block Events im Zeitraum [start, end] bzw. der angegebenen KNames und PIDs
+        enthalten kann.
+        '''
+        if (start is not None and self.max_ts < start):
+            return False
+        if (end is not None and self.min_ts > end):
+            return False
+        if (knames is not None and self.knames.isdisjoint(knames)):
+            return False
+        if (pids is not None and self.pids.isdisjoint(pids)):
+            return False
+        return True
+
+
+class Recorder(object):
+    '''
+    Schreibt dekodierte Events (dictionaries bzw. Event-Objekte) in ein kompaktes Binärformat,
+    statt trace_pipe als Text aufzuzeichnen.
+
+    Die Events werden in Blöcken zu je block_events Events gesammelt, in der kompakten Form von
+    encode_events() (Schlüssel einmal pro Block) als JSON kodiert und mit codec (siehe CODECS)
+    komprimiert. Jeder Block trägt einen Kopf mit kleinstem und größtem Zeitstempel sowie den
+    vorkommenden PIDs und KNames, sodass `Recording <#module-ftrace.recording>`_ gezielt
+    einzelne Blöcke lesen kann.
+
+    .. code:: python
+
+      with Recorder("trace.ftrec") as recorder:
+          for data in recorder.record(ftrace.get_output()):
+              ...  # Events werden unverändert durchgereicht
+    '''
+
+    def __init__(self, path, block_events=4096, codec="zlib", level=6):
+        if (codec not in CODECS):
+            raise ValueError("codec must be one of {}, {} given".format(sorted(CODECS), codec))
+        self.path = path
+        self.block_events = block_events
+        self.codec = codec
+        self.level = level
+
+        self.events = 0
+        self.blocks = 0
+        self.bytes_written = 0
+
+        self._pending = []
+        self._file = open(path, "wb")
+        self._write(MAGIC)
+
+    def _write(self, data):
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def write(self, event):
+        '''
+        Nimmt ein Event auf; ist der Block voll, wird er geschrieben.
+        '''
+        self._pending.append(event)
+        if (len(self._pending) >= self.block_events):
+            self.flush()
+
+    def record(self, events):
+        '''
+        Generator, der alle Events aus events aufzeichnet und unverändert weitergibt.
+        Leere Ergebnisse (None) werden weitergegeben, aber nicht aufgezeichnet.
+        '''
+        write = self.write
+        for event in events:
+            if (event):
+                write(event)
+            yield event
+
+    def flush(self):
+        '''
+        Schreibt die bisher gesammelten Events als Block.
+        '''
+        if (not self._pending):
+            return
+        events, self._pending = self._pending, []
+        keys, rows = encode_events(events)
+
+        timestamps = [event["timestamp"] for event in events]
+        # Tupel (z.B. "adress") werden in JSON zu Listen, siehe Recording.read_block(); ein Feld kann
+        # in einzelnen Events auch None sein, daher werden alle Events geprüft
+        tuples = set()
+        for row in rows:
+            key = keys[row[0]]
+            for i, value in enumerate(row):
+                if (value.__class__ is tuple):
+                    tuples.add(key[i - 1])
+        meta = json.dumps({
+            "pids": sorted({event["caller_pid"] for event in events}),
+            "knames": sorted({event["kname"] for event in events}),
+            "tuples": sorted(tuples),
+        }).encode()
+
+        number, compress, _ = CODECS[self.codec]
+        data = compress(json.dumps([keys, rows], separators=(",", ":")).encode(), self.level)
+        self._write(_BLOCK.pack(_BLOCK_MAGIC, number, len(events), min(timestamps), max(timestamps), len(meta), len(data)))
+        self._write(meta)
+        self._write(data)
+        self.events += len(events)
+        self.blocks += 1
+
+    def close(self):
+        if (self._file.closed):
+            return
+        self.flush()
+        self._file.close()
+        logging.debug("recorded {} events in {} blocks to {}".format(self.events, self.blocks, self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def stats(self):
+        return {"events": self.events, "blocks": self.blocks, "bytes_written": self.bytes_written}
+
+
+class Recording(object):
+    '''
+    Liest eine Aufzeichnung des `Recorders <#module-ftrace.recording>`_. Die Datei wird per mmap
+    eingeblendet; beim Öffnen werden nur die Köpfe der Blöcke gelesen (blocks), dekomprimiert
+    werden nur die Blöcke, die für den gewählten Zeitraum, die KNames bzw. PIDs in Frage kommen.
+
+    .. code:: python
+
+      recording = Recording("trace.ftrec")
+      for data in recording.get_output(start=6788.7, end=6790.0, knames=["sys_execve_kprobe"]):
+          print(data)
+
+    get_output() gibt dieselben dictionaries zurück wie FTrace.get_output(). Ein unvollständiger
+    letzter Block (z.B. nach Absturz des Schreibers) wird ignoriert.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.blocks_read = 0
+        self._stopped = False
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # leere Datei
+                raise ReadFileException("{} is not a recording".format(path))
+        if (self._map[:len(MAGIC)] != MAGIC):
+            self._map.close()
+            raise ReadFileException("{} is not a recording".format(path))
+        self.blocks = self._index()
+        '''Liste der BlockInfos in der Reihenfolge der Datei'''
+
+    def _index(self):
+        blocks = []
+        data = self._map
+        pos = len(MAGIC)
+        size = len(data)
+        while (pos + _BLOCK.size <= size):
+            magic, codec, count, min_ts, max_ts, meta_len, data_len = _BLOCK.unpack_from(data, pos)
+            start = pos + _BLOCK.size
+            if (magic != _BLOCK_MAGIC or start + meta_len + data_len > size):
+                logging.debug("incomplete block at offset {} of {}".format(pos, self.path))
+                break
+            meta = json.loads(data[start:start + meta_len].decode())
+            blocks.append(BlockInfo(
+                pos, codec, count, min_ts, max_ts, frozenset(meta["pids"]), frozenset(meta["knames"]),
+                tuple(meta.get("tuples", ())), start + meta_len, data_len
+            ))
+            pos = start + meta_len + data_len
+        return blocks
+
+    def __len__(self):
+        return sum(block.count for block in self.blocks)
+
+    @property
+    def start(self):
+        return min(block.min_ts for block in self.blocks) if self.blocks else None
+
+    @property
+    def end(self):
+        return max(block.max_ts for block in self.blocks) if self.blocks else None
+
+    def select(self, start=None, end=None, knames=None, pids=None):
+        '''
+        Gibt die BlockInfos zurück, die Events im Zeitraum [start, end] bzw. der angegebenen
+        KNames und PIDs enthalten können.
+        '''
+        knames = set(knames) if knames is not None else None
+        pids = set(pids) if pids is not None else None
+        return [block for block in self.blocks if block.matches(start, end, knames, pids)]
+
+    def read_block(self, block):
+        '''
+        Dekomprimiert einen Block und gibt seine Events als Liste von dictionaries zurück.
+        '''
+        decompress = _DECOMPRESS.get(block.codec)
+        if (decompress is None):
+            raise ReadFileException("unknown codec {} in block at offset {} of {}".format(block.codec, block.offset, self.path))
+        keys, rows = json.loads(decompress(self._map[block.data_offset:block.data_offset + block.data_len]).decode())
+        events = decode_events([tuple(key) for key in keys], rows)
+        for key in block.tuples:
+            for event in events:
+                if (isinstance(event.get(key), list)):
+                    event[key] = tuple(event[key])
+        self.blocks_read += 1
+        return events
+
+    def get_output(self, start=None, end=None, knames=None, pids=None):
+        '''
+        Gibt die aufgezeichneten Events (optional nur die im Zeitraum [start, end], mit den
+        angegebenen KNames bzw. caller_pids) in der Reihenfolge der Aufzeichnung zurück,
+        wie FTrace.get_output().
+        '''
+        self._stopped = False
+        knames = set(knames) if knames is not None else None
+        pids = set(pids) if pids is not None else None
+        for block in self.select(start, end, knames, pids):
+            for event in self.read_block(block):
+                if (self._stopped):
+                    return
+                if (start is not None and event["timestamp"] < start):
+                    continue
+                if (end is not None and event["timestamp"] > end):
+                    continue
+                if (knames is not None and event["kname"] not in knames):
+                    continue
+                if (pids is not None and event["caller_pid"] not in pids):
+                    continue
+                yield event
+
+    def stop(self):
+        '''
+        Beendet einen laufenden get_output()-Generator.
+        '''
+        self._stopped = True
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def stats(self):
+        return {
+            "blocks": len(self.blocks),
+            "blocks_read": self.blocks_read,
+            "events": len(self),
+            "size": os.path.getsize(self.path),
+        }
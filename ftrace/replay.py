@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+
+from ftrace.reader import PipeReader
+from ftrace.parsers import line_timestamp
+
+
+class Replay(object):
+    '''
+    Spielt eine Aufzeichnung der Ausgabe des Kernelfeatures FTrace (Kopie von trace oder
+    trace_pipe) ab und parst sie mit demselben Parser wie FTrace.get_output().
+    Dafür werden weder root-Rechte noch /sys/kernel/debug/tracing benötigt.
+
+    Parameter:
+
+    * path: Pfad der Aufzeichnung
+    * tracer: Tracer, dessen Parser verwendet wird (Standard: NopTracer mit allen SysCalls)
+    * paced: ist paced=True, werden die Zeilen im zeitlichen Abstand ihrer Zeitstempel
+      ausgegeben, sonst so schnell wie möglich
+    * speed: Faktor für die Abspielgeschwindigkeit bei paced=True (2.0 = doppelt so schnell)
+
+    Beispiel:
+
+    .. code:: python
+
+      from ftrace.replay import Replay
+
+      for data in Replay("aufzeichnung.txt").get_output():
+          if (data is not None):
+              print(data)
+    '''
+
+    def __init__(self, path, tracer=None, paced=False, speed=1.0, chunk_size=1 << 20):
+        if (tracer is None):
+            from ftrace.tracers import NopTracer
+            tracer = NopTracer()
+        self.path = path
+        self.tracer = tracer
+        self.paced = paced
+        self.speed = speed
+        self.chunk_size = chunk_size
+        self.lines_skipped = 0
+        '''Anzahl der Kommentarzeilen (Kopf der Datei trace), die übersprungen wurden'''
+        self._reader = None
+
+    def lines(self):
+        '''
+        Generator, der die Zeilen der Aufzeichnung (ohne Kommentarzeilen) zurückgibt.
+        Bei paced=True wird zwischen den Zeilen entsprechend der Zeitstempel gewartet.
+        '''
+        self._reader = PipeReader(self.path, chunk_size=self.chunk_size)
+        first_ts = None
+        start = None
+        try:
+            for line in self._reader:
+                if (self._reader.stopped):
+                    return  # der Rest des gelesenen Blocks (bis zu chunk_size) wird verworfen
+                if (line[:1] == b"#"):
+                    self.lines_skipped += 1
+                    continue
+
+                if (self.paced):
+                    ts = line_timestamp(line)
+                    if (ts is not None):
+                        if (first_ts is None):
+                            first_ts = ts
+                            start = time.monotonic()
+                        delay = start + (ts - first_ts) / self.speed - time.monotonic()
+                        if (delay > 0):
+                            time.sleep(delay)
+
+                yield line
+        finally:
+            self._reader.close()
+
+    def get_output(self):
+        '''
+        Gibt die geparsten Zeilen der Aufzeichnung in Form eines Generators zurück,
+        genau wie FTrace.get_output().
+        '''
+        logging.debug("replaying {}".format(self.path))
+        for value_dict in self.tracer.parser.parse_lines(self.lines()):
+            yield value_dict
+
+    def stop(self):
+        '''
+        Beendet einen laufenden get_output()-Generator.
+        '''
+        if (self._reader is not None):
+            self._reader.stop()
+
+    def reader_stats(self):
+        '''
+        Siehe FTrace.reader_stats()
+        '''
+        if (self._reader is None):
+            return {}
+        return self._reader.stats()
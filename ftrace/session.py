@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+
+from ftrace.ftrace import FTrace
+from ftrace.tracers import Tracer
+from ftrace.tracefs import TraceFS
+from ftrace.exceptions import RootRequiredException
+
+
+class Session(FTrace):
+    '''
+    Eine Session ist ein FTrace, das in einer eigenen Instanz (instances/<name>) des Kernelfeatures
+    arbeitet. Jede Session hat einen eigenen Ringpuffer, eine eigene trace_pipe, buffer_size_kb,
+    eigene en/disablete Events und Filter. Mehrere Sessions (z.B. ein Audit-Strom und ein
+    Netzwerk-Strom mit hoher Rate) können so gleichzeitig laufen und unabhängig voneinander beendet
+    werden.
+
+    Wie FTrace.reset() gibt reset() einer Session nur die eigenen KProbes frei (siehe
+    `KprobeRegistry <#module-ftrace.kprobes>`_), leert aber nur den eigenen Ringpuffer.
+    close() entfernt zusätzlich die Instanz.
+
+    .. code:: python
+
+      with Session("audit") as session:
+          session.tracer = NopTracer()
+          session.setup()
+          session.tracer.syscalls = [Sys_Execve, Sys_Setuid]
+          for data in session.get_output():
+              print(data)
+    '''
+
+    def __init__(self, name, tracefs=None, buffer_size_kb=None, remove_on_close=True):
+        logging.debug("initialising Session {}".format(name))
+
+        parent = tracefs if tracefs is not None else TraceFS.default()
+        if (parent.is_system and os.geteuid() != 0):
+            raise RootRequiredException()
+
+        self.name = name
+        self.remove_on_close = remove_on_close
+        super().__init__(parent.instance(name))
+        if (buffer_size_kb is not None):
+            self.set_buffer_size(buffer_size_kb)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def reset(self):
+        '''
+        Schematischer Ablauf:
+
+        * Wenn Tracer gesetzt ist, resette ihn (gibt dessen KProbes frei)
+        * deaktiviere die Instanz
+        * leere den Ringpuffer der Instanz
+        * entferne die Einschränkung auf Prozesse
+        '''
+        logging.debug("resetting Session {}".format(self.name))
+
+        if (isinstance(self.tracer, Tracer)):
+            self.tracer.reset()
+        self._file_activate_ftrace.write(False)
+        self._file_trace.write("")
+        self._reset_scope()
+
+        self._setup = False
+
+    def close(self):
+        '''
+        Beendet die Session: laufendes Lesen wird gestoppt, der Tracer zurückgesetzt und
+        (mit remove_on_close) die Instanz samt Ringpuffer entfernt.
+        '''
+        self.stop()
+        self.reset()
+        if (self.remove_on_close):
+            self.tracefs.parent.remove_instance(self.name)
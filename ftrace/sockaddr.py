@@ -1,64 +1,112 @@
 # -*- coding: utf-8 -*-
 
-import ipaddress
 import struct
 import socket
 import logging
+from functools import lru_cache
+
+
+ARG_NAMES = (
+    "info_family", "info_socktype", "info_ipv4", "info_ipv6_1", "info_ipv6_2", "info_port",
+    "sock_ipv4", "sock_ipv6_1", "sock_ipv6_2", "sock_family", "sock_port"
+)
+'''Reihenfolge der Argumente der KProbes von Sys_Connect und Sys_Accept, siehe SockAddr.convert_args()'''
+
+CACHE_SIZE = 4096
+'''Standardgröße des Caches (Anzahl der Einträge), siehe SockAddr.set_cache_size()'''
+
+_IPV4 = struct.Struct("=I")  # Speicherinhalt in der Byte-Reihenfolge des Rechners, wie ihn die KProbe liest
+_IPV6 = struct.Struct("=QQ")
+
+
+def _mem2addr(family, mem_ipv4, mem_ipv6_1, mem_ipv6_2, mem_port):
+    address = None
+    port = None
+    try:
+        if (family == 2):
+            address = socket.inet_ntop(socket.AF_INET, _IPV4.pack(mem_ipv4))
+        elif (family == 10):
+            address = socket.inet_ntop(socket.AF_INET6, _IPV6.pack(mem_ipv6_1, mem_ipv6_2))
+    except (struct.error, ValueError) as e:
+        logging.error("invalid address of family {}: {}".format(family, e))
+    try:
+        port = socket.htons(mem_port)
+    except (OverflowError, ValueError):
+        logging.error("invalid port {}".format(mem_port))
+    return (address, port)
+
+
+_cached_mem2addr = lru_cache(maxsize=CACHE_SIZE)(_mem2addr)
 
 
 class SockAddr(object):
     '''
-    Für diese Klasse ist leider keine Dokumentation verfügbar.
+    Wandelt die von den KProbes von Sys_Connect und Sys_Accept ausgelesenen Speicherinhalte
+    (struct addrinfo bzw. struct sockaddr_in/sockaddr_in6) in (Adresse, Port) um,
+    z.B. ("127.0.0.1", 80) bzw. ("::1", 443), oder (None, None) bei anderen Adressfamilien.
+
+    Die Adresse wird mit struct und socket.inet_ntop() direkt aus den Integer-Werten erzeugt.
+    Da meist wenige Gegenstellen immer wieder vorkommen, werden die Ergebnisse in einem
+    begrenzten LRU-Cache gespeichert (Schlüssel: Familie, Adresse, Port), siehe cache_stats().
     '''
 
     @classmethod
     def convertToAddress(cls, syscall_infos):
-        if syscall_infos["info_family"] in [2, 10] and syscall_infos["info_socktype"] in [1, 2, 3]:
+        '''
+        Erwartet ein dictionary {Name aus ARG_NAMES: Integer-Wert}.
+        '''
+        return cls.convert_args([syscall_infos[name] for name in ARG_NAMES])
+
+    @classmethod
+    def convert_args(cls, args):
+        '''
+        Wie convertToAddress(), aber mit den Integer-Werten in der Reihenfolge von ARG_NAMES,
+        ohne Umweg über ein dictionary.
+        '''
+        info_family, info_socktype, info_ipv4, info_ipv6_1, info_ipv6_2, info_port, \
+            sock_ipv4, sock_ipv6_1, sock_ipv6_2, sock_family, sock_port = args
+        if ((info_family == 2 or info_family == 10) and 1 <= info_socktype <= 3):
             # addrinfo block
-            address = cls.mem2addr(syscall_infos["info_family"], syscall_infos["info_ipv4"], syscall_infos["info_ipv6_1"], syscall_infos["info_ipv6_2"], syscall_infos["info_port"])
-            return address
-        if syscall_infos["sock_family"] in [2, 10]:
-            # sockaddr_in or sockaddr_in6 block
-            address = cls.mem2addr(syscall_infos["sock_family"], syscall_infos["sock_ipv4"], syscall_infos["sock_ipv6_1"], syscall_infos["sock_ipv6_2"], syscall_infos["sock_port"])
-            return address
+            if (info_family == 2):
+                return _cached_mem2addr(2, info_ipv4, 0, 0, info_port)
+            return _cached_mem2addr(10, 0, info_ipv6_1, info_ipv6_2, info_port)
+        if (sock_family == 2):
+            # sockaddr_in block
+            return _cached_mem2addr(2, sock_ipv4, 0, 0, sock_port)
+        if (sock_family == 10):
+            # sockaddr_in6 block
+            return _cached_mem2addr(10, 0, sock_ipv6_1, sock_ipv6_2, sock_port)
         # Other
         return (None, None)
 
     @classmethod
     def mem2addr(cls, family, mem_ipv4, mem_ipv6_1, mem_ipv6_2, mem_port):
-        address = None
-        port = None
-
-        if family == 2:
-            address = cls.int2ipv4(mem_ipv4)
-        elif family == 10:
-            address = cls.int2ipv6(mem_ipv6_1, mem_ipv6_2)
-        try:
-            port = socket.htons(mem_port)
-        except OverflowError:
-            logging.error("")
-
-        return (address, port)
+        return _cached_mem2addr(family, mem_ipv4, mem_ipv6_1, mem_ipv6_2, mem_port)
 
     @classmethod
     def int2ipv4(cls, value):
-        # big endian to little endian
-        new_int = struct.unpack("<L", value.to_bytes((value.bit_length() + 7) // 8, 'big'))[0]
-        return str(ipaddress.IPv4Address(new_int))
+        return socket.inet_ntop(socket.AF_INET, _IPV4.pack(value))
 
     @classmethod
     def int2ipv6(cls, value1, value2):
-        def orderIPv6(value):
-            array = [value[i:i + 8] for i in range(0, len(value), 8)]
-            ret = ""
-            for x in reversed(array):
-                ret += x
-            return ret
-
-        bin_ipv6_1 = '{0:064b}'.format(value1)
-        bin_ipv6_2 = '{0:064b}'.format(value2)
-        part1 = orderIPv6(bin_ipv6_1)
-        part2 = orderIPv6(bin_ipv6_2)
-        conv_bin = str(part1) + str(part2)
-        conv_int = int(conv_bin, 2)
-        return str(ipaddress.IPv6Address(conv_int))
+        return socket.inet_ntop(socket.AF_INET6, _IPV6.pack(value1, value2))
+
+    @classmethod
+    def cache_stats(cls):
+        '''
+        Gibt die Zähler des Caches zurück: {"hits": ..., "misses": ..., "size": ..., "maxsize": ...}
+        '''
+        info = _cached_mem2addr.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+
+    @classmethod
+    def cache_clear(cls):
+        _cached_mem2addr.cache_clear()
+
+    @classmethod
+    def set_cache_size(cls, maxsize):
+        '''
+        Setzt die Größe des Caches (0 deaktiviert ihn). Der Inhalt und die Zähler werden dabei verworfen.
+        '''
+        global _cached_mem2addr
+        _cached_mem2addr = lru_cache(maxsize=maxsize)(_mem2addr)
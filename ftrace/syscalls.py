@@ -1,12 +1,18 @@
 # -*- coding: utf-8 -*-
 
-import os.path
+import os
+import logging
 from enum import Enum
 from collections import OrderedDict
+from collections.abc import Mapping
 
 from ftrace.filehelper import PWDFile
+from ftrace.tracefs import TraceFS
+from ftrace.kprobes import KprobeEvents, retprobe_kname
 from ftrace.syscallparam import SysCallParam
-from ftrace.parsers import StandardSysCallParser, SchedProcessForkParser, IPAdressParser
+from ftrace.filters import EventFilter
+from ftrace.tracepoints import SyscallTracepoint, SYSTEM, EXIT_ARROW
+from ftrace.parsers import StandardSysCallParser, SchedProcessForkParser, IPAdressParser, TracepointParser, ReturnProbeParser, SyscallExitParser
 
 
 class REGISTERS(Enum):
@@ -32,9 +38,9 @@ class SysCall(object):
     Ein SysCall kann registriert und enablet sein.
     Um einen SysCall zu en/disablen muss er registriert sein, andernfalls kommt
     es zu einem Fehler
-    '''
 
-    _WORKINGDIR = "/sys/kernel/debug/tracing"
+    Alle Pfade werden über tracefs gebildet (Standard: TraceFS.default()).
+    '''
 
     STANDARD_FIELDS = OrderedDict([  # shall not be included in kprobe but are needed to parse information about syscall
         ("caller_name", SysCallParam.string_t),
@@ -73,7 +79,8 @@ class SysCall(object):
     * SchedProcessForkParser
     * IPAdressParser
 
-    Standardmäßig wird der StandardSysCallParser verwendet.
+    Standardmäßig wird der StandardSysCallParser verwendet. Wird der SysCall über seinen Tracepoint
+    aufgezeichnet (siehe BACKEND), gilt stattdessen TRACEPOINT_PARSER.
     Ausnahmen sind z.B.:
 
     * sched_processfork
@@ -86,6 +93,44 @@ class SysCall(object):
       verarbeitet werden.
     '''
 
+    TRACEPOINT_PARSER = TracepointParser()
+    RETURN_PARSER = ReturnProbeParser()
+    '''Parser für die Kretprobe des SysCalls (siehe RETPROBE)'''
+    EXIT_PARSER = SyscallExitParser()
+    '''Parser für den Tracepoint sys_exit_<name> (siehe RETPROBE)'''
+
+    BACKEND = "kprobe"
+    '''
+    Gibt an, worüber der SysCall aufgezeichnet wird:
+
+    * "kprobe" (Standard): immer über eine KProbe
+    * "auto": über den Tracepoint events/syscalls/sys_enter_<name>, sofern er existiert und sich
+      alle PARAMS daraus ablesen lassen (Zahlen, die direkt in einem Register stehen), sonst über
+      eine KProbe. Strings, Listen und Speicherinhalte (Sys_Execve, Sys_Open, Sys_Connect, ...)
+      kann nur eine KProbe auslesen.
+
+    Die Ausgabe ist in beiden Fällen gleich, nur "syscall" enthält beim Tracepoint den Namen aus
+    trace_pipe (z.B. "sys_setuid" statt des Symbols "SyS_setuid" bzw. "__x64_sys_setuid"). Wer
+    "syscall" auswertet, muss "auto" daher ausdrücklich wählen. Ausgewertet wird BACKEND beim
+    Setzen von tracefs, also beim Instanzieren (siehe tracepoint).
+    '''
+
+    RETPROBE = False
+    '''
+    Ist RETPROBE gesetzt, wird auch die Rückkehr aus dem SysCall aufgezeichnet: bei einer KProbe
+    über die Kretprobe "r:kprobes/<name>_kretprobe <syscall> ret=$retval:s64", beim Tracepoint
+    über events/syscalls/sys_exit_<name>. Die Rückkehr erscheint als eigenes Event mit "ret"
+    (kname ist der der Kretprobe, siehe retprobe_kname); zum Aufruf ordnet sie der
+    `ReturnPairer <#module-ftrace.latency>`_ zu, der auch Rückgabewert und Dauer ergänzt.
+    Wie BACKEND wird RETPROBE beim Setzen von tracefs ausgewertet.
+    '''
+    RETPROBE_MAXACTIVE = None
+    '''
+    Anzahl der gleichzeitig verfolgbaren Aufrufe der Kretprobe (r<MAXACTIVE>:...), bzw. None
+    für den Standardwert des Kernels. Bei blockierenden SysCalls mit vielen Threads (z.B.
+    Sys_Accept) gehen sonst Rückkehr-Events verloren (siehe nmissed in kprobe_profile).
+    '''
+
     PARAMS = OrderedDict([])
     '''
     PARAMS sind die Parameter eines SysCalls (ohne die StandardFields).
@@ -103,16 +148,64 @@ class SysCall(object):
 
     '''
 
-    def __init__(self):
-        self._file_set_kprobes = PWDFile(os.path.join(self._WORKINGDIR, "kprobe_events"))
-        self._file_enable_kprobe = PWDFile(os.path.join(self._WORKINGDIR, "events/kprobes", self.kname, "enable"))
+    def __init__(self, tracefs=None):
+        self.tracefs = tracefs if tracefs is not None else TraceFS.default()
+
+    @property
+    def tracefs(self):
+        '''
+        Die Property 'tracefs' gibt an, in welchem `TraceFS <#module-ftrace.tracefs>`_ der SysCall
+        registriert und enablet wird.
+        '''
+        return self._tracefs
+
+    @tracefs.setter
+    def tracefs(self, val):
+        self._tracefs = val
+        self._tracepoint = SyscallTracepoint.resolve(self) if self.BACKEND == "auto" else None
+        self._retprobe = bool(self.RETPROBE) and (self._tracepoint is not None or bool(self.kprobe))
+        self._kprobe_events = KprobeEvents(val)
+        self._file_enable_kprobe = PWDFile(self.enable_path)
+        path = self.return_enable_path
+        self._file_enable_return = PWDFile(path) if path is not None else None
+
+    @property
+    def tracepoint(self):
+        '''
+        Der `SyscallTracepoint <#module-ftrace.tracepoints>`_, über den der SysCall aufgezeichnet wird,
+        bzw. None, wenn dafür eine KProbe verwendet wird (siehe BACKEND).
+        '''
+        return self._tracepoint
+
+    @property
+    def enable_path(self):
+        '''
+        Pfad der Datei, über die der SysCall en/disablet wird.
+        '''
+        if (self._tracepoint is not None):
+            return self.tracefs.path("events", SYSTEM, self._tracepoint.name, "enable")
+        return self.tracefs.path("events/kprobes", self.kname, "enable")
+
+    @property
+    def return_enable_path(self):
+        '''
+        Pfad der Datei, über die die Rückkehr aus dem SysCall en/disablet wird, bzw. None ohne RETPROBE.
+        '''
+        if (not self._retprobe):
+            return None
+        if (self._tracepoint is not None):
+            return self.tracefs.path("events", SYSTEM, self._tracepoint.exit_name, "enable")
+        return self.tracefs.path("events/kprobes", self.retprobe_kname, "enable")
 
     @property
     def kprobe(self):
         '''
         Die Property 'kprobe' ist ein String, der die gesamte Kprobe eines SysCalls enthält.
         Sie setzt sich zusammen aus dem KName, dem SysCall-Namen und allen Argumenten/Parametern.
+        Wird der Tracepoint verwendet, ist sie leer.
         '''
+        if (self._tracepoint is not None):
+            return ""
         args = ""
 
         if (self.PARAMS):
@@ -122,6 +215,76 @@ class SysCall(object):
 
         return "p:kprobes/{} {} {}".format(self.kname, self.syscall, args)
 
+    @property
+    def retprobe(self):
+        '''
+        Die Kretprobe des SysCalls (siehe RETPROBE), bzw. ein leerer String, wenn keine nötig ist
+        (ohne RETPROBE oder beim Tracepoint, dessen Rückkehr sys_exit_<name> liefert).
+        '''
+        if (not self._retprobe or self._tracepoint is not None):
+            return ""
+        maxactive = self.RETPROBE_MAXACTIVE if self.RETPROBE_MAXACTIVE is not None else ""
+        return "r{}:kprobes/{} {} ret=$retval:s64".format(maxactive, self.retprobe_kname, self.syscall)
+
+    @property
+    def retprobe_kname(self):
+        '''
+        KName der Kretprobe des SysCalls, z.B. "sys_connect_kretprobe".
+        '''
+        return retprobe_kname(self.kname)
+
+    def probes(self):
+        '''
+        Gibt die zu registrierenden Probes als Liste von (KName, Definition für kprobe_events)
+        zurück: die KProbe und ggf. die Kretprobe (siehe RETPROBE). Beim Tracepoint ist sie leer.
+        '''
+        probes = [(self.kname, self.kprobe), (self.retprobe_kname, self.retprobe)]
+        return [(kname, probe) for kname, probe in probes if probe]
+
+    def parser_for(self, name):
+        '''
+        Gibt den Parser für ein Event des SysCalls mit dem Namen name aus dem Kopf der Logzeile
+        bzw. aus der format-Datei zurück, oder None, wenn der Name nicht zum SysCall gehört:
+
+        * KName: PARSER (auch bei Aufzeichnungen mit KProbe, wenn inzwischen der Tracepoint verwendet wird)
+        * Tracepoint ("sys_setuid" bzw. "sys_enter_setuid"): TRACEPOINT_PARSER
+        * nur mit RETPROBE: Kretprobe ("sys_setuid_kretprobe") bzw. Tracepoint der Rückkehr
+          ("sys_setuid ->" bzw. "sys_exit_setuid"): RETURN_PARSER bzw. EXIT_PARSER
+        '''
+        if (name == self.kname):
+            return self.PARSER
+        tracepoint = self._tracepoint
+        if (tracepoint is not None and (name == tracepoint.event_name or name == tracepoint.name)):
+            return self.TRACEPOINT_PARSER
+        if (self._retprobe):
+            if (name == self.retprobe_kname):
+                return self.RETURN_PARSER
+            if (tracepoint is not None and (name == tracepoint.event_name + EXIT_ARROW or name == tracepoint.exit_name)):
+                return self.EXIT_PARSER
+        return None
+
+    def format_names(self):
+        '''
+        Gibt die Namen der Events des SysCalls in tracefs (events/<system>/<name>/format) zurück:
+        KName bzw. Tracepoint und ggf. Kretprobe bzw. sys_exit_<name> (siehe parser_for()).
+        '''
+        tracepoint = self._tracepoint
+        names = [tracepoint.name if tracepoint is not None else self.kname]
+        if (self._retprobe):
+            names.append(tracepoint.exit_name if tracepoint is not None else self.retprobe_kname)
+        return names
+
+    def trace_names(self):
+        '''
+        Gibt die Namen zurück, unter denen die Events des SysCalls in trace_pipe erscheinen
+        (Aufruf und ggf. Rückkehr, siehe parser_for()).
+        '''
+        tracepoint = self._tracepoint
+        names = [tracepoint.event_name if tracepoint is not None else self.kname]
+        if (self._retprobe):
+            names.append(tracepoint.event_name + EXIT_ARROW if tracepoint is not None else self.retprobe_kname)
+        return names
+
     @property
     def syscall(self):
         '''
@@ -138,7 +301,19 @@ class SysCall(object):
         Er ergibt sich aus dem Namen des SysCalls und "_kprobe".
         z.B.: sys_execve -> "sys_execve_kprobe"
         '''
-        return "{}_kprobe".format(self.syscall)
+        return self.class_kname()
+
+    KNAME = None
+    '''
+    Ist KNAME gesetzt, wird dieser Wert statt des aus dem Klassennamen gebildeten KNames verwendet.
+    '''
+
+    @classmethod
+    def class_kname(cls):
+        '''
+        Gibt den KName zurück, ohne dass der SysCall instanziert werden muss.
+        '''
+        return cls.KNAME or "{}_kprobe".format(cls.__name__.lower())
 
     @property
     def valid_params(self):  # wie hieß dieses zeug dass sich den rückgabewert von funktionen merkt?
@@ -156,18 +331,24 @@ class SysCall(object):
         Bei Setzen auf False ist zu beachten, dass der SysCall nicht enablet sein darf,
         ansonsten kommt es zu einem Fehler.
 
-        Ein SysCall ist genau dann registriert, wenn seine KProbe in
-        /sys/kernel/debug/tracing/kprobe_events geschrieben ist.
+        Ein SysCall ist genau dann registriert, wenn seine KProbe (und ggf. Kretprobe) in
+        kprobe_events geschrieben ist. Tracepoints sind immer registriert.
         '''
-        return self._file_set_kprobes.check_for_kprobe(self.kname)
+        if (self._tracepoint is not None):
+            return True
+        return all(self._kprobe_events.is_registered(kname) for kname, _ in self.probes())
 
     @registered.setter
     def registered(self, val):
         if (not val and self.enabled):
             raise ValueError("Setting registered to false is only possible if enabled is false")
 
-        with open("/sys/kernel/debug/tracing/kprobe_events"):  # why is this file not used?
-            self._file_set_kprobes.write("{}{}".format(self._file_set_kprobes.read(), (self.kprobe if val else "-:kprobes/{}".format(self.kname))))  # "appends" string by writing whole file again, using writing mode 'a' did not work, check for better solution
+        if (self._tracepoint is not None):
+            return
+        if (val):
+            self._kprobe_events.register([self])  # hängt nur diese KProbe an, siehe KprobeEvents
+        else:
+            self._kprobe_events.unregister([self.kname])
 
     @property
     def enabled(self):
@@ -177,16 +358,123 @@ class SysCall(object):
         ansonsten kommt es zu einem Fehler.
 
         Ein SysCall ist genau dann enablet, wenn in
-        /sys/kernel/debug/tracing/events/kprobes/SYSCALLNAME/enabled der Wert '1' steht.
+        events/kprobes/SYSCALLNAME/enable der Wert '1' steht.
         '''
         return self._file_enable_kprobe.read_bool()
 
     @enabled.setter
     def enabled(self, val):
-        if self.registered:
-            self._file_enable_kprobe.write(val)
-        else:
+        self.set_enabled(val)
+
+    _filter = None
+
+    @property
+    def filter(self):
+        '''
+        Die Property 'filter' ist der `EventFilter <#module-ftrace.filters>`_ des SysCalls oder None.
+        Gesetzt wird sie mit einem Prädikat aus Feldern der Ausgabe, z.B.:
+
+        .. code:: python
+
+          syscall.filter = (Field("uid") == 0) & (Field("caller_pid") != os.getpid())
+
+        Was sich in der Syntax des Kernels ausdrücken lässt, filtert der Kernel (siehe
+        filter_fields()), der Rest wird in Python ausgewertet. Ist der SysCall registriert,
+        wird der Filter sofort geschrieben, ansonsten mit apply_filter() (z.B. beim Setup des Tracers).
+        None entfernt den Filter.
+        '''
+        return self._filter
+
+    @filter.setter
+    def filter(self, predicate):
+        self.set_filter(predicate)
+
+    def set_filter(self, predicate, apply=None):
+        '''
+        Setzt den Filter (siehe Property 'filter'). Mit apply=True/False wird der Filter
+        (nicht) sofort in den Kernel geschrieben, ohne zu überprüfen, ob der SysCall registriert ist.
+        '''
+        old = self._filter
+        self._filter = EventFilter(predicate, self.filter_fields()) if predicate is not None else None
+        if (apply is None):
+            apply = self.registered
+        if (apply):
+            self.apply_filter(clear=old is not None)
+
+    @property
+    def filter_path(self):
+        '''
+        Pfad der Datei, in die der Filter des Kernels geschrieben wird.
+        '''
+        return os.path.join(os.path.dirname(self.enable_path), "filter")
+
+    @property
+    def return_filter_path(self):
+        '''
+        Pfad der Filter-Datei der Rückkehr aus dem SysCall (Kretprobe bzw. sys_exit_<name>),
+        bzw. None ohne RETPROBE.
+        '''
+        path = self.return_enable_path
+        return os.path.join(os.path.dirname(path), "filter") if path is not None else None
+
+    def filter_fields(self):
+        '''
+        Gibt die Felder zurück, nach denen der Kernel filtern kann, als dictionary
+        {Feldname der Ausgabe: (Feldname im Kernel, String?)}.
+        Die Argumente einer KProbe heißen im Kernel arg1, arg2, ... in der Reihenfolge der KProbe;
+        Listen können nur in Python gefiltert werden. Die Argumente eines Tracepoints speichert der
+        Kernel als unsigned long, daher filtert er dort nur vorzeichenlose Parameter.
+        '''
+        fields = OrderedDict([
+            ("caller_name", ("comm", True)),
+            ("caller_pid", ("common_pid", False))
+        ])
+        if (self._tracepoint is not None):
+            for name, arg, _ in self._tracepoint.params:
+                if (self.PARAMS[name].value.format_string.endswith((":u32", ":u64"))):
+                    fields[name] = (arg, False)
+            return fields
+        index = 1
+        for name, typ in self.valid_params.items():
+            if (not isinstance(typ, SysCallParam)):
+                break  # z.B. Sys_Connect: die Argumente sind keine Felder der Ausgabe
+            if (typ.value.is_list):
+                index += self.ARGCOUNT
+                continue
+            fields[name] = ("arg{}".format(index), typ.value.convert is str)
+            index += 1
+        return fields
+
+    def apply_filter(self, clear=False):
+        '''
+        Schreibt den Filter in den Kernel (bzw. mit clear=True auch einen leeren Filter).
+        Der SysCall muss registriert sein. Mit RETPROBE erhält auch die Rückkehr den Teil des Filters,
+        der nur caller_name und caller_pid verwendet (siehe EventFilter.write_header()).
+        '''
+        files = [PWDFile(self.filter_path)]
+        if (self._retprobe):
+            files.append(PWDFile(self.return_filter_path))
+        if (self._filter is not None):
+            self._filter.write(files[0])
+            for file in files[1:]:
+                self._filter.write_header(file)
+        elif (clear):
+            for file in files:
+                try:
+                    file.write("0")
+                except Exception as e:
+                    logging.debug("clearing filter {} of {} failed: {}".format(file.path, self.kname, e))
+
+    def set_enabled(self, val, check_registered=True):
+        '''
+        En/disablet den SysCall. Mit check_registered=False wird nicht überprüft, ob der
+        SysCall registriert ist (z.B. wenn mehrere SysCalls gerade gemeinsam registriert wurden).
+        '''
+        if (check_registered and not self.registered):
             raise ValueError("Can't enable/disable a kpobe that is not registered")
+        self._file_enable_kprobe.write(val)
+        if (self._file_enable_return is not None):
+            self._file_enable_return.write(val)
 
 
 class Sys_Execve(SysCall):
@@ -209,13 +497,19 @@ class Sched_Process_Fork(SysCall):
         ("called_pid", SysCallParam.pid_t)
     ])
 
-    def __init__(self):
-        super().__init__()
-        self._file_enable_kprobe = PWDFile("/sys/kernel/debug/tracing/events/sched/sched_process_fork/enable")
-
     @property
-    def kname(self):
-        return "sched_process_fork"
+    def enable_path(self):
+        return self.tracefs.path("events/sched/sched_process_fork/enable")
+
+    KNAME = "sched_process_fork"
+
+    def filter_fields(self):
+        return OrderedDict([
+            ("caller_name", ("parent_comm", True)),
+            ("caller_pid", ("parent_pid", False)),
+            ("called_name", ("child_comm", True)),
+            ("called_pid", ("child_pid", False))
+        ])
 
     @property
     def kprobe(self):
@@ -361,3 +655,51 @@ class Sys_Tkill(SysCall):
         ("pid", SysCallParam.pid_t),
         ("sig", SysCallParam.int_t)
     ])
+
+
+class SysCallCatalog(Mapping):
+    '''
+    Der SysCallCatalog ist ein dictionary {kname: SysCall-Instanz} aller verfügbaren SysCalls
+    (Standard: alle Subklassen von SysCall), das die SysCalls aber erst instanziert, wenn auf
+    sie zugegriffen wird. Bis dahin werden nur die Klassen gespeichert.
+    '''
+
+    def __init__(self, tracefs=None, classes=None):
+        self._tracefs = tracefs
+        self._classes = OrderedDict((cls.class_kname(), cls) for cls in (classes if classes is not None else SysCall.__subclasses__()))
+        self._instances = {}
+
+    def __getitem__(self, kname):
+        syscall = self._instances.get(kname)
+        if (syscall is None):
+            syscall = self._instances[kname] = self._classes[kname](self._tracefs)
+        return syscall
+
+    def __iter__(self):
+        return iter(self._classes)
+
+    def __len__(self):
+        return len(self._classes)
+
+    def __contains__(self, kname):
+        return kname in self._classes
+
+    def get_class(self, kname):
+        return self._classes[kname]
+
+    @property
+    def instances(self):
+        '''
+        dictionary {kname: SysCall-Instanz} der bisher instanzierten SysCalls
+        '''
+        return dict(self._instances)
+
+    @property
+    def tracefs(self):
+        return self._tracefs
+
+    @tracefs.setter
+    def tracefs(self, val):
+        self._tracefs = val
+        for syscall in self._instances.values():
+            syscall.tracefs = val
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import logging
+
+from ftrace.filehelper import PWDFile
+
+
+class TraceFS(object):
+    '''
+    TraceFS beschreibt, wo sich das Dateisystem des Kernelfeatures FTrace befindet.
+    Alle Pfade der Library (FTrace, SysCall, ...) werden über diese Klasse gebildet.
+
+    Ohne Angabe von root wird der Mountpoint automatisch ermittelt:
+
+    * Umgebungsvariable FTRACE_TRACEFS
+    * /sys/kernel/tracing (tracefs, ab Kernel 4.1)
+    * /sys/kernel/debug/tracing (debugfs)
+    * ein anderer Mountpoint von tracefs bzw. debugfs laut /proc/mounts
+
+    Mit create_stub() kann eine Nachbildung des Verzeichnisbaums erstellt werden, in der
+    trace_pipe ein FIFO ist. Damit können Setup, Reset und das Lesen der Pipe auch ohne root
+    und ohne Kernelfeature getestet werden:
+
+    .. code:: python
+
+      tracefs = TraceFS.create_stub("/tmp/tracefs")
+      ftrace = FTrace(tracefs)
+      ftrace.tracer = NopTracer(tracefs)
+    '''
+
+    MOUNTPOINTS = ["/sys/kernel/tracing", "/sys/kernel/debug/tracing"]
+    FTRACE_ENABLED = "/proc/sys/kernel/ftrace_enabled"
+
+    _default = None
+
+    def __init__(self, root=None, ftrace_enabled=None, parent=None):
+        if (root is None):
+            root = self.detect()
+        self.root = root
+        self.ftrace_enabled_path = ftrace_enabled if ftrace_enabled is not None else self.FTRACE_ENABLED
+        self.parent = parent
+        '''Bei einer Instanz (siehe instance()) das übergeordnete TraceFS, sonst None'''
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self.root)
+
+    @classmethod
+    def detect(cls):
+        '''
+        Ermittelt den Mountpoint des Kernelfeatures FTrace, siehe Klassenbeschreibung.
+        Wird keiner gefunden, wird /sys/kernel/debug/tracing zurückgegeben.
+        '''
+        env = os.environ.get("FTRACE_TRACEFS")
+        if (env):
+            return env
+
+        for mountpoint in cls.MOUNTPOINTS:
+            if (os.path.exists(os.path.join(mountpoint, "trace_pipe"))):
+                return mountpoint
+
+        try:
+            with open("/proc/mounts", "r") as f:
+                for line in f:
+                    fields = line.split()
+                    if (len(fields) < 3):
+                        continue
+                    if (fields[2] == "tracefs"):
+                        return fields[1]
+                    if (fields[2] == "debugfs" and os.path.exists(os.path.join(fields[1], "tracing", "trace_pipe"))):
+                        return os.path.join(fields[1], "tracing")
+        except (OSError, IOError):
+            pass
+
+        logging.debug("no tracefs found, falling back to {}".format(cls.MOUNTPOINTS[-1]))
+        return cls.MOUNTPOINTS[-1]
+
+    @classmethod
+    def default(cls):
+        '''
+        Gibt die standardmäßig verwendete Instanz zurück (wird beim ersten Aufruf ermittelt).
+        '''
+        if (cls._default is None):
+            cls._default = cls()
+        return cls._default
+
+    @classmethod
+    def set_default(cls, tracefs):
+        '''
+        Setzt die standardmäßig verwendete Instanz, z.B. auf eine Nachbildung (siehe create_stub()).
+        None setzt sie zurück, sodass sie erneut ermittelt wird.
+        '''
+        cls._default = tracefs
+
+    @property
+    def is_system(self):
+        '''
+        Gibt an, ob es sich um das echte Dateisystem des Kernels handelt (root-Rechte notwendig).
+        '''
+        root = os.path.realpath(self.root)
+        if (root in [os.path.realpath(m) for m in self.MOUNTPOINTS]):
+            return True
+        return root.startswith("/sys/")
+
+    @property
+    def top(self):
+        '''
+        Das oberste TraceFS. Manche Dateien (kprobe_events, saved_cmdlines, ...) gibt es nur dort,
+        sie gelten für alle Instanzen.
+        '''
+        return self.parent.top if self.parent is not None else self
+
+    @property
+    def name(self):
+        '''
+        Name der Instanz bzw. None für das oberste TraceFS.
+        '''
+        return os.path.basename(self.root) if self.parent is not None else None
+
+    def instance(self, name, create=True):
+        '''
+        Gibt das TraceFS der Instanz instances/<name> zurück. Jede Instanz hat einen eigenen
+        Ringpuffer, eigene trace_pipe, buffer_size_kb und en/disablete Events; die KProbes
+        (kprobe_events) sind hingegen für alle Instanzen gleich.
+        Mit create=True wird die Instanz erstellt, falls sie noch nicht existiert.
+        '''
+        path = self.path("instances", name)
+        if (not os.path.isdir(path)):
+            if (not create):
+                raise FileNotFoundError("instance {} does not exist".format(name))
+            logging.debug("creating instance {}".format(path))
+            if (self.is_system):
+                os.mkdir(path)  # der Kernel legt die Dateien der Instanz selbst an
+            else:
+                self.create_stub(path, cpus=len(self.cpus()) or 1, instance=True, tracepoints=os.path.isdir(self.path("events", "syscalls")))
+        return TraceFS(path, ftrace_enabled=self.ftrace_enabled_path, parent=self)
+
+    def instances(self):
+        '''
+        Liste der Namen aller Instanzen.
+        '''
+        try:
+            return sorted(os.listdir(self.path("instances")))
+        except FileNotFoundError:
+            return []
+
+    def remove_instance(self, name):
+        '''
+        Entfernt die Instanz instances/<name> samt Ringpuffer.
+        '''
+        path = self.path("instances", name)
+        logging.debug("removing instance {}".format(path))
+        if (self.is_system):
+            os.rmdir(path)
+        else:
+            shutil.rmtree(path)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def file(self, *parts):
+        return PWDFile(self.path(*parts))
+
+    def cpus(self):
+        '''
+        Liste der CPUs, für die es ein Verzeichnis per_cpu/cpuN gibt.
+        '''
+        return sorted(int(d[3:]) for d in os.listdir(self.path("per_cpu")) if d.startswith("cpu"))
+
+    @classmethod
+    def create_stub(cls, root, cpus=1, syscalls=None, instance=False, tracepoints=False):
+        '''
+        Erstellt unter root eine Nachbildung des Verzeichnisbaums von tracefs und gibt eine
+        TraceFS-Instanz dafür zurück.
+        trace_pipe ist ein FIFO: was hineingeschrieben wird, liest FTrace.get_output().
+        Für alle SysCalls (Standard: alle Subklassen von SysCall) werden die enable-Dateien angelegt.
+        Mit instance=True werden die Dateien, die es nur im obersten Verzeichnis gibt, weggelassen
+        (siehe instance()). Mit tracepoints=True werden für die SysCalls, die sich über einen
+        Tracepoint aufzeichnen lassen, events/syscalls/sys_enter_<name> und sys_exit_<name> angelegt
+        (siehe SysCall.BACKEND und SysCall.RETPROBE).
+        '''
+        from ftrace.syscalls import SysCall
+        from ftrace.tracepoints import SyscallTracepoint, ENTER_PREFIX, EXIT_PREFIX
+
+        files = {
+            "trace": "",
+            "tracing_on": "0",
+            "current_tracer": "nop",
+            "available_tracers": "nop\n",
+            "kprobe_events": "",
+            "set_event_pid": "",
+            "set_event_notrace_pid": "",
+            "options/event-fork": "0",
+            "saved_cmdlines": "",
+            "ftrace_enabled": "0",
+            "events/kprobes/enable": "0",
+            "events/header_page": "",
+            "buffer_size_kb": "1408",
+        }
+        if (instance):
+            for name in ["available_tracers", "kprobe_events", "saved_cmdlines", "ftrace_enabled"]:
+                del files[name]
+        classes = [syscall.__class__ for syscall in syscalls] if syscalls is not None else SysCall.__subclasses__()
+        for i, syscall in enumerate(classes):
+            if (tracepoints and SyscallTracepoint.supported(syscall)):
+                for exit, prefix in ((False, ENTER_PREFIX), (True, EXIT_PREFIX)):
+                    event = os.path.join("events", "syscalls", prefix + syscall.__name__.lower()[len("sys_"):])
+                    files[os.path.join(event, "format")] = SyscallTracepoint.stub_format(syscall, 1000 + 2 * i + exit, exit)
+                    files[os.path.join(event, "filter")] = "none"
+                    files[os.path.join(event, "enable")] = "0"
+                files[os.path.join("events", "kprobes", syscall.class_kname(), "enable")] = "0"  # für BACKEND = "kprobe"
+        for cpu in range(cpus):
+            files["per_cpu/cpu{}/stats".format(cpu)] = ""
+            files["per_cpu/cpu{}/buffer_size_kb".format(cpu)] = "1408"
+
+        for name, content in files.items():
+            path = os.path.join(root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if (not os.path.exists(path)):
+                with open(path, "w") as f:
+                    f.write(content)
+
+        pipe = os.path.join(root, "trace_pipe")
+        if (not os.path.exists(pipe)):
+            os.mkfifo(pipe)
+
+        tracefs = cls(root, ftrace_enabled=os.path.join(root, "ftrace_enabled"))
+        for syscall_class in classes:
+            syscall = syscall_class(tracefs)
+            for path in (syscall.enable_path, syscall.return_enable_path):
+                if (path is None):
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if (not os.path.exists(path)):
+                    with open(path, "w") as f:
+                        f.write("0")
+        return tracefs
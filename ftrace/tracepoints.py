@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from ftrace.kprobes import RETPROBE_SUFFIX
+from ftrace.syscallparam import SysCallParam
+from ftrace.exceptions import ReadFileException
+
+
+SYSTEM = "syscalls"
+'''Gruppe der Syscall-Tracepoints in tracefs: events/syscalls/sys_enter_<name>'''
+ENTER_PREFIX = "sys_enter_"
+EXIT_PREFIX = "sys_exit_"
+EXIT_ARROW = " ->"
+'''Auf den Namen des SysCalls folgt in trace_pipe bei sys_exit_<name> der Rückgabewert: sys_setuid -> 0x0'''
+
+_WIDTHS = {"s32": (32, True), "u32": (32, False), "s64": (64, True), "u64": (64, False)}
+
+
+def value_converter(param_type):
+    '''
+    Gibt eine Funktion zurück, die den Wert eines Arguments (unsigned long, wie ihn der Tracepoint
+    speichert) auf Breite und Vorzeichen des SysCallParams bringt, z.B. 0xffffffff -> -1 für int_t.
+    Gibt None zurück, wenn der Wert nicht direkt im Register steht (Strings, Listen, Zeiger) und
+    deshalb nur eine KProbe ihn auslesen kann.
+    '''
+    config = param_type.value
+    if (config.convert is not int or config.is_list or not config.format_string.startswith("{register}:")):
+        return None
+    width, signed = _WIDTHS.get(config.format_string[len("{register}:"):], (None, False))
+    if (width is None):
+        return None
+    mask = (1 << width) - 1
+    if (signed):
+        sign = 1 << (width - 1)
+        return lambda value: ((value & mask) ^ sign) - sign
+    return lambda value: value & mask
+
+
+def kname_of(name):
+    '''
+    Gibt den KName des SysCalls zu einem Eventnamen zurück, gebildet wie in SysCall.class_kname():
+    der Tracepoint sys_enter_setuid, die Namen in trace_pipe (sys_setuid bzw. "sys_setuid ->")
+    und die Kretprobe sys_setuid_kretprobe ergeben "sys_setuid_kprobe".
+    sys_exit_<name> wird nicht umgewandelt, da "sys_exit_group" in trace_pipe der Aufruf von
+    exit_group ist; für den Tracepoint der Rückkehr siehe exit_kname_of().
+    '''
+    if (name.endswith(EXIT_ARROW)):
+        name = name[:-len(EXIT_ARROW)]
+    elif (name.endswith(RETPROBE_SUFFIX)):
+        name = name[:-len(RETPROBE_SUFFIX)]
+    elif (name.startswith(ENTER_PREFIX)):
+        name = "sys_" + name[len(ENTER_PREFIX):]
+    return "{}_kprobe".format(name)
+
+
+def exit_kname_of(name):
+    '''
+    Gibt den KName des SysCalls zum Tracepoint der Rückkehr zurück (sys_exit_setuid -> "sys_setuid_kprobe"),
+    bzw. None, wenn name nicht mit sys_exit_ beginnt.
+    '''
+    if (not name.startswith(EXIT_PREFIX)):
+        return None
+    return kname_of(ENTER_PREFIX + name[len(EXIT_PREFIX):])
+
+
+class SyscallTracepoint(object):
+    '''
+    Der Tracepoint events/syscalls/sys_enter_<name> eines SysCalls, der statt einer KProbe
+    verwendet wird (siehe SysCall.BACKEND). Tracepoints kosten pro Event weniger als KProbes und
+    hängen nicht vom Namen des Symbols ab (SyS_execve, __x64_sys_execve, ...).
+
+    * name: Name des Tracepoints, z.B. "sys_enter_setuid"
+    * event_name: Name in trace_pipe, z.B. "sys_setuid" (entspricht SysCall.syscall)
+    * exit_name: Name des Tracepoints für die Rückkehr (siehe SysCall.RETPROBE), z.B. "sys_exit_setuid"
+    * args: Argumente laut format-Datei in deren Reihenfolge (ohne __syscall_nr)
+    * params: Liste von (Name aus PARAMS, Argument des Tracepoints, Konverter), siehe value_converter()
+    * selectors: Liste von (Index in args, Konverter) in der Reihenfolge von params
+
+    Die Parameter werden über ihren Namen den Argumenten zugeordnet; heißt ein Argument anders,
+    wird die KProbe verwendet (siehe resolve()).
+    '''
+
+    def __init__(self, name, args, params):
+        self.name = name
+        self.event_name = "sys_" + name[len(ENTER_PREFIX):]
+        self.exit_name = EXIT_PREFIX + name[len(ENTER_PREFIX):]
+        self.args = list(args)
+        self.params = list(params)
+        self.selectors = [(self.args.index(arg), convert) for _, arg, convert in self.params]
+
+    def __repr__(self):
+        return "SyscallTracepoint({!r}, params={})".format(self.name, [(name, arg) for name, arg, _ in self.params])
+
+    @classmethod
+    def supported(cls, syscall):
+        '''
+        Gibt an, ob sich alle Parameter eines SysCalls (Klasse oder Instanz) aus dem Tracepoint
+        ablesen lassen, d.h. alle Parameter sind Zahlen, die direkt in einem Register stehen.
+        '''
+        syscall_class = syscall if isinstance(syscall, type) else syscall.__class__
+        if (not syscall_class.__name__.lower().startswith("sys_")):
+            return False  # z.B. Sched_Process_Fork
+        return all(isinstance(typ, SysCallParam) and value_converter(typ) is not None for typ in syscall.PARAMS.values() if typ)
+
+    @classmethod
+    def resolve(cls, syscall):
+        '''
+        Gibt den SyscallTracepoint eines SysCalls zurück, bzw. None, falls eine KProbe nötig ist:
+
+        * nicht alle Parameter lassen sich aus dem Tracepoint ablesen (siehe supported()),
+          z.B. Strings bei Sys_Execve oder die Speicherinhalte bei Sys_Connect
+        * der Tracepoint existiert im tracefs nicht (z.B. ohne CONFIG_FTRACE_SYSCALLS)
+        * ein Parameter hat kein gleichnamiges Argument im Tracepoint; nach der Position wird
+          nicht geraten, da sich die Argumente eines Tracepoints nicht mit den Registern decken müssen
+        '''
+        from ftrace.rawbuffer import EventFormat
+
+        if (not cls.supported(syscall)):
+            return None
+        name = ENTER_PREFIX + syscall.syscall[len("sys_"):]
+        path = syscall.tracefs.path("events", SYSTEM, name, "format")
+        try:
+            fmt = EventFormat.from_file(path)
+        except (OSError, ReadFileException):
+            logging.debug("no tracepoint {}, using kprobe for {}".format(name, syscall.kname))
+            return None
+
+        args = [field.name for field in fmt.args]
+        params = []
+        for param, typ in syscall.PARAMS.items():
+            if (not typ):
+                continue
+            if (param not in args):
+                logging.debug("tracepoint {} has no argument {}, using kprobe".format(name, param))
+                return None
+            params.append((param, param, value_converter(typ)))
+        return cls(name, args, params)
+
+    @classmethod
+    def stub_format(cls, syscall, event_id, exit=False):
+        '''
+        Gibt den Inhalt einer format-Datei für die Nachbildung von tracefs zurück
+        (siehe TraceFS.create_stub()); die Argumente heißen wie die Parameter in PARAMS.
+        Mit exit=True die von sys_exit_<name> mit dem Rückgabewert ret.
+        '''
+        name = (EXIT_PREFIX if exit else ENTER_PREFIX) + syscall.__name__.lower()[len("sys_"):]
+        lines = [
+            "name: {}".format(name),
+            "ID: {}".format(event_id),
+            "format:",
+            "\tfield:unsigned short common_type;\toffset:0;\tsize:2;\tsigned:0;",
+            "\tfield:unsigned char common_flags;\toffset:2;\tsize:1;\tsigned:0;",
+            "\tfield:unsigned char common_preempt_count;\toffset:3;\tsize:1;\tsigned:0;",
+            "\tfield:int common_pid;\toffset:4;\tsize:4;\tsigned:1;",
+            "",
+            "\tfield:int __syscall_nr;\toffset:8;\tsize:4;\tsigned:1;",
+        ]
+        if (exit):
+            lines.extend(["\tfield:long ret;\toffset:16;\tsize:8;\tsigned:1;", "", 'print fmt: "0x%lx", REC->ret'])
+            return "\n".join(lines) + "\n"
+        for i, param in enumerate(syscall.PARAMS):
+            lines.append("\tfield:unsigned long {};\toffset:{};\tsize:8;\tsigned:0;".format(param, 16 + 8 * i))
+        lines.append("")
+        lines.append('print fmt: "{}"'.format(", ".join("{}: 0x%08lx".format(param) for param in syscall.PARAMS)))
+        return "\n".join(lines) + "\n"
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 
 from ftrace.parsers import SysCallParser
-from ftrace.syscalls import SysCall
+from ftrace.syscalls import SysCall, SysCallCatalog
+from ftrace.tracefs import TraceFS
+from ftrace.kprobes import KprobeRegistry, SetupTimer
+from ftrace.exceptions import WriteFileException
 import logging
 
 
@@ -36,6 +39,12 @@ class Tracer(object):
     '''
     _setup = False
 
+    tracefs = None
+    '''
+    Das `TraceFS <#module-ftrace.tracefs>`_, in dem der Tracer arbeitet.
+    FTrace setzt es beim Setup auf sein eigenes.
+    '''
+
     def setup(self):
         self._setup = True
 
@@ -64,30 +73,81 @@ class NopTracer(Tracer):
 
     Welche SysCalls getracet werden sollen, wird durch die Property 'syscalls' definiert.
     Siehe Property 'syscalls'
+
+    Die verfügbaren SysCalls werden in einem `SysCallCatalog <#module-ftrace.syscalls>`_ gehalten,
+    der einen SysCall erst instanziert, wenn er benötigt wird.
+
+    Beim Setup werden die KProbes gemeinsam registriert (siehe `KprobeRegistry <#module-ftrace.kprobes>`_)
+    und danach die gewählten SysCalls enablet. KProbes, die auch von anderen Tracern verwendet werden,
+    bleiben beim Reset registriert. Schlägt ein Schritt fehl, wird alles
+    rückgängig gemacht. Die Dauer der einzelnen Phasen steht danach in setup_stats.
+
+    Mit register_all=True (Standard) werden beim Setup die KProbes aller SysCalls registriert.
+    Mit register_all=False nur die der gewählten SysCalls; ändert sich die Property 'syscalls'
+    im laufenden Betrieb, werden KProbes entsprechend nachregistriert bzw. entfernt.
+    Jede registrierte KProbe belegt Speicher im Kernel, auch wenn sie nicht enablet ist.
+
+    Mit objects=True liefert der Parser Event-Objekte statt dictionaries
+    (siehe `Event <#module-ftrace.events>`_).
     '''
-    def __init__(self):
+    def __init__(self, tracefs=None, register_all=True, objects=False):
         logging.debug("initialising NopTracer")
 
-        self._all_syscalls = {syscall().kname: syscall() for syscall in SysCall.__subclasses__()}  # {kname: instance}
+        self._tracefs = tracefs if tracefs is not None else TraceFS.default()
+        self.register_all = register_all
+        self._all_syscalls = SysCallCatalog(self._tracefs)  # {kname: instance}, instanziert bei Bedarf
         self._enabled_syscalls = []  # list of knames
-        self.parser = SysCallParser(self._all_syscalls)
+        self._enabled_state = {}  # {kname: bool}, zuletzt geschriebener Zustand
+        self._registered = set()  # knames, deren KProbes von diesem Tracer registriert wurden
+        self.setup_stats = {}
+        self.parser = SysCallParser(self._all_syscalls, objects=objects)
 
         logging.debug("initialised NopTracer")
 
+    @property
+    def tracefs(self):
+        return self._tracefs
+
+    @tracefs.setter
+    def tracefs(self, val):
+        self._tracefs = val
+        self._all_syscalls.tracefs = val
+
     def setup(self):
         if (self._setup):
             return
 
         logging.debug("setting up NopTracer")
 
-        for syscall in self._all_syscalls.values():
-            syscall.registered = True
-        for kname, syscall in self._all_syscalls.items():
-            syscall.enabled = (kname in self._enabled_syscalls)
+        timer = SetupTimer()
+        registry = KprobeRegistry(self.tracefs)
+        knames = list(self._all_syscalls) if self.register_all else list(self._enabled_syscalls)
+        with timer.phase("register"):
+            added = registry.acquire([self._all_syscalls[kname] for kname in knames])
+
+        self._registered = set(knames)
+        self._enabled_state = {kname: False for kname in added}  # neu registrierte KProbes sind disabled
+        try:
+            with timer.phase("enable"):
+                self._apply_enabled()
+        except Exception:
+            logging.debug("enabling syscalls failed, rolling back")
+            self._disable_all()
+            registry.release(knames)
+            self._registered = set()
+            self._enabled_state = {}
+            raise
+
+        with timer.phase("filter"):
+            self._apply_filters(self._registered)
 
+        with timer.phase("compile"):
+            self.parser.compile(self._registered)
+
+        self.setup_stats = timer.stats
         self._setup = True
 
-        logging.debug("NopTracer set up")
+        logging.debug("NopTracer set up: {}".format(", ".join("{} {:.3f}s".format(k, v) for k, v in timer.stats.items())))
 
     def reset(self):
         if (not self._setup):
@@ -95,15 +155,86 @@ class NopTracer(Tracer):
 
         logging.debug("resetting NopTracer")
 
-        for syscall in self._all_syscalls.values():
-            syscall.enabled = False
-        for syscall in self._all_syscalls.values():
-            syscall.registered = False
+        self._disable_all()
+        KprobeRegistry(self.tracefs).release(self._registered)
+        for syscall in self._all_syscalls.instances.values():
+            if (syscall.filter is not None):
+                syscall.filter.kernel_applied = False  # Filter des Kernels wurde mit der KProbe entfernt
+        self._registered = set()
+        self._enabled_state = {}
 
         self._setup = False
 
         logging.debug("NopTracer reset")
 
+    def _apply_enabled(self):
+        '''
+        En/disablet alle SysCalls entsprechend der Property 'syscalls'. Geschrieben wird nur,
+        wenn sich der Zustand vom zuletzt geschriebenen unterscheidet (bzw. dieser unbekannt ist).
+        Bei register_all=False werden fehlende KProbes vorher registriert und nicht mehr
+        benötigte danach entfernt.
+        '''
+        enabled = set(self._enabled_syscalls)
+        registry = KprobeRegistry(self.tracefs)
+
+        if (not self.register_all):
+            missing = [kname for kname in self._enabled_syscalls if kname not in self._registered]
+            if (missing):
+                for kname in registry.acquire([self._all_syscalls[kname] for kname in missing]):
+                    self._enabled_state[kname] = False
+                self._registered.update(missing)
+                self._apply_filters(missing)
+                self.parser.compile(missing)
+
+        for kname in (self._registered | enabled):
+            val = kname in enabled
+            if (self._enabled_state.get(kname) is not val):
+                self._all_syscalls[kname].set_enabled(val, check_registered=False)
+                self._enabled_state[kname] = val
+
+        if (not self.register_all):
+            stale = self._registered - enabled
+            if (stale):
+                registry.release(stale)
+                self._registered -= stale
+                for kname in stale:
+                    self._enabled_state.pop(kname, None)
+
+    def _apply_filters(self, knames):
+        instances = self._all_syscalls.instances
+        for kname in knames:
+            syscall = instances.get(kname)
+            if (syscall is not None and syscall.filter is not None):
+                syscall.apply_filter()
+
+    def set_filter(self, syscall, predicate):
+        '''
+        Setzt den Filter eines SysCalls (SysCall-Instanz, -Klasse oder KName), siehe SysCall.filter.
+        None entfernt den Filter. Ist der Tracer aufgesetzt, wird der Filter sofort in den Kernel geschrieben.
+        '''
+        kname = self._kname(syscall)
+        self._all_syscalls[kname].set_filter(predicate, apply=self._setup and kname in self._registered)
+
+    def filter_stats(self):
+        '''
+        Gibt für jeden SysCall mit Filter dessen Zähler zurück (siehe EventFilter.stats()):
+
+        .. code:: python
+
+          {"sys_setuid_kprobe": {"kernel_filter": "arg1 == 0", "dropped_kernel": None,
+                                 "dropped_prefilter": 0, "dropped_postfilter": 3, "passed": 12}}
+        '''
+        return {kname: syscall.filter.stats() for kname, syscall in self._all_syscalls.instances.items() if syscall.filter is not None}
+
+    def _disable_all(self):
+        for kname in (self._registered | set(self._enabled_state)):
+            if (self._enabled_state.get(kname) is not False):
+                try:
+                    self._all_syscalls[kname].set_enabled(False, check_registered=False)
+                except (FileNotFoundError, WriteFileException):
+                    pass  # nicht registriert
+                self._enabled_state[kname] = False
+
     @property
     def syscalls(self):
         '''
@@ -114,6 +245,8 @@ class NopTracer(Tracer):
         gewählten SysCalls auch enablet.
         Ist der Tracer noch nicht aufgesetzt würde das enablen eines
         SysCalls zu einem Fehler führen.
+
+        Es können SysCall-Instanzen oder SysCall-Klassen angegeben werden.
         '''
         return self._enabled_syscalls
 
@@ -124,12 +257,16 @@ class NopTracer(Tracer):
         if (not isinstance(val, list)):
             raise TypeError("list expected, {} given".format(type(val)))
 
-        self._enabled_syscalls = []
-        for syscall in val:
-            if (not isinstance(syscall, SysCall)):
-                raise TypeError("SysCall expected, {} given".format(type(syscall)))
-            self._enabled_syscalls.append(syscall.kname)
+        self._enabled_syscalls = [self._kname(syscall) for syscall in val]
 
         if (self._setup):
-            for kname, syscall in self._all_syscalls.items():
-                syscall.enabled = (kname in self._enabled_syscalls)
+            self._apply_enabled()
+
+    def _kname(self, syscall):
+        if (isinstance(syscall, SysCall)):
+            return syscall.kname
+        if (isinstance(syscall, type) and issubclass(syscall, SysCall)):
+            return syscall.class_kname()
+        if (isinstance(syscall, str) and syscall in self._all_syscalls):
+            return syscall
+        raise TypeError("SysCall expected, {} given".format(type(syscall)))
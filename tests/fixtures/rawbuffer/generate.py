@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+'''
+Erzeugt die Seiten in cpu0.raw (Kopie von per_cpu/cpu0/trace_pipe_raw, little endian, 4096 Bytes
+pro Seite) samt events/header_page und den format-Dateien, wie sie der Kernel für die KProbes
+sys_setuid_kprobe und sys_execve_kprobe und für sched_process_fork ausgibt.
+
+Die Seiten enthalten alle Arten von Einträgen des Ringpuffers (Padding, Zeit-Erweiterung,
+absoluter Zeitstempel, Event mit Länge im ersten Wort) und eine Seite mit RB_MISSED_EVENTS.
+EVENTS gibt die entsprechenden Zeilen aus trace_pipe an (siehe tests/test_rawbuffer.py).
+
+Aufruf:
+
+  python tests/fixtures/rawbuffer/generate.py
+'''
+
+import os
+import struct
+
+PAGE_SIZE = 4096
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SETUID_ID = 1501
+EXECVE_ID = 1502
+FORK_ID = 312
+
+COMMON = (
+    "\tfield:unsigned short common_type;\toffset:0;\tsize:2;\tsigned:0;\n"
+    "\tfield:unsigned char common_flags;\toffset:2;\tsize:1;\tsigned:0;\n"
+    "\tfield:unsigned char common_preempt_count;\toffset:3;\tsize:1;\tsigned:0;\n"
+    "\tfield:int common_pid;\toffset:4;\tsize:4;\tsigned:1;\n\n"
+)
+
+FORMATS = {
+    "events/kprobes/sys_setuid_kprobe/format": (
+        "name: sys_setuid_kprobe\nID: {}\nformat:\n".format(SETUID_ID) + COMMON +
+        "\tfield:unsigned long __probe_ip;\toffset:8;\tsize:8;\tsigned:0;\n"
+        "\tfield:u32 arg1;\toffset:16;\tsize:4;\tsigned:0;\n\n"
+        "print fmt: \"(%lx) arg1=%u\", REC->__probe_ip, REC->arg1\n"
+    ),
+    "events/kprobes/sys_execve_kprobe/format": (
+        "name: sys_execve_kprobe\nID: {}\nformat:\n".format(EXECVE_ID) + COMMON +
+        "\tfield:unsigned long __probe_ip;\toffset:8;\tsize:8;\tsigned:0;\n" +
+        "".join("\tfield:__data_loc char[] arg{};\toffset:{};\tsize:4;\tsigned:1;\n".format(i + 1, 16 + 4 * i) for i in range(6)) +
+        "\nprint fmt: \"(%lx) arg1=\\\"%s\\\"\", REC->__probe_ip, __get_str(arg1)\n"
+    ),
+    "events/sched/sched_process_fork/format": (
+        "name: sched_process_fork\nID: {}\nformat:\n".format(FORK_ID) + COMMON +
+        "\tfield:char parent_comm[16];\toffset:8;\tsize:16;\tsigned:1;\n"
+        "\tfield:pid_t parent_pid;\toffset:24;\tsize:4;\tsigned:1;\n"
+        "\tfield:char child_comm[16];\toffset:28;\tsize:16;\tsigned:1;\n"
+        "\tfield:pid_t child_pid;\toffset:44;\tsize:4;\tsigned:1;\n\n"
+        "print fmt: \"comm=%s pid=%d child_comm=%s child_pid=%d\", REC->parent_comm, REC->parent_pid, REC->child_comm, REC->child_pid\n"
+    ),
+    "events/header_page": (
+        "\tfield: u64 timestamp;\toffset:0;\tsize:8;\tsigned:0;\n"
+        "\tfield: local_t commit;\toffset:8;\tsize:8;\tsigned:1;\n"
+        "\tfield: int overwrite;\toffset:8;\tsize:1;\tsigned:1;\n"
+        "\tfield: char data;\toffset:16;\tsize:4080;\tsigned:1;\n"
+    ),
+}
+
+COMMS = {7291: "sudo", 7292: "sudo", 4588: "bash"}
+
+EVENTS = [
+    b"            sudo-7291  [000] d... 1.000001: sys_setuid_kprobe: (sys_setuid+0x0/0x30) arg1=1000\n",
+    b"            sudo-7291  [000] d... 1.000002: sys_setuid_kprobe: (sys_setuid+0x0/0x30) arg1=0\n",
+    b'            bash-4588  [000] d... 1.000010: sys_execve_kprobe: (sys_execve+0x0/0x30) arg1="/usr/lib/x86_64-linux-gnu/helper/long-running-service" arg2="service" arg3="--config=/etc/service/config.yaml" arg4="-l" arg5=(fault) arg6=(fault)\n',
+    b"            sudo-7291  [000] d... 1.500000: sched_process_fork: comm=sudo pid=7291 child_comm=sudo child_pid=7292\n",
+    b"            sudo-7292  [000] d... 2.000000: sys_setuid_kprobe: (sys_setuid+0x0/0x30) arg1=0\n",
+    b"            sudo-7291  [000] d... 3.000000: sys_setuid_kprobe: (sys_setuid+0x0/0x30) arg1=1000\n",
+]
+'''Die Events der Seiten in der Reihenfolge von cpu0.raw, wie sie in trace_pipe erscheinen'''
+
+MISSED_EVENTS = 1 << 31
+
+
+def _record(type_len, delta, payload=b""):
+    return struct.pack("<I", type_len | (delta << 5)) + payload
+
+
+def _event(delta, data):
+    '''
+    Event mit den Daten data (auf 4 Bytes aufgefüllt). Bis 112 Bytes steht die Länge in type_len,
+    darüber im ersten Wort (type_len 0, Länge inklusive dieses Worts).
+    '''
+    data += b"\0" * (-len(data) % 4)
+    if (len(data) <= 28 * 4):
+        return _record(len(data) // 4, delta, data)
+    return _record(0, delta, struct.pack("<I", len(data) + 4) + data)
+
+
+def _setuid(pid, uid):
+    return struct.pack("<HBBiQI", SETUID_ID, 0, 0, pid, 0xffffffff81000000, uid)
+
+
+def _execve(pid, strings):
+    data = b""
+    locs = []
+    base = 16 + 4 * len(strings)
+    for value in strings:
+        raw = value.encode() + b"\0" if value is not None else b""
+        locs.append((len(raw) << 16) | (base + len(data)))
+        data += raw
+    return struct.pack("<HBBiQ", EXECVE_ID, 0, 0, pid, 0xffffffff81000000) + struct.pack("<6I", *locs) + data
+
+
+def _fork(parent, parent_pid, child, child_pid):
+    return struct.pack("<HBBi16si16si", FORK_ID, 0, 0, parent_pid, parent.encode(), parent_pid, child.encode(), child_pid)
+
+
+def _page(timestamp, records, flags=0):
+    data = b"".join(records)
+    page = struct.pack("<QQ", timestamp, len(data) | flags) + data
+    return page + b"\0" * (PAGE_SIZE - len(page))
+
+
+def pages():
+    '''
+    Seite 1 (Start bei 1 s): zwei Events, Padding mit Länge, ein Event mit Länge im ersten Wort,
+    Padding bis zum Ende der Seite (delta 0), dahinter Daten, die nicht mehr gelesen werden dürfen.
+    Seite 2 (Start bei 1 s, RB_MISSED_EVENTS): Zeit-Erweiterung auf 1.5 s, Fork, absoluter
+    Zeitstempel 2 s, Event; dann Zeit-Erweiterung um 1 s und Event.
+    '''
+    start = 1000000000
+    first = _page(start, [
+        _event(1000, _setuid(7291, 1000)),
+        _event(1000, _setuid(7291, 0)),
+        _record(29, 1, struct.pack("<I", 12) + b"\xff" * 8),
+        _event(8000, _execve(4588, ["/usr/lib/x86_64-linux-gnu/helper/long-running-service", "service", "--config=/etc/service/config.yaml", "-l", None, None])),
+        _record(29, 0),
+        _event(1000, _setuid(4588, 99)),
+    ])
+    extend = 500000000
+    stamp = 2000000000
+    second = _page(start, [
+        _record(30, extend & ((1 << 27) - 1), struct.pack("<I", extend >> 27)),
+        _event(0, _fork("sudo", 7291, "sudo", 7292)),
+        _record(31, stamp & ((1 << 27) - 1), struct.pack("<I", stamp >> 27)),
+        _event(0, _setuid(7292, 0)),
+        _record(30, 1000000000 & ((1 << 27) - 1), struct.pack("<I", 1000000000 >> 27)),
+        _event(0, _setuid(7291, 1000)),
+    ], flags=MISSED_EVENTS)
+    return [first, second]
+
+
+def main():
+    for name, content in FORMATS.items():
+        path = os.path.join(ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+    with open(os.path.join(ROOT, "cpu0.raw"), "wb") as f:
+        for page in pages():
+            f.write(page)
+
+
+if __name__ == "__main__":
+    main()
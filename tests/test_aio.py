@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+'''
+AsyncEventStream mit einem FIFO als Nachbildung von trace_pipe.
+'''
+
+import os
+import time
+import asyncio
+import threading
+
+import pytest
+
+from ftrace.aio import AsyncEventStream
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+
+from test_parsers import SETREUID
+
+
+@pytest.fixture
+def pipe(tmp_path):
+    path = str(tmp_path / "trace_pipe")
+    os.mkfifo(path)
+    writer = os.open(path, os.O_RDWR)  # öffnet auch ohne Leser, es kommt kein EOF
+    yield path, writer
+    os.close(writer)
+
+
+@pytest.fixture
+def parser(tmp_path):
+    return NopTracer(TraceFS.create_stub(str(tmp_path / "tracefs"))).parser
+
+
+def test_stop_from_other_thread(pipe, parser):
+    path, writer = pipe
+
+    async def consume():
+        stream = AsyncEventStream(path, parser)
+        await stream.open()
+        timer = threading.Timer(0.2, stream.stop)
+        timer.start()
+        start = time.monotonic()
+        events = [data async for data in stream]
+        timer.join()
+        return events, time.monotonic() - start, stream
+
+    events, duration, stream = asyncio.run(consume())
+    assert events == []
+    assert duration < 5
+    assert stream._fd is None
+
+
+def test_aclose_keeps_parsed_events(pipe, parser):
+    path, writer = pipe
+
+    async def consume():
+        stream = AsyncEventStream(path, parser)
+        await stream.open()
+        os.write(writer, SETREUID * 3)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return [first] + [data async for data in stream]
+
+    events = asyncio.run(consume())
+    assert [data["ruid"] for data in events] == [1000, 1000, 1000]
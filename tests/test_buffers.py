@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+'''
+Zähler der Ringpuffer (per_cpu/cpuN/stats) und Meldungen über verlorene Events.
+'''
+
+import os
+
+from ftrace import FTrace
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+from ftrace.buffers import BufferMonitor, parse_cpu_stats, estimate_buffer_size_kb
+
+from test_parsers import SETREUID
+
+STATS = """entries: 12
+overrun: {overrun}
+commit overrun: 0
+bytes: 1024
+oldest event ts:  6788.794592
+now ts:  6794.882801
+dropped events: {dropped}
+read events: 130
+"""
+
+
+def write_stats(tracefs, cpu, overrun=0, dropped=0):
+    with open(tracefs.path("per_cpu", "cpu{}".format(cpu), "stats"), "w") as f:
+        f.write(STATS.format(overrun=overrun, dropped=dropped))
+
+
+def test_parse_cpu_stats():
+    stats = parse_cpu_stats(STATS.format(overrun=3, dropped=1) + "no separator\n")
+    assert stats == {"entries": 12, "overrun": 3, "commit overrun": 0, "bytes": 1024, "oldest event ts": 6788.794592,
+                     "now ts": 6794.882801, "dropped events": 1, "read events": 130}
+    assert estimate_buffer_size_kb(100000, cpus=4, seconds=1.0) == 3125
+
+
+def test_monitor_counts_overruns(tmp_path):
+    tracefs = TraceFS.create_stub(str(tmp_path), cpus=2)
+    write_stats(tracefs, 0, overrun=3)  # vor dem Start verloren: wird nicht gezählt
+    lost = []
+    monitor = BufferMonitor(tracefs, callback=lost.append)
+    assert monitor.poll() == 0
+
+    write_stats(tracefs, 1, overrun=5, dropped=2)
+    assert monitor.poll() == 7
+    assert [(e.source, e.cpu, e.count, e.total) for e in lost] == [("stats", 1, 7, 7)]
+
+    write_stats(tracefs, 1)  # Zähler zurückgesetzt
+    write_stats(tracefs, 0, overrun=4)
+    assert monitor.poll() == 1
+    assert [(e.cpu, e.count, e.total) for e in lost[1:]] == [(0, 1, 8)]
+
+    monitor.report(1, 10)
+    stats = monitor.stats()
+    assert (stats["lost_events"], stats["reported_lost_events"], stats["entries"]) == (8, 10, 24)
+    assert (lost[-1].source, lost[-1].total) == ("pipe", 10)
+
+
+def test_get_output_reports_lost_events(tmp_path):
+    '''
+    Die Meldung aus trace_pipe erreicht on_lost; danach hat der Parser wieder seinen vorherigen Callback.
+    '''
+    tracefs = TraceFS.create_stub(str(tmp_path), cpus=2)
+    ftrace = FTrace(tracefs)
+    ftrace.tracer = NopTracer(tracefs)
+    previous = ftrace.tracer.parser.on_lost = lambda cpu, count: None
+    lost = []
+    writer = os.open(tracefs.path("trace_pipe"), os.O_RDWR)
+    try:
+        os.write(writer, SETREUID + b"CPU:1 [LOST 5 EVENTS]\n" + SETREUID)
+        events = [data for data in ftrace.get_output(idle_timeout=0.2, on_lost=lost.append) if data]
+    finally:
+        os.close(writer)
+
+    assert len(events) == 2
+    assert [(e.source, e.cpu, e.count) for e in lost] == [("pipe", 1, 5)]
+    assert ftrace.buffer_stats()["reported_lost_events"] == 5
+    assert ftrace.tracer.parser.on_lost is previous
+
+
+def test_set_buffer_size_per_cpu(tmp_path):
+    tracefs = TraceFS.create_stub(str(tmp_path), cpus=2)
+    ftrace = FTrace(tracefs)
+    ftrace.set_buffer_size(events_per_s=200000, seconds=1.0, cpus=[1])
+    assert ftrace.buffer_size_kb == 25000
+    assert tracefs.file("per_cpu", "cpu1", "buffer_size_kb").read().strip() == "1408"  # erst beim Setup
+
+    ftrace._setup = True
+    ftrace.set_buffer_size(2048, cpus=[1])
+    assert tracefs.file("per_cpu", "cpu0", "buffer_size_kb").read().strip() == "1408"
+    assert tracefs.file("per_cpu", "cpu1", "buffer_size_kb").read().strip() == "2048"
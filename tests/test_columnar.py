@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+'''
+Spaltenweise Batches (ColumnBatcher, ColumnBuilder).
+'''
+
+import time
+from array import array
+
+import pytest
+
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+from ftrace.columnar import ColumnBatcher, ColumnBuilder, StringColumn, ListColumn
+
+from test_parsers import SETREUID, CONNECT
+from test_pipeline import EXECVE
+
+
+@pytest.fixture
+def parser(tmp_path):
+    return NopTracer(TraceFS.create_stub(str(tmp_path))).parser
+
+
+def test_batches_per_syscall(parser):
+    batcher = ColumnBatcher(parser.syscalls, batch_size=2, timestamp_ns=True)
+    execve = parser.parse(EXECVE.replace(b"{pid}", b"7000"))
+    assert batcher.add(parser.parse(SETREUID)) is None
+    assert batcher.add(execve) is None
+    batch = batcher.add(parser.parse(SETREUID.replace(b"arg2=0", b"arg2=1000")))
+
+    assert (batch.kname, len(batch)) == ("sys_setreuid_kprobe", 2)
+    assert batch["caller_pid"].typecode == "q" and list(batch["euid"]) == [0, 1000]
+    assert list(batch["timestamp"]) == [100000100000, 100000100000]
+    assert isinstance(batch["caller_name"], StringColumn) and batch["caller_name"].tolist() == ["sudo", "sudo"]
+    assert next(batch.rows())["timestamp"] == 100.0001
+
+    batch, = batcher.flush()
+    assert isinstance(batch["argv"], ListColumn)
+    assert batch["argv"][0] == ["sudo", "first\nsecond", "(fault)", "(fault)", ""]
+    assert list(batch.rows()) == [dict(execve, timestamp=6788.795131)]
+    assert batcher.flush() == []
+    assert batcher.stats() == {"batches": 2, "events": 3}
+
+
+def test_objects_and_fallback(parser):
+    '''
+    Felder ohne Typ werden als Liste gespeichert; passt ein Wert nicht ins array, wird die Spalte umgewandelt.
+    '''
+    builder = ColumnBuilder("sys_connect_kprobe", parser.syscalls.get("sys_connect_kprobe"))
+    builder.append(parser.parse(CONNECT))
+    event = parser.parse(CONNECT)
+    event["caller_pid"] = "<unknown>"
+    builder.append(event)
+    batch = builder.build()
+
+    assert batch["adress"] == [("127.0.0.1", 80), ("127.0.0.1", 80)]
+    assert batch["caller_pid"] == [4243, "<unknown>"]
+    assert batch["timestamp"].__class__ is array
+    assert len(builder) == 0
+
+
+def test_list_column_rolls_back():
+    column = ListColumn(array("q"))
+    column.append([1, 2])
+    with pytest.raises(TypeError):
+        column.append([3, "x"])
+    assert column.tolist() == [[1, 2]]
+
+    strings = ListColumn(StringColumn())
+    strings.append(["a", "b"])
+    with pytest.raises(AttributeError):
+        strings.append(["c", 4])
+    strings.append(["d"])
+    assert strings.tolist() == [["a", "b"], ["d"]]
+
+
+def test_max_delay(parser):
+    batcher = ColumnBatcher(parser.syscalls, max_delay=0.05)
+    batcher.add(parser.parse(SETREUID))
+    assert not batcher.due()
+    assert batcher.flush(expired_only=True) == []
+    time.sleep(0.1)
+    assert batcher.due()
+    assert len(batcher.flush(expired_only=True)[0]) == 1
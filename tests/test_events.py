@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+'''
+Event-Klassen (NopTracer(objects=True)).
+'''
+
+import sys
+
+import pytest
+
+from ftrace.events import make_event_class
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+from ftrace.parsers import SysCallParser
+
+from test_parsers import SETREUID
+
+
+@pytest.fixture
+def parser(tmp_path):
+    return SysCallParser(NopTracer(TraceFS.create_stub(str(tmp_path))).parser.syscalls, objects=True)
+
+
+def test_module_of_event_class(parser):
+    event = parser.parse(SETREUID)
+    assert type(event).__module__ == "ftrace.events"
+    assert type(event).__name__ == "Sys_SetreuidEvent"
+
+
+def test_values_are_cached():
+    loads = []
+    cls = make_event_class("TestEvent", [("value", lambda event: loads.append(1) or int(event._parts[0]))])
+    event = cls((b"42",), ())
+    assert event.value == 42
+    assert event["value"] == 42
+    assert len(loads) == 1
+    event.value = 7
+    assert event.to_dict() == {"value": 7}
+
+
+def test_line_released_after_split(parser):
+    line = bytes(SETREUID)
+    refs = sys.getrefcount(line)
+    event = parser.parse(line)
+    assert sys.getrefcount(line) == refs + 1
+    assert event.ruid == 1000
+    assert sys.getrefcount(line) == refs
+    assert event.raw("euid") == b"0"
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+'''
+Prädikate und ihre Übersetzung in Filter des Kernels.
+'''
+
+import pytest
+
+from ftrace.filters import Field, Predicate, EventFilter
+
+FIELDS = {"caller_name": ("comm", True), "caller_pid": ("common_pid", False), "uid": ("arg1", False)}
+
+
+def test_predicate_is_abstract():
+    with pytest.raises(TypeError):
+        Predicate()
+
+    class OnlyFields(Predicate):
+        def fields(self):
+            return {"uid"}
+
+    with pytest.raises(TypeError):
+        OnlyFields()
+
+
+def test_custom_predicate():
+    class Even(Predicate):
+        def fields(self):
+            return {"uid"}
+
+        def evaluate(self, values):
+            return values["uid"] % 2 == 0
+
+    predicate = Even() & (Field("uid") > 0)
+    assert predicate.evaluate({"uid": 2})
+    assert not predicate.evaluate({"uid": 3})
+    assert Even().kernel(FIELDS) is None
+    assert EventFilter(predicate, FIELDS).kernel_filter == "arg1 > 0"
+
+
+def test_kernel_filter_split():
+    event_filter = EventFilter((Field("uid") == 0) & (Field("caller_name") == "sudo") & Field("uid").test(bool), FIELDS)
+    assert event_filter.kernel_filter == 'arg1 == 0 && comm == "sudo"'
+    assert event_filter.header_kernel_filter == 'comm == "sudo"'
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+'''
+Registrieren und Entfernen von KProbes über kprobe_events (Nachbildung von tracefs).
+'''
+
+import pytest
+
+from ftrace import syscalls
+from ftrace.tracefs import TraceFS
+from ftrace.kprobes import KprobeEvents
+from ftrace.exceptions import WriteFileException
+
+FOREIGN = "p:kprobes/foreign do_sys_open"
+
+
+def setup_events(tmp_path):
+    tracefs = TraceFS.create_stub(str(tmp_path), syscalls=[syscalls.Sys_Setuid(), syscalls.Sys_Kill(), syscalls.Sys_Umask()])
+    events = KprobeEvents(tracefs)
+    events._file.append_lines([FOREIGN])
+    return tracefs, events
+
+
+def test_register_and_unregister(tmp_path):
+    tracefs, events = setup_events(tmp_path)
+    setuid, kill = syscalls.Sys_Setuid(tracefs), syscalls.Sys_Kill(tracefs)
+
+    assert events.register([setuid, kill]) == ["sys_setuid_kprobe", "sys_kill_kprobe"]
+    assert events.register([setuid]) == []  # schon registriert
+    assert list(events.current()) == ["foreign", "sys_setuid_kprobe", "sys_kill_kprobe"]
+
+    events.unregister(["sys_setuid_kprobe", "sys_umask_kprobe"])  # nicht registrierte werden übersprungen
+    assert list(events.current()) == ["foreign", "sys_kill_kprobe"]
+
+
+def test_failed_register_rolls_back(tmp_path, monkeypatch):
+    '''
+    Der Kernel übernimmt die Zeilen vor der fehlerhaften; diese müssen wieder entfernt werden,
+    die vorher registrierten Probes bleiben erhalten.
+    '''
+    tracefs, events = setup_events(tmp_path)
+    events.register([syscalls.Sys_Umask(tracefs)])
+    before = events.current()
+
+    append_lines = events._file.append_lines
+    failures = []
+
+    def failing_append(lines):
+        if (not failures):
+            failures.append(lines)
+            append_lines(lines[:1])
+            raise WriteFileException("Invalid argument")
+        append_lines(lines)
+
+    monkeypatch.setattr(events._file, "append_lines", failing_append)
+    with pytest.raises(WriteFileException):
+        events.register([syscalls.Sys_Setuid(tracefs), syscalls.Sys_Kill(tracefs), syscalls.Sys_Umask(tracefs)])
+
+    assert failures == [[syscalls.Sys_Setuid(tracefs).kprobe, syscalls.Sys_Kill(tracefs).kprobe]]
+    assert events.current() == before
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+'''
+Rückkehr aus SysCalls (SysCall.RETPROBE): Filter der Rückkehr und Zuordnung mit ReturnPairer.
+'''
+
+import pytest
+
+from ftrace import syscalls
+from ftrace.filters import Field
+from ftrace.latency import ReturnPairer
+from ftrace.tracefs import TraceFS
+
+
+def event(kname, pid, timestamp, **values):
+    values.update(kname=kname, caller_pid=pid, caller_name="curl", timestamp=timestamp)
+    return values
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("backend", ["kprobe", "auto"])
+def test_return_probe_gets_header_filter(tmp_path, monkeypatch, backend):
+    monkeypatch.setattr(syscalls.Sys_Setuid, "RETPROBE", True)
+    monkeypatch.setattr(syscalls.SysCall, "BACKEND", backend)
+    tracefs = TraceFS.create_stub(str(tmp_path), syscalls=[syscalls.Sys_Setuid()], tracepoints=True)
+    syscall = syscalls.Sys_Setuid(tracefs)
+    assert (syscall.tracepoint is not None) == (backend == "auto")
+
+    syscall.set_filter((Field("uid") == 0) & (Field("caller_name") == "sudo") & (Field("caller_pid") != 1), apply=True)
+    assert read(syscall.return_filter_path) == 'comm == "sudo" && common_pid != 1'
+    assert read(syscall.filter_path).startswith('{} == 0 && comm == "sudo"'.format(syscall.filter_fields()["uid"][0]))
+
+    syscall.set_filter(Field("uid") == 0, apply=True)
+    assert read(syscall.return_filter_path) == "0"
+    syscall.set_filter(None, apply=True)
+    assert read(syscall.filter_path) == read(syscall.return_filter_path) == "0"
+
+
+def test_pairing():
+    pairer = ReturnPairer(syscalls=[syscalls.Sys_Connect])
+    assert pairer.update(event("sys_connect_kprobe", 5, 1.0)) == []
+    paired, = pairer.update(event("sys_connect_kretprobe", 5, 1.5, ret=-111))
+    assert (paired["ret"], paired["error"], paired["duration"]) == (-111, "ECONNREFUSED", 0.5)
+    assert pairer.histograms["sys_connect_kprobe"].count == 1
+
+
+def test_exit_releases_inflight_call():
+    '''
+    Beendet sich ein Thread während eines SysCalls, wird der Aufruf sofort unvollständig ausgegeben.
+    '''
+    pairer = ReturnPairer(syscalls=[syscalls.Sys_Connect])
+    pairer.update(event("sys_connect_kprobe", 5, 1.0))
+    pairer.update(event("sys_connect_kprobe", 6, 1.0))
+    entry, exited = pairer.update(event("sys_exit_kprobe", 6, 2.0, error_code=0))
+    assert (entry["kname"], entry["caller_pid"], entry["ret"], entry["duration"]) == ("sys_connect_kprobe", 6, None, None)
+    assert exited["kname"] == "sys_exit_kprobe"
+    exited = event("sys_exit_group_kprobe", 6, 2.0, error_code=0)
+    assert pairer.update(exited) == [exited]  # nichts mehr offen
+    entry, exited = pairer.update(event("sys_exit_group_kprobe", 5, 2.0, error_code=1))
+    assert (entry["caller_pid"], exited["kname"]) == (5, "sys_exit_group_kprobe")
+    assert len(pairer) == 0
+    assert pairer.stats()["exited"] == 2
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+'''
+Parsen von Logzeilen aus trace_pipe, als dictionary und als Event-Objekt.
+'''
+
+import pytest
+
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+from ftrace.filters import Field
+from ftrace.parsers import SysCallParser
+
+from test_pipeline import EXECVE
+
+SETREUID = b"            sudo-4242  [001] d... 100.000100: sys_setreuid_kprobe: (SyS_setreuid+0x0/0x30) arg1=1000 arg2=0\n"
+CONNECT = b"            curl-4243  [002] d... 100.000200: sys_connect_kprobe: (SyS_connect+0x0/0x60) arg1=0 arg2=0 arg3=0 arg4=0 arg5=0 arg6=0 arg7=16777343 arg8=0 arg9=0 arg10=2 arg11=20480\n"
+
+MALFORMED = [
+    b"            sudo-4242  [001] d... 100.000100: sys_setreuid_kprobe: (SyS_setreuid+0x0/0x30) arg1=1000\n",
+    CONNECT.replace(b" arg11=20480", b""),
+]
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    return NopTracer(TraceFS.create_stub(str(tmp_path)))
+
+
+@pytest.mark.parametrize("objects", [False, True])
+def test_complete_lines(tracer, objects):
+    parser = SysCallParser(tracer.parser.syscalls, objects=objects)
+    setreuid = parser.parse(SETREUID)
+    assert (setreuid["ruid"], setreuid["euid"]) == (1000, 0)
+    assert parser.parse(CONNECT)["adress"] == ("127.0.0.1", 80)
+
+
+@pytest.mark.parametrize("objects", [False, True])
+@pytest.mark.parametrize("line", MALFORMED)
+def test_malformed_line_is_incomplete(tracer, objects, line):
+    '''
+    Zu wenige Argumente ergeben in beiden Modi None statt eines Events, das beim Zugriff scheitert.
+    '''
+    parser = SysCallParser(tracer.parser.syscalls, objects=objects)
+    assert parser.parse(line) is None
+    assert parser.parse(SETREUID)["ruid"] == 1000  # die folgende Zeile wird wieder normal geparst
+
+
+@pytest.mark.parametrize("line", MALFORMED)
+def test_malformed_line_with_python_filter(tracer, line):
+    tracer.set_filter("sys_setreuid_kprobe", Field("ruid").test(lambda ruid: ruid >= 0))
+    tracer.set_filter("sys_connect_kprobe", Field("adress").test(lambda adress: adress is not None))
+    parser = SysCallParser(tracer.parser.syscalls, objects=True)
+    assert parser.parse(line) is None
+
+
+@pytest.mark.parametrize("objects", [False, True])
+def test_decoder_rebuilt_on_change(tracer, objects):
+    '''
+    Ändern sich ARGCOUNT oder der Filter eines SysCalls, wird sein zwischengespeicherter Decoder neu erstellt.
+    '''
+    parser = SysCallParser(tracer.parser.syscalls, objects=objects)
+    parser.compile(["sys_execve_kprobe", "sys_setreuid_kprobe"])
+    execve = EXECVE.replace(b"{pid}", b"7000")
+    execve3 = execve.replace(b' arg5=(fault) arg6=""', b"")
+    assert len(parser.parse(execve)["argv"]) == 5
+
+    parser.syscalls["sys_execve_kprobe"].ARGCOUNT = 3
+    assert parser.parse(execve) is None
+    assert parser.parse(execve3)["argv"] == ["sudo", "first\nsecond", "(fault)"]
+
+    tracer.set_filter("sys_setreuid_kprobe", Field("ruid").test(lambda ruid: ruid == 0))
+    assert parser.parse(SETREUID) is None
+    tracer.set_filter("sys_setreuid_kprobe", None)
+    assert parser.parse(SETREUID)["ruid"] == 1000
+
+
+@pytest.mark.parametrize("objects", [False, True])
+def test_truncated_quoted_argument(tracer, objects):
+    parser = SysCallParser(tracer.parser.syscalls, objects=objects)
+    execve = EXECVE.replace(b"{pid}", b"7000")
+    assert parser.parse(execve.replace(b'arg6=""', b'arg6="abc')) is None
+    assert parser.parse(execve.replace(b'arg6=""', b'arg6="ab"'))["argv"][-1] == "ab"
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+'''
+Beenden der Worker von ParallelRawReader, auch wenn niemand mehr ihre Queue leert.
+'''
+
+import os
+import queue
+import threading
+import multiprocessing
+
+import pytest
+
+from ftrace.percpu import CpuWorker
+
+from test_rawbuffer import syscalls, make_decoder, read_pages  # noqa: F401
+
+
+@pytest.fixture
+def fifo(tmp_path):
+    '''
+    FIFO mit einer Seite des Fixtures; der Schreiber bleibt offen, sodass kein EOF kommt.
+    '''
+    path = str(tmp_path / "trace_pipe_raw")
+    os.mkfifo(path)
+    writer = os.open(path, os.O_RDWR)
+    os.write(writer, read_pages()[0])
+    yield path
+    os.close(writer)
+
+
+def test_thread_worker_stops_on_full_queue(syscalls, fifo):
+    out_queue = queue.Queue(maxsize=1)
+    out_queue.put("full")
+    worker = CpuWorker(fifo, 0, make_decoder(syscalls), out_queue, page_size=4096)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    thread.join(0.3)
+    assert thread.is_alive()  # wartet auf Platz in der Queue
+    worker.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert worker.reader._closed
+    assert out_queue.get_nowait() == "full"
+
+
+def test_process_worker_stops_without_terminate(syscalls, fifo):
+    context = multiprocessing.get_context("fork")
+    out_queue = context.Queue(maxsize=1)
+    worker = CpuWorker(fifo, 0, make_decoder(syscalls), out_queue, page_size=4096, stop_event=context.Event())
+    process = context.Process(target=worker.run, daemon=True)
+    process.start()
+    cpu, events = out_queue.get(timeout=5)
+    assert len(events) == 3
+    worker.stop()
+    process.join(5)
+    assert process.exitcode == 0
+
+
+def test_idle_process_worker_stops(syscalls, tmp_path):
+    path = str(tmp_path / "trace_pipe_raw")
+    os.mkfifo(path)
+    writer = os.open(path, os.O_RDWR)
+    try:
+        context = multiprocessing.get_context("fork")
+        out_queue = context.Queue()
+        worker = CpuWorker(path, 0, make_decoder(syscalls), out_queue, page_size=4096, stop_event=context.Event())
+        process = context.Process(target=worker.run, daemon=True)
+        process.start()
+        worker.stop()
+        process.join(5)
+        assert process.exitcode == 0
+        assert out_queue.empty()  # nach stop() wird niemand mehr auf (cpu, None) warten
+    finally:
+        os.close(writer)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+'''
+Pipeline mit Überlauf: verworfen werden nur Batches geparster Events, nie Teile von Logzeilen.
+'''
+
+import time
+
+import pytest
+
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+from ftrace.pipeline import Pipeline
+
+EXECVE = b'           <...>-{pid}  [000] d... 6788.795131: sys_execve_kprobe: (SyS_execve+0x0/0x30) arg1="/usr/bin/sudo" arg2="sudo" arg3="first\nsecond" arg4=(fault) arg5=(fault) arg6=""\n'
+
+
+class ChunkReader(object):
+    '''
+    Liefert die Logzeilen in Blöcken, die jeweils mitten in einem Argument enden.
+    '''
+    path = "chunks"
+
+    def __init__(self, count):
+        self.count = count
+
+    def read_chunks(self):
+        for pid in range(self.count):
+            first, second = EXECVE.replace(b"{pid}", str(pid).encode()).split(b"\n", 1)
+            yield first + b"\n"
+            yield second
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("policy", ["drop_oldest", "sample"])
+def test_drops_keep_lines_intact(tmp_path, policy):
+    parser = NopTracer(TraceFS.create_stub(str(tmp_path))).parser
+    pipeline = Pipeline(ChunkReader(2000), parser, raw_queue_size=2, event_queue_size=2, policy=policy, sample_every=2)
+    events = []
+    for data in pipeline:
+        events.append(data)
+        time.sleep(0.0005)
+    stats = pipeline.stats()
+    assert stats["raw_queue"]["dropped"] == 0
+    assert stats["event_queue"]["dropped"] > 0
+    assert len(events) + stats["event_queue"]["dropped_weight"] == 2000
+    assert all(data["argv"][1] == "first\nsecond" for data in events)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+'''
+ProcInfoCache mit einer Nachbildung von /proc.
+'''
+
+import os
+import time
+import shutil
+
+from ftrace import syscalls
+from ftrace.procinfo import ProcInfoCache, read_procinfo
+
+CONTAINER = "4f2a" * 16
+
+
+def write_proc(root, pid, cmdline, uid=1000, euid=1000):
+    base = os.path.join(str(root), str(pid))
+    os.makedirs(base, exist_ok=True)
+    with open(os.path.join(base, "cmdline"), "wb") as f:
+        f.write(b"\0".join(arg.encode() for arg in cmdline) + b"\0")
+    with open(os.path.join(base, "status"), "w") as f:
+        f.write("Name:\t{}\nUid:\t{uid}\t{euid}\t{euid}\t{euid}\nGid:\t100\t100\t100\t100\n".format(cmdline[0], uid=uid, euid=euid))
+    with open(os.path.join(base, "cgroup"), "w") as f:
+        f.write("0::/system.slice/docker-{}.scope\n".format(CONTAINER))
+
+
+def event(syscall, pid, **values):
+    values.update(kname=syscall.class_kname(), caller_pid=pid)
+    return values
+
+
+def test_read_procinfo(tmp_path):
+    write_proc(tmp_path, 42, ["sudo", "ls"], euid=0)
+    assert read_procinfo(42, str(tmp_path)) == {
+        "cmdline": ["sudo", "ls"], "uid": 1000, "euid": 0, "gid": 100, "egid": 100,
+        "cgroup": ["/system.slice/docker-{}.scope".format(CONTAINER)], "container_id": CONTAINER,
+    }
+    assert read_procinfo(43, str(tmp_path)) is None
+
+
+def test_invalidation(tmp_path):
+    write_proc(tmp_path, 42, ["sudo", "ls"])
+    cache = ProcInfoCache(proc_root=str(tmp_path))
+    events = [event(syscalls.Sys_Setuid, 42), event(syscalls.Sys_Execve, 42), event(syscalls.Sys_Setuid, 42)]
+
+    enriched = cache.enrich(events)
+    assert next(enriched)["procinfo"]["uid"] == 1000
+    write_proc(tmp_path, 42, ["ls"], uid=0, euid=0)  # Setuid und Execve ausgeführt
+    assert next(enriched)["procinfo"]["uid"] == 0
+    assert next(enriched)["procinfo"]["cmdline"] == ["ls"]
+    assert (cache.reads, cache.invalidations) == (3, 3)
+
+
+def test_exited_entry_expires(tmp_path):
+    '''
+    Nach dem Exit wird der Eintrag noch verwendet, verfällt aber wie jeder andere nach ttl Sekunden.
+    '''
+    write_proc(tmp_path, 42, ["sudo", "ls"])
+    cache = ProcInfoCache(ttl=0.2, proc_root=str(tmp_path))
+    assert cache.get(42)["cmdline"] == ["sudo", "ls"]
+    cache.update(event(syscalls.Sys_Exit_Group, 42))
+    shutil.rmtree(os.path.join(str(tmp_path), "42"))
+    assert cache.get(42)["cmdline"] == ["sudo", "ls"]
+
+    write_proc(tmp_path, 42, ["sshd"])  # PID neu vergeben, ohne dass ein Fork im Strom war
+    time.sleep(0.3)
+    assert cache.get(42)["cmdline"] == ["sshd"]
+    assert cache.stats()["expirations"] == 1
+
+
+def test_eviction(tmp_path):
+    cache = ProcInfoCache(max_entries=2, proc_root=str(tmp_path))
+    for pid in (1, 2, 1, 3):
+        assert cache.get(pid) is None
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["read_errors"] == 3
+    cache.get(1)
+    assert cache.stats()["hits"] == 2
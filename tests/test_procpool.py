@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+'''
+Paralleles Parsen mit ProcessPoolParser.
+'''
+
+import os
+import time
+import threading
+
+import pytest
+
+from ftrace import FTrace
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+from ftrace.procpool import ProcessPoolParser
+
+from test_parsers import SETREUID
+from test_pipeline import EXECVE
+
+
+@pytest.fixture
+def parser(tmp_path):
+    return NopTracer(TraceFS.create_stub(str(tmp_path))).parser
+
+
+def test_idle_flush_keeps_continued_line(parser):
+    '''
+    Eine Pause mitten in einer mehrzeiligen Logzeile darf sie nicht zerteilen.
+    '''
+    first, second = EXECVE.replace(b"{pid}", b"7").split(b"\n", 1)
+
+    def chunks():
+        yield SETREUID + first + b"\n"
+        time.sleep(0.5)  # länger als flush_interval
+        yield second + SETREUID
+
+    pool = ProcessPoolParser(parser, workers=2, flush_interval=0.05)
+    events = list(pool.parse_chunks(chunks()))
+    assert [data["kname"] for data in events] == ["sys_setreuid_kprobe", "sys_execve_kprobe", "sys_setreuid_kprobe"]
+    assert events[1]["argv"][1] == "first\nsecond"
+    assert pool.batches >= 2
+
+
+def test_lost_events_reach_parent_parser(parser):
+    reported = []
+    parser.on_lost = lambda cpu, count: reported.append((cpu, count))
+    pool = ProcessPoolParser(parser, workers=1)
+    events = list(pool.parse_chunks(iter([SETREUID + b"CPU:1 [LOST 5 EVENTS]\n" + SETREUID])))
+    assert len(events) == 2
+    assert reported == [(1, 5)]
+    assert parser.lost_events == 5
+
+
+def _read_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "ftrace-read"]
+
+
+def test_early_exit_stops_reader(tmp_path):
+    '''
+    Verlässt der Konsument get_output_multiprocess() vorzeitig, während die Pipe offen bleibt,
+    muss der Lese-Thread enden, statt auf geschlossenen Filedeskriptoren weiter zu pollen.
+    '''
+    tracefs = TraceFS.create_stub(str(tmp_path))
+    ftrace = FTrace(tracefs)
+    ftrace.tracer = NopTracer(tracefs)
+    writer = os.open(tracefs.path("trace_pipe"), os.O_RDWR)  # kein EOF
+    try:
+        os.write(writer, SETREUID * 100)
+        output = ftrace.get_output_multiprocess(workers=1)
+        for i, data in enumerate(output):
+            if (i == 49):
+                break
+        output.close()
+        assert _read_threads() == []
+        start = time.process_time()
+        time.sleep(0.5)
+        assert time.process_time() - start < 0.2
+    finally:
+        os.close(writer)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+'''
+ProcessTree aus synthetischen Events.
+'''
+
+from ftrace import syscalls
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+from ftrace.proctree import ProcessTree
+
+from test_pipeline import EXECVE
+
+
+def fork(timestamp, pid, name, child, child_name=""):
+    return {"kname": syscalls.Sched_Process_Fork.class_kname(), "timestamp": timestamp, "caller_pid": pid,
+            "caller_name": name, "called_pid": child, "called_name": child_name}
+
+
+def execve(timestamp, pid, name, filename, argv):
+    return {"kname": syscalls.Sys_Execve.class_kname(), "timestamp": timestamp, "caller_pid": pid,
+            "caller_name": name, "filename": filename, "argv": argv + ["(fault)", ""]}
+
+
+def exit(timestamp, pid, name, code=0):
+    return {"kname": syscalls.Sys_Exit_Group.class_kname(), "timestamp": timestamp, "caller_pid": pid,
+            "caller_name": name, "error_code": code}
+
+
+def setuid(timestamp, pid, name):
+    return {"kname": syscalls.Sys_Setuid.class_kname(), "timestamp": timestamp, "caller_pid": pid,
+            "caller_name": name, "uid": 0}
+
+
+def test_ancestors():
+    tree = ProcessTree()
+    events = [fork(1.0, 100, "bash", 200), execve(1.1, 200, "bash", "/usr/bin/sudo", ["sudo", "id"]),
+              fork(1.2, 200, "sudo", 300), setuid(1.3, 300, "sudo"), None]
+    enriched = list(tree.enrich(events))
+    assert enriched[2]["ancestors"] == [(100, "bash")]  # Fork: Vorfahren des Elternprozesses
+    assert enriched[3]["ancestors"] == [(200, "sudo"), (100, "bash")]
+    assert enriched[4] is None
+    assert (tree[200].filename, tree[200].argv, tree[200].execs) == ("/usr/bin/sudo", ["sudo", "id"], 1)
+    assert (tree[300].ppid, tree[300].name, tree[100].ppid) == (200, "sudo", None)
+
+
+def test_fork_after_child_event():
+    '''
+    Das erste Event des Kindprozesses kommt (von einer anderen CPU) vor dem Fork an.
+    '''
+    tree = ProcessTree()
+    tree.update(fork(1.0, 100, "bash", 200))
+    tree.update(setuid(2.1, 300, "sudo"))
+    child = tree.update(fork(2.0, 200, "sudo", 300))
+    assert child is tree[300]
+    assert (child.ppid, child.started, child.last_seen) == (200, 2.0, 2.1)
+    assert tree.ancestors(300) == [tree[200], tree[100]]
+    assert tree.pid_reuses == 0
+
+
+def test_pid_reuse():
+    tree = ProcessTree()
+    old = tree.update(fork(1.0, 100, "bash", 200))
+    tree.update(fork(1.1, 200, "make", 300))
+    tree.update(exit(1.2, 200, "make", 2))
+    new = tree.update(fork(1.3, 100, "bash", 200, "cc"))
+
+    assert tree[200] is new and new.alive and new.name == "cc"
+    assert (old.exited, old.exit_code) == (1.2, 2)
+    assert tree[300].parent is old  # Kindprozesse behalten den alten Elternprozess
+    assert tree.stats()["pid_reuses"] == 1
+
+    tree.update(exit(1.4, 300, "make"))
+    tree.update(setuid(1.5, 300, "id"))  # Event nach dem Exit: PID neu vergeben, ohne Fork
+    assert tree[300].parent is None and tree[300].name == "id"
+    assert tree.stats()["pid_reuses"] == 2
+
+
+def test_limits():
+    tree = ProcessTree(max_processes=4, max_exited=1)
+    for pid in (200, 201):
+        tree.update(fork(1.0, 100, "bash", pid))
+    tree.update(exit(1.1, 200, "sh"))
+    tree.update(exit(1.2, 201, "sh"))
+    assert 200 not in tree and 201 in tree  # nur der zuletzt beendete bleibt
+    assert tree.stats() == {"processes": 2, "exited": 1, "pid_reuses": 0, "evicted": 0}
+
+    for pid in (300, 301, 302):
+        tree.update(fork(2.0, 100, "bash", pid))
+    assert 201 not in tree and 100 in tree and 302 in tree
+    assert tree.stats() == {"processes": 4, "exited": 0, "pid_reuses": 0, "evicted": 1}
+
+
+def test_enrich_objects(tmp_path):
+    parser = NopTracer(TraceFS.create_stub(str(tmp_path)), objects=True).parser
+    tree = ProcessTree()
+    tree.update(fork(1.0, 100, "bash", 7000))
+    event = parser.parse(EXECVE.replace(b"{pid}", b"7000"))
+    assert not isinstance(event, dict)
+
+    data, = tree.enrich([event])
+    assert isinstance(data, dict)
+    assert data["ancestors"] == [(100, "bash")]
+    assert data["caller_pid"] == 7000
+    assert tree[7000].argv == ["sudo", "first\nsecond"]
+    assert tree[7000].name == "sudo"
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+'''
+Dekodieren aufgezeichneter Seiten von trace_pipe_raw (siehe fixtures/rawbuffer/generate.py).
+'''
+
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+from ftrace.parsers import SysCallParser
+from ftrace.rawbuffer import RawEventDecoder, RawBufferReader, PageHeader, load_formats
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "rawbuffer")
+sys.path.insert(0, FIXTURES)
+
+import generate  # noqa: E402
+
+
+@pytest.fixture
+def syscalls(tmp_path):
+    return NopTracer(TraceFS.create_stub(str(tmp_path))).parser.syscalls
+
+
+def make_decoder(syscalls, objects=False):
+    return RawEventDecoder(
+        syscalls,
+        load_formats(os.path.join(FIXTURES, "events")),
+        PageHeader.from_file(os.path.join(FIXTURES, "events", "header_page"), byteorder="little"),
+        comms=dict(generate.COMMS),
+        byteorder="little",
+        objects=objects
+    )
+
+
+def read_pages():
+    with open(os.path.join(FIXTURES, "cpu0.raw"), "rb") as f:
+        data = f.read()
+    return [data[i:i + generate.PAGE_SIZE] for i in range(0, len(data), generate.PAGE_SIZE)]
+
+
+def test_fixture_is_up_to_date():
+    assert read_pages() == generate.pages()
+
+
+def test_header_page():
+    header = PageHeader.from_file(os.path.join(FIXTURES, "events", "header_page"), byteorder="little")
+    assert header.commit_size == 8
+    assert header.data_offset == 16
+
+
+def test_decode_file_matches_trace_pipe(syscalls):
+    decoder = make_decoder(syscalls)
+    parser = SysCallParser(syscalls)
+    decoded = list(decoder.decode_file(os.path.join(FIXTURES, "cpu0.raw"), page_size=generate.PAGE_SIZE))
+    assert decoded == [parser.parse(line) for line in generate.EVENTS]
+
+
+def test_objects_match_dicts(syscalls):
+    dicts = [event for page in read_pages() for event in make_decoder(syscalls).decode_page(page)]
+    objects = [event for page in read_pages() for event in make_decoder(syscalls, objects=True).decode_page(page)]
+    assert [event.to_dict() for event in objects] == dicts
+
+
+def test_padding(syscalls):
+    '''
+    Padding mit Länge wird übersprungen, Padding mit delta 0 beendet die Seite.
+    '''
+    decoder = make_decoder(syscalls)
+    first = read_pages()[0]
+    assert len(list(decoder.iter_records(first))) == 3
+    events = decoder.decode_page(first)
+    assert [event["kname"] for event in events] == ["sys_setuid_kprobe", "sys_setuid_kprobe", "sys_execve_kprobe"]
+    assert 99 not in [event.get("uid") for event in events]
+
+
+def test_event_with_length_word(syscalls):
+    event = make_decoder(syscalls).decode_page(read_pages()[0])[2]
+    assert event["filename"] == "/usr/lib/x86_64-linux-gnu/helper/long-running-service"
+    assert event["argv"] == ["service", "--config=/etc/service/config.yaml", "-l", "(fault)", "(fault)"]
+
+
+def test_time_extend_and_time_stamp(syscalls):
+    decoder = make_decoder(syscalls)
+    second = read_pages()[1]
+    assert [timestamp for timestamp, _, _ in decoder.iter_records(second)] == [1500000000, 2000000000, 3000000000]
+    assert [event["timestamp"] for event in decoder.decode_page(second)] == [1.5, 2.0, 3.0]
+
+
+def test_missed_events(syscalls):
+    decoder = make_decoder(syscalls)
+    first, second = read_pages()
+    decoder.decode_page(first)
+    assert decoder.missed_pages == 0
+    assert len(decoder.decode_page(second)) == 3  # RB_MISSED_EVENTS gehört nicht zur Länge
+    assert decoder.missed_pages == 1
+
+
+def test_stop_wakes_idle_reader(tmp_path, syscalls):
+    '''
+    Ohne idle_timeout wartet poll() unbegrenzt; stop() aus einem anderen Thread muss es aufwecken.
+    '''
+    root = tmp_path / "raw"
+    os.makedirs(str(root / "per_cpu" / "cpu0"))
+    os.mkfifo(str(root / "per_cpu" / "cpu0" / "trace_pipe_raw"))
+    reader = RawBufferReader(str(root), make_decoder(syscalls), idle_timeout=None)
+    timer = threading.Timer(0.2, reader.stop)
+    timer.start()
+    start = time.monotonic()
+    assert list(reader) == []
+    assert time.monotonic() - start < 5
+    reader.stop()  # nach dem Schließen der internen Pipe wirkungslos
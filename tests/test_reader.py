@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+'''
+PipeReader auf einem FIFO.
+'''
+
+import os
+import time
+import threading
+
+import pytest
+
+from ftrace.reader import PipeReader
+
+from test_parsers import SETREUID
+
+
+@pytest.fixture
+def fifo(tmp_path):
+    '''
+    Gibt den Pfad eines FIFOs und einen Schreiber zurück, der ihn offen hält (kein EOF).
+    '''
+    path = str(tmp_path / "trace_pipe")
+    os.mkfifo(path)
+    writer = os.open(path, os.O_RDWR)
+    yield path, writer
+    os.close(writer)
+
+
+def test_idle_timeout(fifo):
+    path, writer = fifo
+    os.write(writer, SETREUID * 2 + b"partial")
+    reader = PipeReader(path, idle_timeout=0.2)
+    start = time.monotonic()
+    lines = list(reader)
+    reader.close()
+
+    assert lines == [SETREUID, SETREUID, b"partial"]
+    assert time.monotonic() - start >= 0.2
+    assert reader.stats()["bytes_read"] == 2 * len(SETREUID) + len(b"partial")
+    assert reader.lines_read == 3
+    assert reader.wakeups >= 1
+    assert reader.time_blocked >= 0.15
+
+
+def test_stop_from_thread(fifo):
+    path, writer = fifo
+    os.write(writer, SETREUID)
+    reader = PipeReader(path)
+    lines = []
+    stopper = threading.Timer(0.2, reader.stop)
+    stopper.start()
+    start = time.monotonic()
+    for line in reader:
+        lines.append(line)
+    stopper.join()
+    reader.close()
+
+    assert lines == [SETREUID]
+    assert time.monotonic() - start < 5
+    assert reader.stopped
+
+
+def test_stop_after_close(fifo):
+    '''
+    stop() nach close() schreibt nicht in einen Filedeskriptor, der inzwischen neu vergeben wurde.
+    '''
+    path, _ = fifo
+    reader = PipeReader(path)
+    reader.close()
+    r, w = os.pipe()
+    try:
+        os.set_blocking(r, False)
+        reader.stop()
+        with pytest.raises(BlockingIOError):
+            os.read(r, 1)
+    finally:
+        os.close(r)
+        os.close(w)
+    assert list(reader.read_chunks()) == []
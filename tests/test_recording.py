@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+'''
+Aufzeichnen und Lesen mit Recorder und Recording.
+'''
+
+from ftrace.recording import Recorder, Recording
+
+
+def connect(pid, adress):
+    return {"caller_name": "curl", "caller_pid": pid, "timestamp": 100.0 + pid, "kname": "sys_connect_kprobe",
+            "syscall": "SyS_connect", "adress": adress}
+
+
+def test_tuples_survive_round_trip(tmp_path):
+    '''
+    Ein Tupel wird auch dann als Tupel gelesen, wenn das erste Event des Blocks dort None hat.
+    '''
+    path = str(tmp_path / "trace.ftrec")
+    events = [connect(1, None), connect(2, ("127.0.0.1", 80)), {"kname": "sys_execve_kprobe", "caller_pid": 3,
+              "timestamp": 103.0, "argv": ["ls", "-l"]}]
+    with Recorder(path, block_events=10) as recorder:
+        assert list(recorder.record(events)) == events
+
+    read = list(Recording(path).get_output())
+    assert read == events
+    assert isinstance(read[1]["adress"], tuple)
+    assert isinstance(read[2]["argv"], list)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+'''
+Abspielen von Aufzeichnungen mit Replay.
+'''
+
+import time
+
+import pytest
+
+from ftrace.replay import Replay
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+
+from test_parsers import SETREUID
+
+HEADER = b"# tracer: nop\n#\n#           TASK-PID   CPU#  ||||    TIMESTAMP  FUNCTION\n"
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "trace.txt"
+    lines = [SETREUID.replace(b"100.000100", ts) for ts in (b"100.000000", b"100.200000", b"100.400000")]
+    path.write_bytes(HEADER + b"".join(lines))
+    return str(path)
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    return NopTracer(TraceFS.create_stub(str(tmp_path)))
+
+
+def test_get_output(recording, tracer):
+    replay = Replay(recording, tracer=tracer)
+    events = [data for data in replay.get_output() if data]
+    assert [data["timestamp"] for data in events] == [100.0, 100.2, 100.4]
+    assert events[0]["kname"] == "sys_setreuid_kprobe"
+    assert replay.lines_skipped == 3
+    assert replay.reader_stats()["lines_read"] == 6
+
+
+def test_paced(recording, tracer):
+    start = time.monotonic()
+    assert len(list(Replay(recording, tracer=tracer, paced=True, speed=2.0).lines())) == 3
+    assert time.monotonic() - start >= 0.2
+
+
+def test_stop(recording, tracer):
+    replay = Replay(recording, tracer=tracer, paced=True)
+    events = []
+    for data in replay.get_output():
+        events.append(data)
+        replay.stop()
+    assert len(events) == 1
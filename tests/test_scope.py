@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+'''
+Einschränkung der Events auf Prozesse (FTrace.set_scope()).
+'''
+
+import os
+
+import pytest
+
+from ftrace import FTrace
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+
+
+@pytest.fixture
+def ftrace(tmp_path):
+    tracefs = TraceFS.create_stub(str(tmp_path))
+    ftrace = FTrace(tracefs)
+    ftrace.tracer = NopTracer(tracefs, register_all=False)
+    return ftrace
+
+
+def read(ftrace, name):
+    return ftrace.tracefs.file(name).read().strip()
+
+
+def own_pids():
+    return " ".join(str(pid) for pid in FTrace._own_pids())
+
+
+def test_scope_applied_on_setup(ftrace):
+    ftrace.set_scope([456, 123, os.getpid()])
+    assert ftrace.scope == [123, 456, os.getpid()]
+    assert read(ftrace, "set_event_pid") == ""  # erst beim Setup
+
+    ftrace.setup()
+    assert read(ftrace, "set_event_pid") == "123 456"  # ohne den eigenen Prozess
+    assert ftrace.tracefs.file("options", "event-fork").read_bool()
+    assert read(ftrace, "set_event_notrace_pid") == own_pids()
+
+    ftrace.set_scope([789], follow_forks=False, exclude_self=False)  # sofort geschrieben
+    assert read(ftrace, "set_event_pid") == "789"
+    assert not ftrace.tracefs.file("options", "event-fork").read_bool()
+    assert read(ftrace, "set_event_notrace_pid") == ""
+
+    ftrace.set_scope(None)
+    assert read(ftrace, "set_event_pid") == ""
+    assert read(ftrace, "set_event_notrace_pid") == own_pids()
+
+    ftrace.set_scope([123])
+    ftrace.reset()
+    assert (read(ftrace, "set_event_pid"), read(ftrace, "set_event_notrace_pid")) == ("", "")
+    assert not ftrace.tracefs.file("options", "event-fork").read_bool()
+
+
+def test_scope_of_own_process(ftrace):
+    with pytest.raises(ValueError):
+        ftrace.set_scope([os.getpid()])
+    ftrace.set_scope([os.getpid()], exclude_self=False)
+    assert ftrace.scope == [os.getpid()]
+
+
+def test_without_notrace_pid(ftrace):
+    '''
+    Ohne set_event_notrace_pid (Kernel vor 5.8) wird systemweit auch der eigene Prozess getracet.
+    '''
+    os.unlink(ftrace.tracefs.path("set_event_notrace_pid"))
+    ftrace.setup()
+    assert read(ftrace, "set_event_pid") == ""
+    assert not os.path.exists(ftrace.tracefs.path("set_event_notrace_pid"))
+    ftrace.set_scope([123])
+    assert read(ftrace, "set_event_pid") == "123"
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+'''
+Mehrere Sessions auf einer Nachbildung von tracefs, die sich KProbes teilen.
+'''
+
+import os
+
+from ftrace import syscalls
+from ftrace.session import Session
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+from ftrace.kprobes import KprobeEvents, KprobeRegistry
+
+
+def start(tracefs, name, selected):
+    session = Session(name, tracefs)
+    session.tracer = NopTracer(session.tracefs, register_all=False)
+    session.tracer.syscalls = selected
+    session.setup()
+    return session
+
+
+def test_sessions_share_probes(tmp_path):
+    tracefs = TraceFS.create_stub(str(tmp_path))
+    events = KprobeEvents(tracefs)
+    registry = KprobeRegistry(tracefs)
+
+    audit = start(tracefs, "audit", [syscalls.Sys_Setuid, syscalls.Sys_Kill])
+    net = start(tracefs, "net", [syscalls.Sys_Kill, syscalls.Sys_Umask])
+    assert set(events.current()) == {"sys_setuid_kprobe", "sys_kill_kprobe", "sys_umask_kprobe"}
+    assert registry.refcount("sys_kill_kprobe") == 2
+    assert registry.refcount("sys_setuid_kprobe") == 1
+    assert audit.tracefs.file("events", "kprobes", "sys_kill_kprobe", "enable").read_bool()
+
+    audit.close()
+    assert set(events.current()) == {"sys_kill_kprobe", "sys_umask_kprobe"}
+    assert registry.refcount("sys_kill_kprobe") == 1
+    assert net.tracefs.file("events", "kprobes", "sys_kill_kprobe", "enable").read_bool()
+    assert not os.path.exists(tracefs.path("instances", "audit"))
+
+    net.close()
+    assert list(events.current()) == []
+    assert registry.refcount("sys_kill_kprobe") == 0
+
+
+def test_registry_keeps_foreign_probes(tmp_path):
+    '''
+    Probes, die beim acquire() schon registriert waren, werden mitbenutzt, aber nicht gezählt und nie entfernt.
+    '''
+    tracefs = TraceFS.create_stub(str(tmp_path))
+    kill, umask = syscalls.Sys_Kill(tracefs), syscalls.Sys_Umask(tracefs)
+    events = KprobeEvents(tracefs)
+    events.register([kill])
+
+    first, second = KprobeRegistry(tracefs), KprobeRegistry(tracefs)
+    assert first.acquire([kill, umask]) == ["sys_umask_kprobe"]
+    assert second.acquire([kill, umask]) == []
+    assert (first.refcount("sys_kill_kprobe"), first.refcount("sys_umask_kprobe")) == (0, 2)
+
+    assert first.release(["sys_kill_kprobe", "sys_umask_kprobe"]) == []
+    assert second.release(["sys_kill_kprobe", "sys_umask_kprobe"]) == ["sys_umask_kprobe"]
+    assert list(events.current()) == ["sys_kill_kprobe"]
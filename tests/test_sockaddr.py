@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+'''
+Umwandlung der Argumente von Sys_Connect und Sys_Accept in (Adresse, Port).
+'''
+
+import sys
+import socket
+import struct
+
+import pytest
+
+from ftrace.sockaddr import SockAddr, ARG_NAMES, CACHE_SIZE
+
+
+def ipv4(address):
+    return struct.unpack("=I", socket.inet_aton(address))[0]
+
+
+def ipv6(address):
+    return struct.unpack("=QQ", socket.inet_pton(socket.AF_INET6, address))
+
+
+def port(value):
+    return socket.htons(value)
+
+
+def sockaddr_in(address, portnumber):
+    return [0, 0, 0, 0, 0, 0, ipv4(address), 0, 0, 2, port(portnumber)]
+
+
+@pytest.mark.skipif(sys.byteorder != "little", reason="Speicherinhalt in Little Endian")
+def test_small_ipv4_values():
+    '''
+    Adressen, deren Speicherinhalt als Integer kleiner als 2^24 ist (führende Nullbytes), z.B. 10.0.0.0.
+    '''
+    assert ipv4("10.0.0.0") == 10
+    assert SockAddr.convert_args(sockaddr_in("10.0.0.0", 443)) == ("10.0.0.0", 443)
+    assert SockAddr.int2ipv4(0) == "0.0.0.0"
+    assert SockAddr.int2ipv4(0x0100007f) == "127.0.0.1"
+
+
+def test_convert_args():
+    assert SockAddr.convert_args(sockaddr_in("192.168.1.20", 22)) == ("192.168.1.20", 22)
+    ipv6_1, ipv6_2 = ipv6("2001:db8::1")
+    assert SockAddr.convert_args([0, 0, 0, 0, 0, 0, 0, ipv6_1, ipv6_2, 10, port(443)]) == ("2001:db8::1", 443)
+    # addrinfo hat Vorrang vor sockaddr
+    assert SockAddr.convert_args([2, 1, ipv4("1.2.3.4"), 0, 0, port(80)] + sockaddr_in("5.6.7.8", 8080)[6:]) == ("1.2.3.4", 80)
+    assert SockAddr.convert_args([0] * 9 + [1, 0]) == (None, None)  # AF_UNIX
+
+    args = sockaddr_in("172.16.0.1", 53)
+    assert SockAddr.convertToAddress(dict(zip(ARG_NAMES, args))) == ("172.16.0.1", 53)
+
+
+def test_invalid_port():
+    args = sockaddr_in("127.0.0.1", 80)
+    args[-1] = 1 << 16
+    assert SockAddr.convert_args(args) == ("127.0.0.1", None)
+
+
+def test_cache():
+    SockAddr.cache_clear()
+    for _ in range(3):
+        SockAddr.convert_args(sockaddr_in("127.0.0.1", 80))
+    stats = SockAddr.cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+
+    SockAddr.set_cache_size(0)
+    try:
+        assert SockAddr.convert_args(sockaddr_in("127.0.0.1", 80)) == ("127.0.0.1", 80)
+        assert SockAddr.cache_stats()["maxsize"] == 0
+    finally:
+        SockAddr.set_cache_size(CACHE_SIZE)
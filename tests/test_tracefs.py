@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+'''
+Ermitteln des Mountpoints und Nachbildungen von tracefs.
+'''
+
+import os
+import stat
+
+from ftrace import syscalls
+from ftrace.tracefs import TraceFS
+
+
+def test_detect_env(monkeypatch):
+    monkeypatch.setenv("FTRACE_TRACEFS", "/tmp/tracefs")
+    assert TraceFS.detect() == "/tmp/tracefs"
+    assert TraceFS().root == "/tmp/tracefs"
+
+
+def test_detect_mountpoints(tmp_path, monkeypatch):
+    '''
+    Verwendet wird der erste Mountpoint, in dem es trace_pipe gibt.
+    '''
+    monkeypatch.delenv("FTRACE_TRACEFS", raising=False)
+    empty, debugfs = str(tmp_path / "tracing"), str(tmp_path / "debug" / "tracing")
+    os.makedirs(empty)
+    TraceFS.create_stub(debugfs)
+    monkeypatch.setattr(TraceFS, "MOUNTPOINTS", [empty, debugfs])
+    assert TraceFS.detect() == debugfs
+
+
+def test_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(TraceFS, "_default", None)
+    tracefs = TraceFS.create_stub(str(tmp_path))
+    TraceFS.set_default(tracefs)
+    assert TraceFS.default() is tracefs
+    TraceFS.set_default(None)
+    monkeypatch.setenv("FTRACE_TRACEFS", str(tmp_path))
+    assert TraceFS.default() is not tracefs
+    assert TraceFS.default().root == str(tmp_path)
+
+
+def test_create_stub(tmp_path):
+    tracefs = TraceFS.create_stub(str(tmp_path), cpus=2, syscalls=[syscalls.Sys_Setuid()], tracepoints=True)
+    assert not tracefs.is_system
+    assert stat.S_ISFIFO(os.stat(tracefs.path("trace_pipe")).st_mode)
+    assert tracefs.cpus() == [0, 1]
+    assert tracefs.file("kprobe_events").read() == ""
+    assert os.path.isfile(tracefs.path("events", "kprobes", "sys_setuid_kprobe", "enable"))
+    assert os.path.isfile(tracefs.path("events", "syscalls", "sys_enter_setuid", "format"))
+    assert not os.path.exists(tracefs.path("events", "kprobes", "sys_kill_kprobe"))
+    assert tracefs.ftrace_enabled_path == tracefs.path("ftrace_enabled")
+
+    tracefs.file("tracing_on").write("1")
+    TraceFS.create_stub(str(tmp_path))  # vorhandene Dateien bleiben unverändert
+    assert tracefs.file("tracing_on").read_bool()
+
+
+def test_instances(tmp_path):
+    tracefs = TraceFS.create_stub(str(tmp_path), cpus=2, tracepoints=True)
+    instance = tracefs.instance("audit")
+    assert (instance.name, instance.parent, instance.top) == ("audit", tracefs, tracefs)
+    assert tracefs.instances() == ["audit"]
+    assert instance.cpus() == [0, 1]
+    assert not os.path.exists(instance.path("kprobe_events"))  # gilt für alle Instanzen
+    assert os.path.isfile(instance.path("events", "syscalls", "sys_enter_setuid", "enable"))
+    assert instance.ftrace_enabled_path == tracefs.ftrace_enabled_path
+
+    tracefs.remove_instance("audit")
+    assert tracefs.instances() == []
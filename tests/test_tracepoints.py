@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+'''
+Aufzeichnen über Syscall-Tracepoints statt KProbes (SysCall.BACKEND).
+'''
+
+import os
+
+from ftrace import syscalls
+from ftrace.tracefs import TraceFS
+from ftrace.tracepoints import SyscallTracepoint
+
+
+def stub(tmp_path):
+    return TraceFS.create_stub(str(tmp_path), syscalls=[syscalls.Sys_Setreuid()], tracepoints=True)
+
+
+def test_kprobe_is_default(tmp_path):
+    assert syscalls.SysCall.BACKEND == "kprobe"
+    assert syscalls.Sys_Setreuid(stub(tmp_path)).tracepoint is None
+
+
+def test_auto_uses_tracepoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(syscalls.SysCall, "BACKEND", "auto")
+    tracepoint = syscalls.Sys_Setreuid(stub(tmp_path)).tracepoint
+    assert tracepoint.name == "sys_enter_setreuid"
+    assert [(name, arg) for name, arg, _ in tracepoint.params] == [("ruid", "ruid"), ("euid", "euid")]
+
+
+def test_unknown_argument_falls_back_to_kprobe(tmp_path, monkeypatch):
+    '''
+    Heißt ein Argument des Tracepoints anders als der Parameter, wird nicht nach Position geraten.
+    '''
+    monkeypatch.setattr(syscalls.SysCall, "BACKEND", "auto")
+    tracefs = stub(tmp_path)
+    path = tracefs.path("events", "syscalls", "sys_enter_setreuid", "format")
+    fmt = SyscallTracepoint.stub_format(syscalls.Sys_Setreuid, 1000).replace("euid", "new_euid")
+    with open(path, "w") as f:
+        f.write(fmt)
+    syscall = syscalls.Sys_Setreuid(tracefs)
+    assert syscall.tracepoint is None
+    assert os.path.basename(os.path.dirname(syscall.enable_path)) == "sys_setreuid_kprobe"
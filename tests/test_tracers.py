@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+'''
+En/disablen und Registrieren der SysCalls des NopTracers im laufenden Betrieb.
+'''
+
+import pytest
+
+from ftrace import syscalls
+from ftrace.tracefs import TraceFS
+from ftrace.tracers import NopTracer
+from ftrace.kprobes import KprobeEvents
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    '''
+    Zeichnet die Aufrufe von SysCall.set_enabled() als (KName, Wert) auf.
+    '''
+    calls = []
+    set_enabled = syscalls.SysCall.set_enabled
+
+    def recording(self, val, check_registered=True):
+        calls.append((self.kname, val))
+        set_enabled(self, val, check_registered)
+
+    monkeypatch.setattr(syscalls.SysCall, "set_enabled", recording)
+    return calls
+
+
+def test_incremental_registration(tmp_path, writes):
+    tracefs = TraceFS.create_stub(str(tmp_path))
+    events = KprobeEvents(tracefs)
+    tracer = NopTracer(tracefs, register_all=False)
+    tracer.syscalls = [syscalls.Sys_Setuid]
+    tracer.setup()
+    assert list(events.current()) == ["sys_setuid_kprobe"]
+    assert writes == [("sys_setuid_kprobe", True)]
+
+    del writes[:]
+    tracer.syscalls = [syscalls.Sys_Setuid, syscalls.Sys_Kill]
+    assert list(events.current()) == ["sys_setuid_kprobe", "sys_kill_kprobe"]
+    assert writes == [("sys_kill_kprobe", True)]  # Sys_Setuid ist schon enablet
+
+    del writes[:]
+    tracer.syscalls = [syscalls.Sys_Kill]
+    assert list(events.current()) == ["sys_kill_kprobe"]
+    assert writes == [("sys_setuid_kprobe", False)]  # vor dem Entfernen disablet
+
+    del writes[:]
+    tracer.syscalls = [syscalls.Sys_Kill]
+    assert writes == []
+
+    tracer.reset()
+    assert list(events.current()) == []
+    assert writes == [("sys_kill_kprobe", False)]
+
+
+def test_register_all_only_writes_changes(tmp_path, writes):
+    tracefs = TraceFS.create_stub(str(tmp_path))
+    tracer = NopTracer(tracefs)
+    tracer.setup()
+    registered = KprobeEvents(tracefs).current()
+    assert "sys_kill_kprobe" in registered and "sys_setuid_kprobe" in registered
+    # neu registrierte KProbes sind disabled, nur der Zustand des Tracepoints ist unbekannt
+    assert writes == [("sched_process_fork", False)]
+    assert set(tracer.setup_stats) == {"register", "enable", "filter", "compile"}
+
+    del writes[:]
+    tracer.syscalls = [syscalls.Sys_Setuid(tracefs), "sys_kill_kprobe"]
+    assert set(writes) == {("sys_setuid_kprobe", True), ("sys_kill_kprobe", True)}
+    del writes[:]
+    tracer.syscalls = [syscalls.Sys_Kill]
+    assert writes == [("sys_setuid_kprobe", False)]
+    assert KprobeEvents(tracefs).current() == registered
+    tracer.reset()